@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+并发压力测试工具
+
+用本地的替身（提供合成视频的HTTP媒体服务器、可注入延迟和错误的模拟翻译后端）
+在固定时长内保持 N 个任务同时运行，驱动完整的 main.py 队列流水线
+（多个 --worker 工作进程），统计任务延迟分位数、吞吐量、各阶段排队时间、
+峰值内存以及文件描述符和临时文件随时间的变化。
+
+报告为带版本号的JSON，可以和以前的报告比较，作为合并前的性能门禁:
+
+    python loadtest.py --concurrency 8 --workers 4 --duration 600 --output report.json
+    python loadtest.py --concurrency 8 --workers 4 --duration 600 --baseline baseline.json
+    python loadtest.py --compare baseline.json report.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shlex
+import signal
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+# 报告格式版本，字段含义变化时递增，不同版本的报告不能比较
+SCHEMA_VERSION = 1
+
+# 参与门禁的指标：(路径, 方向)，lower 表示越小越好，higher 表示越大越好
+GATED_METRICS = [
+    ('latency_seconds.p50', 'lower'),
+    ('latency_seconds.p95', 'lower'),
+    ('latency_seconds.p99', 'lower'),
+    ('jobs.per_minute', 'higher'),
+    ('resources.peak_rss_bytes', 'lower'),
+    ('stages.download.wait.p95', 'lower'),
+    ('stages.transcribe.wait.p95', 'lower'),
+    ('stages.compose.wait.p95', 'lower'),
+]
+
+# 影响结果的配置，不同时比较结果没有意义
+COMPARABLE_CONFIG = ('concurrency', 'workers', 'stage_workers', 'duration', 'video_seconds', 'videos',
+                     'pipeline_args', 'media', 'translator')
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    计算样本数、p50/p95/p99、平均值和最大值（分位数取最近秩，与翻译后端池的统计一致）
+
+    Args:
+        values: 样本
+
+    Returns:
+        Dict: 没有样本时各统计量为 None
+    """
+    samples = sorted(values)
+    if not samples:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'mean': None, 'max': None}
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, max(0, int(round(p / 100 * (len(samples) - 1)))))]
+
+    return {
+        'count': len(samples),
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'mean': sum(samples) / len(samples),
+        'max': samples[-1],
+    }
+
+def slope_per_minute(points: List[Tuple[float, float]]) -> Optional[float]:
+    """
+    最小二乘拟合的斜率（每分钟的变化量），用于判断资源是否随时间持续增长
+
+    Args:
+        points: (秒, 数值) 样本
+
+    Returns:
+        Optional[float]: 斜率；样本不足时为 None
+    """
+    if len(points) < 3:
+        return None
+    xs = [t / 60 for t, _ in points]
+    ys = [value for _, value in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+def make_synthetic_video(path: str, seconds: float) -> str:
+    """
+    用ffmpeg生成竖屏测试视频（测试图案加正弦音），已存在时直接复用
+
+    合成的音频没有语音，Whisper 通常识别不出文字，翻译阶段的负载很小；
+    需要覆盖翻译时用 --video 指定带英文语音的真实片段。
+
+    Args:
+        path: 输出路径
+        seconds: 时长（秒）
+
+    Returns:
+        str: 输出路径
+    """
+    if os.path.exists(path):
+        return path
+    tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1080x1920:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", tmp_path
+    ], check=True)
+    os.replace(tmp_path, path)
+    return path
+
+class MediaServer:
+    """
+    替代 YouTube 的本地HTTP媒体服务器
+
+    /media/job-<n>.mp4 按 n 轮流返回模板视频，每个任务有不同的URL（yt-dlp 按文件名区分视频），
+    内容来自少量模板文件。支持单个 Range 请求，可以注入首字节延迟、限速和 503 错误。
+    """
+
+    def __init__(self, templates: List[str], latency: float = 0.0, rate: int = 0, error_rate: float = 0.0):
+        """
+        Args:
+            templates: 模板视频文件
+            latency: 每个请求的首字节延迟（秒）
+            rate: 每个连接的限速（字节/秒），0 表示不限速
+            error_rate: 返回 503 的请求比例
+        """
+        self.templates = templates
+        self.latency = latency
+        self.rate = rate
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'errors': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="loadtest-media", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, n: int) -> str:
+        """第 n 个任务的视频URL"""
+        return f"{self.base_url}/media/job-{n}.mp4"
+
+    def start(self) -> 'MediaServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _resolve(self) -> Optional[str]:
+                name = os.path.basename(self.path.split('?', 1)[0])
+                if not (self.path.startswith('/media/job-') and name.endswith('.mp4')):
+                    return None
+                try:
+                    n = int(name[len('job-'):-len('.mp4')])
+                except ValueError:
+                    return None
+                return server.templates[n % len(server.templates)]
+
+            def _respond(self, body: bool) -> None:
+                server._count('requests')
+                time.sleep(server.latency)
+                path = self._resolve()
+                if path is None:
+                    self.send_error(404)
+                    return
+                if random.random() < server.error_rate:
+                    server._count('errors')
+                    self.send_error(503, "injected error")
+                    return
+
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                range_header = self.headers.get('Range', '')
+                if range_header.startswith('bytes=') and ',' not in range_header:
+                    first, _, last = range_header[len('bytes='):].partition('-')
+                    start = int(first) if first else max(0, size - int(last))
+                    end = min(size - 1, int(last)) if first and last else end
+                    if start >= size:
+                        self.send_error(416)
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                if not body:
+                    return
+
+                remaining = end - start + 1
+                chunk_size = 64 * 1024
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    while remaining > 0:
+                        chunk = f.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        try:
+                            self.wfile.write(chunk)
+                        except (BrokenPipeError, ConnectionResetError):
+                            return
+                        remaining -= len(chunk)
+                        server._count('bytes', len(chunk))
+                        if server.rate:
+                            time.sleep(len(chunk) / server.rate)
+
+            def do_GET(self):
+                self._respond(body=True)
+
+            def do_HEAD(self):
+                self._respond(body=False)
+
+        return Handler
+
+def register_fake_translators(config: Dict[str, Any]) -> None:
+    """
+    注册模拟翻译后端 fake-primary（可注入延迟、慢请求和错误）和 fake-backup（只有基础延迟），
+    工作进程用 --translators fake-primary,fake-backup 选择它们，经过真实的后端池（超时、熔断、对冲）
+
+    Args:
+        config: latency、slow_rate、slow_latency、error_rate
+    """
+    from translation_pool import BACKENDS, TranslationBackend
+    from events import TranslationError
+
+    def jitter(seconds: float) -> None:
+        time.sleep(seconds * random.uniform(0.5, 1.5))
+
+    def primary(text: str) -> str:
+        roll = random.random()
+        if roll < config['error_rate']:
+            jitter(config['latency'])
+            raise TranslationError("injected error")
+        jitter(config['slow_latency'] if roll < config['error_rate'] + config['slow_rate'] else config['latency'])
+        return f"[译] {text}"
+
+    def backup(text: str) -> str:
+        jitter(config['latency'])
+        return f"[译] {text}"
+
+    BACKENDS['fake-primary'] = lambda timeout: TranslationBackend('fake-primary', primary, timeout=timeout)
+    BACKENDS['fake-backup'] = lambda timeout: TranslationBackend('fake-backup', backup, timeout=timeout)
+
+def run_worker_process(config_path: str, main_argv: List[str]) -> None:
+    """工作进程入口：注册模拟翻译后端后运行 main.py 的队列工作进程"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    register_fake_translators(config['translator'])
+
+    import main as pipeline
+    sys.argv = ['main.py'] + main_argv
+    pipeline.main()
+
+def _read_proc_status(pid: int) -> Optional[Dict[str, int]]:
+    """读取进程的 RSS、峰值 RSS（字节）和打开的文件描述符数（仅Linux）"""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return None
+    kb = lambda key: int(fields.get(key, '0 kB').split()[0]) * 1024
+    return {'rss': kb('VmRSS'), 'hwm': kb('VmHWM'), 'fds': fds}
+
+def _descendants(pids: List[int]) -> List[int]:
+    """列出给定进程的所有后代进程（ffmpeg、识别工作进程等）"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                # 第二个字段是带括号的进程名，可能包含空格，从最后一个右括号之后解析
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    found = []
+    pending = list(pids)
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+def _count_files(paths: List[str], suffixes: Optional[Tuple[str, ...]] = None) -> Dict[str, int]:
+    """统计目录下（递归）的文件数和总字节数，可以只统计指定后缀"""
+    count = 0
+    size = 0
+    for root_path in paths:
+        for root, _, files in os.walk(root_path):
+            for name in files:
+                if suffixes and not name.endswith(suffixes):
+                    continue
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+                count += 1
+    return {'count': count, 'bytes': size}
+
+class ResourceSampler:
+    """定时采样工作进程（含子进程）的内存、文件描述符，以及临时文件和中间文件"""
+
+    def __init__(self, workers: List[subprocess.Popen], tmp_dir: str, output_dir: str, interval: float = 2.0):
+        self.workers = workers
+        self.tmp_dir = tmp_dir
+        self.output_dir = output_dir
+        self.interval = interval
+        self.samples: List[Dict[str, Any]] = []
+        self.peak_worker_hwm = 0
+        self.started = time.time()
+        self.supported = os.path.isdir('/proc/self/fd')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-sampler", daemon=True)
+
+    def start(self) -> 'ResourceSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self) -> Dict[str, Any]:
+        """采样一次并记录"""
+        sample = {'t': round(time.time() - self.started, 2)}
+        if self.supported:
+            worker_pids = [worker.pid for worker in self.workers if worker.poll() is None]
+            workers = [status for status in map(_read_proc_status, worker_pids) if status]
+            children = [status for status in map(_read_proc_status, _descendants(worker_pids)) if status]
+            for status in workers:
+                self.peak_worker_hwm = max(self.peak_worker_hwm, status['hwm'])
+            sample.update({
+                'workers': len(workers),
+                'rss': sum(status['rss'] for status in workers + children),
+                'worker_rss': sum(status['rss'] for status in workers),
+                'child_processes': len(children),
+                'fds': sum(status['fds'] for status in workers),
+            })
+        # 下载中的 .part 文件、原子写入的 .tmp 文件和 TMPDIR 中的文件都算作临时文件
+        temp = _count_files([self.output_dir], suffixes=('.part', '.ytdl', '.tmp'))
+        temp_dir = _count_files([self.tmp_dir])
+        sample['temp_files'] = temp['count'] + temp_dir['count']
+        sample['temp_bytes'] = temp['bytes'] + temp_dir['bytes']
+        sample['intermediate_files'] = _count_files([os.path.join(self.output_dir, 'audio')])['count']
+        self.samples.append(sample)
+        return sample
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+class LoadTest:
+    """在固定时长内保持 N 个任务同时运行，并收集任务和资源统计"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.run_dir = os.path.abspath(args.run_dir or tempfile.mkdtemp(prefix='you-video-loadtest-'))
+        self.output_dir = os.path.join(self.run_dir, 'output')
+        self.tmp_dir = os.path.join(self.run_dir, 'tmp')
+        self.queue_path = os.path.join(self.run_dir, 'queue.db')
+        self.config_path = os.path.join(self.run_dir, 'config.json')
+        for path in (self.output_dir, self.tmp_dir, os.path.join(self.run_dir, 'media'),
+                     os.path.join(self.run_dir, 'logs')):
+            os.makedirs(path, exist_ok=True)
+        if os.path.exists(self.queue_path):
+            raise FileExistsError(f"运行目录中已有队列，请使用新的 --run-dir: {self.queue_path}")
+
+        # 压测默认使用最小的模型和模拟翻译后端，不开启指纹去重（模板视频会重复出现）；
+        # --pipeline-args 中的同名参数在后面，会覆盖这些默认值
+        self.pipeline_args = ['--model', 'tiny', '--translators', 'fake-primary,fake-backup',
+                              '--output-dir', self.output_dir] + shlex.split(args.pipeline_args)
+        self.config = {
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'stage_workers': args.stage_workers,
+            'duration': args.duration,
+            'video_seconds': args.video_seconds,
+            'videos': [os.path.basename(path) for path in args.video] or ['synthetic'],
+            'pipeline_args': args.pipeline_args,
+            'media': {'latency': args.media_latency, 'rate': args.media_rate, 'error_rate': args.media_error_rate},
+            'translator': {'latency': args.translate_latency, 'slow_rate': args.translate_slow_rate,
+                           'slow_latency': args.translate_slow, 'error_rate': args.translate_error_rate},
+        }
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.config, f, indent=2)
+
+        self.jobs: Dict[int, Dict[str, Any]] = {}
+        self.workers: List[subprocess.Popen] = []
+        self._worker_logs = []
+        self._submitted = 0
+
+    def _worker_stages(self) -> List[str]:
+        """每个工作进程处理的阶段：默认都处理所有阶段，--stage-workers 可以按阶段分配"""
+        if not self.args.stage_workers:
+            return ['download,transcribe,compose'] * self.args.workers
+        stages = []
+        for item in self.args.stage_workers.split(','):
+            stage, _, count = item.partition('=')
+            stages += [stage.strip()] * int(count or 1)
+        return stages
+
+    def start_workers(self) -> None:
+        env = dict(os.environ, TMPDIR=self.tmp_dir, PYTHONUNBUFFERED='1')
+        for index, stages in enumerate(self._worker_stages()):
+            log = open(os.path.join(self.run_dir, 'logs', f"worker-{index}.log"), 'w', encoding='utf-8')
+            command = [sys.executable, os.path.abspath(__file__), '--worker-process', self.config_path, '--',
+                       '--queue', self.queue_path, '--worker', '--stages', stages] + self.pipeline_args
+            self.workers.append(subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env))
+            self._worker_logs.append(log)
+
+    def stop_workers(self) -> None:
+        for worker in self.workers:
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGINT)
+        for worker in self.workers:
+            try:
+                worker.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+        for log in self._worker_logs:
+            log.close()
+
+    def submit(self, queue, media: MediaServer, pipeline) -> None:
+        """加入一个新任务，参数与 main.py --enqueue 相同"""
+        args = pipeline.parse_arguments(['--queue', self.queue_path, '--enqueue', media.url_for(self._submitted)]
+                                        + self.pipeline_args)
+        job_id = queue.enqueue(pipeline.build_job_payload(args))
+        self.jobs[job_id] = {'id': job_id, 'submitted': time.time(), 'status': 'pending'}
+        self._submitted += 1
+
+    def poll(self, queue) -> int:
+        """更新未结束任务的状态，返回仍在运行的任务数"""
+        running = 0
+        for job_id, job in self.jobs.items():
+            if job['status'] in ('done', 'failed'):
+                continue
+            record = queue.get(job_id)
+            if record['status'] in ('done', 'failed'):
+                job.update(status=record['status'], finished=record['updated'], created=record['created'],
+                           timings=record['state'].get('timings', {}), error=record['last_error'])
+            else:
+                running += 1
+        return running
+
+    def run(self) -> Dict[str, Any]:
+        import main as pipeline
+        from job_queue import JobQueue
+        from events import EventBus
+
+        templates = self.args.video or [
+            make_synthetic_video(os.path.join(self.run_dir, 'media', f"synthetic-{self.args.video_seconds:g}s.mp4"),
+                                 self.args.video_seconds)
+        ]
+        media = MediaServer(templates, latency=self.args.media_latency, rate=self.args.media_rate,
+                            error_rate=self.args.media_error_rate).start()
+        queue = JobQueue(self.queue_path, events=EventBus())
+
+        print(f"运行目录: {self.run_dir}")
+        print(f"并发任务: {self.args.concurrency}，工作进程: {len(self._worker_stages())}，时长: {self.args.duration} 秒")
+
+        # 先放入第一批任务再启动工作进程，之后每完成一个就补充一个，保持并发数不变
+        for _ in range(self.args.concurrency):
+            self.submit(queue, media, pipeline)
+        self.start_workers()
+        sampler = ResourceSampler(self.workers, self.tmp_dir, self.output_dir, interval=self.args.sample_interval)
+        sampler.start()
+
+        started = time.time()
+        deadline = started + self.args.duration
+        try:
+            while time.time() < deadline:
+                running = self.poll(queue)
+                for _ in range(self.args.concurrency - running):
+                    self.submit(queue, media, pipeline)
+                if all(worker.poll() is not None for worker in self.workers):
+                    raise RuntimeError(f"所有工作进程都已退出，查看日志: {os.path.join(self.run_dir, 'logs')}")
+                self._print_status(started, sampler)
+                time.sleep(1.0)
+
+            # 不再加入新任务，等待运行中的任务完成；之后工作进程空闲时再采样一次，检查残留
+            drain_deadline = time.time() + self.args.drain_timeout
+            while self.poll(queue) and time.time() < drain_deadline:
+                time.sleep(1.0)
+            time.sleep(self.args.sample_interval)
+            final = sampler.sample()
+        finally:
+            sampler.stop()
+            self.stop_workers()
+            media.stop()
+
+        return self.build_report(started, sampler, final, media)
+
+    def _print_status(self, started: float, sampler: ResourceSampler) -> None:
+        done = sum(1 for job in self.jobs.values() if job['status'] == 'done')
+        failed = sum(1 for job in self.jobs.values() if job['status'] == 'failed')
+        last = sampler.samples[-1] if sampler.samples else {}
+        print(f"\r[{time.time() - started:6.0f}s] 完成 {done}，失败 {failed}，"
+              f"RSS {last.get('rss', 0) / 1024 / 1024:.0f} MB，fd {last.get('fds', '-')}，"
+              f"临时文件 {last.get('temp_files', '-')}", end='', flush=True)
+
+    def build_report(self, started: float, sampler: ResourceSampler, final: Dict[str, Any],
+                     media: MediaServer) -> Dict[str, Any]:
+        print()
+        deadline = started + self.args.duration
+        finished = [job for job in self.jobs.values() if job['status'] in ('done', 'failed')]
+        done = [job for job in finished if job['status'] == 'done']
+        failed = [job for job in finished if job['status'] == 'failed']
+
+        stages = {}
+        for stage in ('download', 'transcribe', 'compose'):
+            timings = [job['timings'][stage] for job in done if stage in job.get('timings', {})]
+            stages[stage] = {
+                'wait': summarize([timing['claimed'] - timing['available'] for timing in timings]),
+                'run': summarize([timing['done'] - timing['claimed'] for timing in timings]),
+            }
+
+        # 前 20% 的时间是预热（加载模型等），资源增长趋势只用之后的样本
+        warmup = self.args.duration * 0.2
+        steady = [sample for sample in sampler.samples if sample['t'] >= warmup]
+
+        def trend(key: str) -> Dict[str, Any]:
+            points = [(sample['t'], sample[key]) for sample in steady if key in sample]
+            return {
+                'start': points[0][1] if points else None,
+                'end': final.get(key),
+                'max': max((value for _, value in points), default=None),
+                'slope_per_minute': slope_per_minute(points),
+            }
+
+        return {
+            'schema_version': SCHEMA_VERSION,
+            'tool': 'you-video-loadtest',
+            'started_at': datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'host': {'hostname': socket.gethostname(), 'platform': platform.platform(),
+                     'cpu_count': os.cpu_count(), 'python': platform.python_version()},
+            'config': self.config,
+            'jobs': {
+                'submitted': len(self.jobs),
+                'completed': len(done),
+                'failed': len(failed),
+                'unfinished': len(self.jobs) - len(finished),
+                'per_minute': sum(1 for job in done if job['finished'] <= deadline) / (self.args.duration / 60),
+                'failure_rate': len(failed) / len(finished) if finished else None,
+                'errors': sorted({job['error'].strip().splitlines()[-1] for job in failed
+                                  if (job.get('error') or '').strip()})[:20],
+            },
+            'latency_seconds': summarize([job['finished'] - job['created'] for job in done]),
+            'stages': stages,
+            'resources': {
+                'supported': sampler.supported,
+                'peak_rss_bytes': max((sample.get('rss', 0) for sample in sampler.samples), default=None),
+                'peak_worker_hwm_bytes': sampler.peak_worker_hwm or None,
+                'fds': trend('fds'),
+                'temp_files': trend('temp_files'),
+                'intermediate_files': trend('intermediate_files'),
+                'child_processes': trend('child_processes'),
+            },
+            'media_server': dict(media.stats),
+            'samples': sampler.samples,
+        }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    value = report
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def check_leaks(report: Dict[str, Any], max_fd_slope: float) -> List[str]:
+    """
+    检查单份报告中的资源泄漏：文件描述符持续增长，或者任务全部结束后临时文件、中间文件没有清理
+
+    Returns:
+        List[str]: 问题描述，没有问题时为空
+    """
+    problems = []
+    resources = report['resources']
+    fd_slope = resources['fds']['slope_per_minute']
+    if fd_slope is not None and fd_slope > max_fd_slope:
+        problems.append(f"文件描述符每分钟增长 {fd_slope:.2f} 个（上限 {max_fd_slope}）")
+    if resources['temp_files']['end']:
+        problems.append(f"任务全部结束后仍有 {resources['temp_files']['end']} 个临时文件")
+    # 失败的任务按清理策略可能保留中间文件，超出失败任务数的部分才算泄漏
+    leftover = (resources['intermediate_files']['end'] or 0) - report['jobs']['failed']
+    if leftover > 0:
+        problems.append(f"任务全部结束后仍有 {leftover} 个未清理的中间文件")
+    if report['jobs']['unfinished']:
+        problems.append(f"{report['jobs']['unfinished']} 个任务在等待时间内没有完成")
+    return problems
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    比较两份报告的门禁指标
+
+    Args:
+        baseline: 基准报告
+        current: 本次报告
+        tolerance: 允许的相对退化比例（0.1 表示 10%）
+
+    Returns:
+        Dict: comparable（配置是否一致）、config_differences、metrics（每项的基准值、当前值、变化和是否退化）
+    """
+    if baseline.get('schema_version') != current.get('schema_version'):
+        raise ValueError(f"报告格式版本不同，不能比较: {baseline.get('schema_version')} != "
+                         f"{current.get('schema_version')}")
+
+    differences = [key for key in COMPARABLE_CONFIG
+                   if baseline['config'].get(key) != current['config'].get(key)]
+    metrics = []
+    for path, direction in GATED_METRICS:
+        before = _lookup(baseline, path)
+        after = _lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = change > tolerance if direction == 'lower' else change < -tolerance
+        metrics.append({'metric': path, 'baseline': before, 'current': after, 'change': change,
+                        'regression': worse})
+
+    # 失败率按绝对值比较，基准为 0 时相对变化没有意义
+    before = baseline['jobs'].get('failure_rate') or 0.0
+    after = current['jobs'].get('failure_rate') or 0.0
+    metrics.append({'metric': 'jobs.failure_rate', 'baseline': before, 'current': after, 'change': after - before,
+                    'regression': after - before > 0.01})
+
+    return {'comparable': not differences, 'config_differences': differences, 'tolerance': tolerance,
+            'metrics': metrics}
+
+def print_report(report: Dict[str, Any]) -> None:
+    """输出报告摘要"""
+    jobs = report['jobs']
+    latency = report['latency_seconds']
+    fmt = lambda value, unit='s': '-' if value is None else f"{value:.2f}{unit}"
+    print("=" * 60)
+    print(f"任务: 完成 {jobs['completed']}，失败 {jobs['failed']}，未完成 {jobs['unfinished']}，"
+          f"吞吐量 {jobs['per_minute']:.2f} 个/分钟")
+    print(f"任务延迟: p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}  "
+          f"max {fmt(latency['max'])}")
+    for stage, stats in report['stages'].items():
+        print(f"  {stage:>10}: 排队 p50 {fmt(stats['wait']['p50'])} p95 {fmt(stats['wait']['p95'])}  "
+              f"处理 p50 {fmt(stats['run']['p50'])} p95 {fmt(stats['run']['p95'])}")
+    resources = report['resources']
+    if resources['peak_rss_bytes'] is not None:
+        print(f"峰值 RSS（工作进程及子进程合计）: {resources['peak_rss_bytes'] / 1024 / 1024:.0f} MB")
+    for key, label in (('fds', '文件描述符'), ('temp_files', '临时文件'), ('intermediate_files', '中间文件')):
+        trend = resources[key]
+        print(f"{label}: 开始 {trend['start']}，结束 {trend['end']}，最大 {trend['max']}，"
+              f"每分钟变化 {fmt(trend['slope_per_minute'], '')}")
+    for error in jobs['errors']:
+        print(f"  失败原因: {error}")
+    print("=" * 60)
+
+def print_comparison(comparison: Dict[str, Any]) -> None:
+    """输出比较结果"""
+    if not comparison['comparable']:
+        print(f"⚠️  两次运行的配置不同（{', '.join(comparison['config_differences'])}），比较结果仅供参考")
+    print(f"{'指标':<32} {'基准':>12} {'本次':>12} {'变化':>8}")
+    for metric in comparison['metrics']:
+        flag = '  ❌ 退化' if metric['regression'] else ''
+        print(f"{metric['metric']:<32} {metric['baseline']:>12.2f} {metric['current']:>12.2f} "
+              f"{metric['change']:>+8.1%}{flag}")
+
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    解析命令行参数
+
+    Returns:
+        argparse.Namespace: 解析后的参数
+    """
+    parser = argparse.ArgumentParser(description='对完整的 main.py 队列流水线进行并发压力测试')
+    parser.add_argument('--concurrency', '-n', type=int, default=4, help='同时运行的任务数，默认: 4')
+    parser.add_argument('--workers', '-w', type=int, default=2, help='main.py 工作进程数，默认: 2')
+    parser.add_argument('--stage-workers',
+                        help='按阶段分配工作进程，例如 download=2,transcribe=1,compose=2，指定时忽略 --workers')
+    parser.add_argument('--duration', '-d', type=float, default=300, help='持续加入新任务的时长（秒），默认: 300')
+    parser.add_argument('--drain-timeout', type=float, default=600,
+                        help='时长结束后等待运行中的任务完成的最长时间（秒），默认: 600')
+    parser.add_argument('--video', action='append', default=[],
+                        help='用作模板的视频文件（可多次指定），默认生成无语音的合成视频')
+    parser.add_argument('--video-seconds', type=float, default=30, help='合成视频的时长（秒），默认: 30')
+    parser.add_argument('--pipeline-args', default='',
+                        help='传给 main.py 的其他参数，例如 "--model base --renditions default"')
+    parser.add_argument('--media-latency', type=float, default=0.0, help='媒体服务器的首字节延迟（秒）')
+    parser.add_argument('--media-rate', type=int, default=0, help='媒体服务器每个连接的限速（字节/秒），默认不限速')
+    parser.add_argument('--media-error-rate', type=float, default=0.0, help='媒体服务器返回 503 的请求比例')
+    parser.add_argument('--translate-latency', type=float, default=0.05, help='模拟翻译后端的基础延迟（秒），默认: 0.05')
+    parser.add_argument('--translate-slow-rate', type=float, default=0.05,
+                        help='fake-primary 中慢请求的比例，默认: 0.05')
+    parser.add_argument('--translate-slow', type=float, default=3.0, help='慢请求的延迟（秒），默认: 3')
+    parser.add_argument('--translate-error-rate', type=float, default=0.05,
+                        help='fake-primary 返回错误的比例，默认: 0.05')
+    parser.add_argument('--sample-interval', type=float, default=2.0, help='资源采样间隔（秒），默认: 2')
+    parser.add_argument('--run-dir', help='运行目录（队列、输出、日志），默认新建临时目录')
+    parser.add_argument('--output', '-o', help='报告文件路径，默认 <运行目录>/report.json')
+    parser.add_argument('--baseline', help='与该报告比较，有指标退化或资源泄漏时以状态码 1 退出')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='只比较两份已有的报告，不运行测试')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的相对退化比例，默认: 0.1')
+    parser.add_argument('--max-fd-slope', type=float, default=2.0,
+                        help='文件描述符每分钟增长超过该值视为泄漏（运行中的任务本身会带来波动），默认: 2')
+    return parser.parse_args(argv)
+
+def main() -> int:
+    # 内部使用：作为压测的工作进程运行 main.py
+    if len(sys.argv) > 2 and sys.argv[1] == '--worker-process':
+        separator = sys.argv.index('--')
+        run_worker_process(sys.argv[2], sys.argv[separator + 1:])
+        return 0
+
+    args = parse_arguments()
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f))
+        baseline, report = reports
+    else:
+        load_test = LoadTest(args)
+        report = load_test.run()
+        output = args.output or os.path.join(load_test.run_dir, 'report.json')
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_report(report)
+        print(f"报告: {output}")
+        if not args.baseline:
+            return 0
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    comparison = compare_reports(baseline, report, args.tolerance)
+    print_comparison(comparison)
+    problems = check_leaks(report, args.max_fd_slope)
+    for problem in problems:
+        print(f"❌ {problem}")
+    regressions = [metric['metric'] for metric in comparison['metrics'] if metric['regression']]
+    if regressions or problems:
+        print(f"门禁未通过: {len(regressions)} 项指标退化，{len(problems)} 项资源问题")
+        return 1
+    print("门禁通过")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,10 @@ YouTube Short 下载与中文字幕生成工具
 import os
 import sys
 import argparse
+import shlex
 import time
-from typing import Optional
+from typing import Optional, Dict, Any, List
+from concurrent.futures import wait
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -18,24 +20,72 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 # 导入项目模块
 from downloader import YouTubeDownloader
 from translator import AudioTranslator
-from compositor import VideoCompositor
+from compositor import VideoCompositor, Rendition
+from artifacts import ArtifactStore
+from ffmpeg_runner import FFmpegRunner
+from events import EventBus, ConsoleReporter
+from job_queue import JobQueue, Lease, run_worker, default_worker_id
+from model_scheduler import ModelScheduler
+from translation_pool import TranslationPool, BACKENDS, create_backends
+from fingerprint import FingerprintIndex
 
-def parse_arguments():
+def parse_timestamp(value: str) -> float:
+    """
+    解析命令行中的时间点，支持秒数（如 90.5）或 [时:]分:秒（如 1:30、0:01:30）
+    
+    Args:
+        value: 时间字符串
+        
+    Returns:
+        float: 秒数
+    """
+    try:
+        seconds = 0.0
+        for part in value.split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的时间: {value}")
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(f"时间不能为负数: {value}")
+    return seconds
+
+def parse_arguments(argv: Optional[List[str]] = None):
     """
     解析命令行参数
     
+    Args:
+        argv: 可选的参数列表，默认读取 sys.argv
+        
     Returns:
         argparse.Namespace: 解析后的参数
     """
     parser = argparse.ArgumentParser(description='YouTube Short 下载与中文字幕生成工具')
     
-    parser.add_argument('url', help='YouTube Short 视频的URL')
+    parser.add_argument('url', nargs='?', help='YouTube Short 视频的URL')
     parser.add_argument('--output-dir', '-o', default='./downloads',
                       help='输出目录，默认: ./downloads')
     parser.add_argument('--filename', '-f', help='自定义输出文件名（不含扩展名）')
     parser.add_argument('--model', '-m', default='base',
-                      choices=['tiny', 'base', 'small', 'medium', 'large'],
-                      help='Whisper 模型大小，默认: base')
+                      choices=['auto'] + list(ModelScheduler.MODELS),
+                      help='Whisper 模型大小，auto 表示按音频时长、排队情况和本机实测速度自动选择，默认: base')
+    parser.add_argument('--target-seconds', type=float,
+                      help='使用 --model auto 时每个任务的目标识别耗时（秒），默认与音频时长相同')
+    parser.add_argument('--escalate', action='store_true',
+                      help='识别结果置信度低时换用大一级的模型重新识别')
+    parser.add_argument('--translators', default='google,mymemory',
+                      help=f"翻译后端，逗号分隔，按优先级排列，可选: {', '.join(BACKENDS)}，默认: google,mymemory")
+    parser.add_argument('--translate-timeout', type=float, default=10,
+                      help='单次翻译请求的超时时间（秒），超时后换用其他后端，默认: 10')
+    parser.add_argument('--no-hedge', action='store_true',
+                      help='不向第二个翻译后端发送对冲请求')
+    parser.add_argument('--stream', action='store_true',
+                      help='流式处理长视频：按窗口识别和翻译，字幕逐条写入，内存占用与视频时长无关，中断后可以继续')
+    parser.add_argument('--window-seconds', type=float, default=300,
+                      help='使用 --stream 时每次识别的音频长度（秒），默认: 300')
+    parser.add_argument('--dedup', action='store_true',
+                      help='用声学指纹识别以前处理过的相同音频，复用相同设置下的字幕和翻译')
+    parser.add_argument('--dedup-threshold', type=float, default=0.2,
+                      help='声学指纹误码率低于该值时视为相同音频（无关音频约为 0.5），默认: 0.2')
     parser.add_argument('--font-size', type=int, default=24,
                       help='字幕字体大小，默认: 24')
     parser.add_argument('--font', default='Hiragino Sans GB',
@@ -44,8 +94,65 @@ def parse_arguments():
                       help='跳过下载步骤，直接处理本地视频')
     parser.add_argument('--video-path', help='本地视频文件路径（当使用--skip-download时）')
     parser.add_argument('--cookies', help='YouTube cookies文件路径，用于绕过机器人验证')
+    parser.add_argument('--pipeline', action='store_true',
+                      help='先下载音频流并立即开始语音识别，视频在后台继续下载')
+    parser.add_argument('--cache-quota', type=float,
+                      help='输出目录中产物文件的磁盘配额（MB），超出时按LRU淘汰，默认不限制')
+    parser.add_argument('--cleanup', default='on_success', choices=list(ArtifactStore.CLEANUP_POLICIES),
+                      help='中间文件（提取的音频等）的清理策略，默认: on_success')
+    parser.add_argument('--asr-workers', type=int, default=0,
+                      help='语音识别工作进程数，大于0时各进程共享同一份mmap的模型权重（仅CPU），默认: 0')
+    parser.add_argument('--ffmpeg-threads', type=int,
+                      help='所有ffmpeg进程共享的线程预算，默认: CPU核数')
+    parser.add_argument('--max-encodes', type=int, default=2,
+                      help='同时运行的ffmpeg进程数上限，默认: 2')
+    parser.add_argument('--ffmpeg-timeout', type=float,
+                      help='单次ffmpeg运行的超时时间（秒），默认不限制')
+    parser.add_argument('--ffmpeg-stall-timeout', type=float, default=60,
+                      help='ffmpeg没有任何进度输出多久后视为卡死并终止（秒），默认: 60')
+    parser.add_argument('--start', type=parse_timestamp,
+                      help='只处理从该时间点开始的片段，格式为秒数或 [时:]分:秒')
+    parser.add_argument('--end', type=parse_timestamp,
+                      help='只处理到该时间点为止的片段，格式为秒数或 [时:]分:秒')
+    parser.add_argument('--renditions',
+                      help='一次输出多档分辨率，逗号分隔，每项为 宽x高[:码率[:预设]]，'
+                           '例如 1080x1920:4M,720x1280:2500k,480x854:1M:fast；default 表示这三档')
+    parser.add_argument('--preview', default='off', choices=['off', 'first', 'only'],
+                      help='字幕预览: first 先渲染低分辨率预览再完整编码，only 只渲染预览，默认: off')
+    parser.add_argument('--preview-height', type=int, default=480,
+                      help='预览视频的高度（像素），默认: 480')
+    parser.add_argument('--preview-fps', type=float,
+                      help='预览视频的帧率，默认保持原帧率')
+    parser.add_argument('--srt', help='使用已有的中文字幕文件，跳过语音识别和翻译（例如审核预览后进行完整编码）')
+    parser.add_argument('--queue', help='任务队列数据库路径（SQLite），多台机器共用时放在共享存储上')
+    parser.add_argument('--enqueue', action='store_true',
+                      help='把任务加入 --queue 指定的队列而不是立即处理')
+    parser.add_argument('--worker', action='store_true',
+                      help='作为工作进程从 --queue 指定的队列领取任务')
+    parser.add_argument('--stages', default=','.join(JobQueue.STAGES),
+                      help=f"工作进程处理的阶段，逗号分隔，默认: {','.join(JobQueue.STAGES)}")
+    parser.add_argument('--lease-seconds', type=float, default=300,
+                      help='任务租约时长（秒），工作进程失联超过该时间后任务会被重新领取，默认: 300')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                      help='每个阶段的最大尝试次数，默认: 3')
+    parser.add_argument('--drain', action='store_true',
+                      help='队列中没有未完成的任务后工作进程退出，默认一直运行')
     
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if (args.enqueue or args.worker) and not args.queue:
+        parser.error('--enqueue 和 --worker 需要同时指定 --queue')
+    if not args.url and not args.skip_download and not args.worker:
+        parser.error('请提供视频URL，或使用 --skip-download 处理本地视频')
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error('--end 必须晚于 --start')
+    if args.window_seconds < 30:
+        parser.error('--window-seconds 不能小于 30（Whisper 每次解码 30 秒）')
+    if args.renditions:
+        try:
+            Rendition.parse(args.renditions)
+        except ValueError as e:
+            parser.error(f"无效的 --renditions: {e}")
+    return args
 
 def process_video(args):
     """
@@ -60,22 +167,81 @@ def process_video(args):
         # 创建输出目录
         os.makedirs(args.output_dir, exist_ok=True)
         
-        # 1. 下载视频（如果需要）
-        if args.skip_download:
-            if not args.video_path:
-                print("错误: 使用 --skip-download 时必须提供 --video-path")
-                return
-            if not os.path.exists(args.video_path):
-                print(f"错误: 视频文件不存在: {args.video_path}")
-                return
-            video_info = {
-                'video_path': args.video_path,
-                'title': os.path.splitext(os.path.basename(args.video_path))[0]
-            }
-            print(f"跳过下载，使用本地视频: {args.video_path}")
-        else:
-            downloader = YouTubeDownloader(output_dir=args.output_dir)
-            video_info = downloader.download_short(args.url, filename=args.filename, cookies=args.cookies)
+        # 各模块通过事件总线报告状态，控制台输出只是其中一个订阅者
+        job_id = f"{int(start_time)}-{os.getpid()}"
+        bus = EventBus()
+        bus.subscribe(ConsoleReporter())
+        events = bus.for_job(job_id)
+        
+        # 登记本次任务产生的文件，任务结束后按策略清理并检查磁盘配额
+        quota_bytes = int(args.cache_quota * 1024 * 1024) if args.cache_quota else None
+        store = ArtifactStore(args.output_dir, quota_bytes=quota_bytes, cleanup_policy=args.cleanup, events=events)
+        
+        # 配置所有ffmpeg进程共享的线程预算和并发上限
+        FFmpegRunner.configure(thread_budget=args.ffmpeg_threads, max_concurrent=args.max_encodes)
+        
+        if args.enqueue:
+            enqueue_job(args, events)
+            return
+        if args.worker:
+            run_queue_worker(args, store, events)
+            return
+        
+        with store.job(job_id):
+            run_job(args, store, job_id, events, start_time)
+        
+    except KeyboardInterrupt:
+        print("\n操作已取消")
+    except Exception as e:
+        print(f"\n❌ 处理过程中出错: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def run_job(args, store: ArtifactStore, job_id: str, events: EventBus, start_time: float):
+    """
+    执行一次完整的下载、识别、翻译和合成流程
+    
+    Args:
+        args: 命令行参数
+        store: 产物登记簿
+        job_id: 当前任务ID
+        events: 当前任务的事件总线
+        start_time: 任务开始时间
+    """
+    # 1. 下载视频（如果需要）
+    if args.skip_download:
+        if not args.video_path:
+            print("错误: 使用 --skip-download 时必须提供 --video-path")
+            return
+        if not os.path.exists(args.video_path):
+            print(f"错误: 视频文件不存在: {args.video_path}")
+            return
+        video_info = {
+            'video_path': args.video_path,
+            'title': os.path.splitext(os.path.basename(args.video_path))[0]
+        }
+        # 如果本地视频是之前登记过的缓存，刷新其访问时间并在任务期间保护它
+        store.touch(args.video_path, job_id=job_id)
+        print(f"跳过下载，使用本地视频: {args.video_path}")
+    elif args.pipeline and not args.srt:
+        # 复用已有字幕时不需要先下载音频，直接下载视频
+        downloader = YouTubeDownloader(output_dir=args.output_dir, artifact_store=store, job_id=job_id,
+                                       events=events)
+        video_info = downloader.download_short_pipelined(args.url, filename=args.filename, cookies=args.cookies,
+                                                         start=args.start, end=args.end)
+    else:
+        downloader = YouTubeDownloader(output_dir=args.output_dir, artifact_store=store, job_id=job_id,
+                                       events=events)
+        video_info = downloader.download_short(args.url, filename=args.filename, cookies=args.cookies,
+                                               start=args.start, end=args.end)
+    
+    # 流水线模式下视频仍在后台下载；后续步骤出错时中止它并等待线程结束，避免阻塞进程退出
+    video_future = video_info.pop('video_future', None)
+    video_cancel = video_info.pop('video_cancel', None)
+    try:
+        # 只下载了片段时，后续阶段直接处理整个片段；本地视频则在提取和编码时定位到时间窗口。
+        # 两种情况下字幕时间轴都从窗口起点算起，与输出的片段对齐
+        window = {} if video_info.get('clipped') else {'start': args.start, 'end': args.end}
         
         print("=" * 50)
         print(f"视频信息:")
@@ -83,30 +249,98 @@ def process_video(args):
         print(f"路径: {video_info['video_path']}")
         if 'duration' in video_info:
             print(f"时长: {video_info['duration']} 秒")
+        if args.start is not None or args.end is not None:
+            print(f"处理片段: {args.start or 0} 秒 - {'结尾' if args.end is None else f'{args.end} 秒'}")
         print("=" * 50)
         
         # 2. 音频提取、语音识别和翻译
-        print("\n开始处理音频和字幕...")
-        translator = AudioTranslator(model_name=args.model)
-        translation_result = translator.process_video(video_info['video_path'])
+        ffmpeg_runner = FFmpegRunner(timeout=args.ffmpeg_timeout, stall_timeout=args.ffmpeg_stall_timeout,
+                                     events=events)
+        if args.srt:
+            # 复用已经生成（并审核过）的字幕，不再重新识别和翻译
+            if not os.path.exists(args.srt):
+                print(f"错误: 字幕文件不存在: {args.srt}")
+                return
+            store.touch(args.srt, job_id=job_id)
+            subtitle_path = args.srt
+            print(f"\n使用已有字幕，跳过语音识别和翻译: {subtitle_path}")
+        else:
+            print("\n开始处理音频和字幕...")
+            # 只有自动选择或升级模型时才需要调度器；固定模型时不测量实时率，也就不会改写 rtf.json
+            scheduler = None
+            if args.model == 'auto' or args.escalate:
+                scheduler = ModelScheduler(target_seconds=args.target_seconds, events=events)
+            translator = AudioTranslator(model_name=args.model, artifact_store=store, job_id=job_id,
+                                         ffmpeg_runner=ffmpeg_runner, events=events, num_workers=args.asr_workers,
+                                         model_scheduler=scheduler, escalate=args.escalate,
+                                         translation_pool=build_translation_pool(args, events),
+                                         fingerprint_index=build_fingerprint_index(args, events))
+            try:
+                if args.stream:
+                    translation_result = translator.process_video_streaming(
+                        video_info['video_path'], audio_source=video_info.get('audio_path'),
+                        window_seconds=args.window_seconds, **window)
+                else:
+                    translation_result = translator.process_video(video_info['video_path'],
+                                                                  audio_source=video_info.get('audio_path'), **window)
+                if translator.worker_pool:
+                    translator.worker_pool.memory_report()
+            finally:
+                translator.close()
+            subtitle_path = translation_result['translated_srt_path']
         
-        print("=" * 50)
-        print("语音识别和翻译完成:")
-        print(f"原始英文字幕: {translation_result['original_srt_path']}")
-        print(f"中文字幕: {translation_result['translated_srt_path']}")
-        print(f"识别文本长度: {len(translation_result['transcription'])} 字符")
-        print(f"字幕片段数量: {len(translation_result['segments'])}")
-        print("=" * 50)
+            print("=" * 50)
+            print("语音识别和翻译完成:")
+            print(f"原始英文字幕: {translation_result['original_srt_path']}")
+            print(f"中文字幕: {translation_result['translated_srt_path']}")
+            if 'segments' in translation_result:
+                print(f"识别文本长度: {len(translation_result['transcription'])} 字符")
+                print(f"字幕片段数量: {len(translation_result['segments'])}")
+            else:
+                print(f"字幕片段数量: {translation_result['segment_count']}")
+            print(f"识别模型: {translation_result['model']}")
+            print("=" * 50)
+        
+        # 流水线模式下，合成前等待后台视频下载完成
+        if video_future is not None:
+            print("\n等待后台视频下载完成...")
+            video_info.update(video_future.result())
+        
+        compositor = VideoCompositor(artifact_store=store, job_id=job_id, ffmpeg_runner=ffmpeg_runner,
+                                     events=events)
+        
+        # 先渲染低分辨率预览，便于在完整编码前检查字幕时间轴
+        if args.preview != 'off':
+            preview_path = compositor.render_preview(
+                video_path=video_info['video_path'],
+                subtitle_path=subtitle_path,
+                font_size=args.font_size,
+                font=args.font,
+                height=args.preview_height,
+                fps=args.preview_fps,
+                **window
+            )
+            print("=" * 50)
+            print(f"👀 字幕预览: {preview_path}")
+            if args.preview == 'only':
+                print("确认字幕无误后，可以用以下参数复用同一字幕进行完整编码:")
+                window_hint = "".join(f" --{key} {value}" for key, value in window.items() if value is not None)
+                print(f"  --skip-download --video-path {shlex.quote(video_info['video_path'])} "
+                      f"--srt {shlex.quote(subtitle_path)}{window_hint}")
+                print("=" * 50)
+                return
+            print("=" * 50)
         
         # 3. 视频合成
         print("\n开始合成视频与字幕...")
-        compositor = VideoCompositor()
         composition_result = compositor.process_video_with_subtitles(
             video_path=video_info['video_path'],
-            subtitle_path=translation_result['translated_srt_path'],
+            subtitle_path=subtitle_path,
             output_dir=args.output_dir,
             font_size=args.font_size,
-            font=args.font
+            font=args.font,
+            renditions=Rendition.parse(args.renditions) if args.renditions else None,
+            **window
         )
         
         # 4. 总结
@@ -117,16 +351,240 @@ def process_video(args):
         print("✅ 处理完成！")
         print(f"📹 原始视频: {composition_result['original_video']}")
         print(f"📝 字幕文件: {composition_result['subtitle_file']}")
-        print(f"🎬 输出视频: {composition_result['output_video']}")
+        if 'renditions' in composition_result:
+            for name, path in composition_result['renditions'].items():
+                print(f"🎬 输出视频 {name}: {path}")
+        else:
+            print(f"🎬 输出视频: {composition_result['output_video']}")
         print(f"⏱️  总耗时: {total_time:.2f} 秒")
         print("=" * 50)
+    finally:
+        if video_future is not None and not video_future.done():
+            video_cancel.set()
+            wait([video_future])
+
+def build_translation_pool(args, events: EventBus) -> TranslationPool:
+    """
+    按命令行参数创建翻译后端池
+    
+    Args:
+        args: 命令行参数
+        events: 事件总线
         
-    except KeyboardInterrupt:
-        print("\n操作已取消")
-    except Exception as e:
-        print(f"\n❌ 处理过程中出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    Returns:
+        TranslationPool: 翻译后端池
+    """
+    names = [name.strip() for name in args.translators.split(',') if name.strip()]
+    backends = create_backends(names, timeout=args.translate_timeout)
+    return TranslationPool(backends, hedge=not args.no_hedge, events=events)
+
+def build_fingerprint_index(args, events: EventBus) -> Optional[FingerprintIndex]:
+    """
+    按命令行参数创建声学指纹索引
+    
+    Args:
+        args: 命令行参数
+        events: 事件总线
+        
+    Returns:
+        Optional[FingerprintIndex]: 指纹索引；没有使用 --dedup 时为 None
+    """
+    if not args.dedup:
+        return None
+    return FingerprintIndex(max_bit_error_rate=args.dedup_threshold, events=events)
+
+def open_queue(args, events: EventBus) -> JobQueue:
+    """
+    打开命令行参数指定的任务队列
+    
+    Args:
+        args: 命令行参数
+        events: 事件总线
+        
+    Returns:
+        JobQueue: 任务队列
+    """
+    return JobQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts, events=events)
+
+def enqueue_job(args, events: EventBus) -> int:
+    """
+    把当前命令行指定的视频加入任务队列，由工作进程处理
+    
+    与具体任务相关的参数（URL、模型、字体等）保存在任务中；线程数、配额等与机器相关的
+    参数由各工作进程自己的命令行决定。路径会转成绝对路径，多机使用时应位于共享存储上。
+    
+    Args:
+        args: 命令行参数
+        events: 事件总线
+        
+    Returns:
+        int: 任务ID
+    """
+    queue = open_queue(args, events)
+    payload = build_job_payload(args)
+    stage = None
+    if args.skip_download:
+        if not args.video_path or not os.path.exists(args.video_path):
+            raise FileNotFoundError(f"视频文件不存在: {args.video_path}")
+        payload['video_path'] = os.path.abspath(args.video_path)
+        stage = 'transcribe'
+    
+    queue_job_id = queue.enqueue(payload, stage=stage)
+    print(f"已加入队列: 任务 #{queue_job_id}（{args.queue}）")
+    return queue_job_id
+
+def build_job_payload(args) -> Dict[str, Any]:
+    """
+    从命令行参数中取出与具体任务相关的设置，作为队列任务的参数
+    
+    Args:
+        args: 命令行参数
+        
+    Returns:
+        Dict: 任务参数，路径已转成绝对路径
+    """
+    return {
+        'url': args.url,
+        'filename': args.filename,
+        'cookies': os.path.abspath(args.cookies) if args.cookies else None,
+        'model': args.model,
+        'target_seconds': args.target_seconds,
+        'escalate': args.escalate,
+        'stream': args.stream,
+        'window_seconds': args.window_seconds,
+        'font': args.font,
+        'renditions': args.renditions,
+        'font_size': args.font_size,
+        'output_dir': os.path.abspath(args.output_dir),
+        'start': args.start,
+        'end': args.end,
+    }
+
+def run_queue_worker(args, store: ArtifactStore, events: EventBus) -> int:
+    """
+    作为工作进程从任务队列中领取并处理指定阶段的任务
+    
+    每个阶段的输出（视频路径、字幕路径等）写回任务状态，下一阶段可以由其他机器上的
+    工作进程继续处理，因此输出目录需要位于所有机器共享的存储上。
+    
+    Args:
+        args: 命令行参数（本机的线程数、配额等设置）
+        store: 产物登记簿
+        events: 事件总线
+        
+    Returns:
+        int: 成功完成的阶段数
+    """
+    queue = open_queue(args, events)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in JobQueue.STAGES]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}")
+    
+    ffmpeg_runner = FFmpegRunner(timeout=args.ffmpeg_timeout, stall_timeout=args.ffmpeg_stall_timeout,
+                                 events=events)
+    # 加载Whisper模型开销较大，同一工作进程内按模型设置复用
+    translators = {}
+    
+    def artifact_store_for(payload):
+        """任务指定了其他输出目录时，在该目录下登记产物"""
+        if os.path.abspath(payload['output_dir']) == os.path.abspath(args.output_dir):
+            return store
+        return ArtifactStore(payload['output_dir'], quota_bytes=store.quota_bytes,
+                             cleanup_policy=store.cleanup_policy, events=events)
+    
+    def hold_artifacts(lease: Lease):
+        """
+        以队列任务为单位占用产物：从下载开始到最后一个阶段完成或最终失败，
+        各阶段之间视频和字幕都不会被配额淘汰，中间文件也留给后续阶段使用
+        """
+        task_store = artifact_store_for(lease.payload)
+        task_job_id = f"queue-{lease.job_id}"
+        task_store.hold(task_job_id)
+        return task_store, task_job_id
+    
+    def release_artifacts(lease: Lease, success: bool):
+        """任务全部完成或最终失败后释放占用，并按清理策略删除中间文件"""
+        artifact_store_for(lease.payload).end_job(f"queue-{lease.job_id}", success=success)
+    
+    def download(lease: Lease):
+        payload = lease.payload
+        task_store, task_job_id = hold_artifacts(lease)
+        downloader = YouTubeDownloader(output_dir=payload['output_dir'], artifact_store=task_store,
+                                       job_id=task_job_id, events=events)
+        video_info = downloader.download_short(payload['url'], filename=payload.get('filename'),
+                                               cookies=payload.get('cookies'), start=payload.get('start'),
+                                               end=payload.get('end'))
+        return {key: video_info.get(key) for key in ('video_path', 'title', 'duration', 'clipped')}
+    
+    def window_for(lease: Lease):
+        """下载阶段已经只下载了片段时，后续阶段处理整个片段"""
+        if lease.state.get('clipped'):
+            return {}
+        return {'start': lease.payload.get('start'), 'end': lease.payload.get('end')}
+    
+    def transcribe(lease: Lease):
+        payload = lease.payload
+        video_path = lease.state.get('video_path') or payload['video_path']
+        task_store, task_job_id = hold_artifacts(lease)
+        task_store.touch(video_path, job_id=task_job_id)
+        key = (payload['model'], payload.get('target_seconds'), payload.get('escalate', False))
+        translator = translators.get(key)
+        if translator is None:
+            scheduler = None
+            if payload['model'] == 'auto' or payload.get('escalate', False):
+                scheduler = ModelScheduler(target_seconds=payload.get('target_seconds'), events=events)
+            translator = AudioTranslator(model_name=payload['model'], ffmpeg_runner=ffmpeg_runner,
+                                         events=events, num_workers=args.asr_workers,
+                                         model_scheduler=scheduler, escalate=payload.get('escalate', False),
+                                         translation_pool=build_translation_pool(args, events),
+                                         fingerprint_index=build_fingerprint_index(args, events))
+            translators[key] = translator
+        translator.artifact_store = task_store
+        translator.job_id = task_job_id
+        # 自动选择模型时，排队等待识别的任务越多，每个任务分到的时间越少
+        queue_depth = queue.counts()['transcribe']['pending']
+        if payload.get('stream'):
+            # 租约过期后由其他工作进程重新领取时，从共享存储上的检查点继续
+            translation_result = translator.process_video_streaming(
+                video_path, queue_depth=queue_depth, window_seconds=payload['window_seconds'],
+                **window_for(lease))
+        else:
+            translation_result = translator.process_video(video_path, queue_depth=queue_depth,
+                                                          **window_for(lease))
+        return {
+            'video_path': video_path,
+            'original_srt_path': translation_result['original_srt_path'],
+            'translated_srt_path': translation_result['translated_srt_path'],
+            'model': translation_result['model'],
+        }
+    
+    def compose(lease: Lease):
+        payload = lease.payload
+        task_store, task_job_id = hold_artifacts(lease)
+        task_store.touch(lease.state['video_path'], job_id=task_job_id)
+        task_store.touch(lease.state['translated_srt_path'], job_id=task_job_id)
+        compositor = VideoCompositor(artifact_store=task_store, job_id=task_job_id,
+                                     ffmpeg_runner=ffmpeg_runner, events=events)
+        composition_result = compositor.process_video_with_subtitles(
+            video_path=lease.state['video_path'],
+            subtitle_path=lease.state['translated_srt_path'],
+            output_dir=payload['output_dir'],
+            font_size=payload['font_size'],
+            font=payload['font'],
+            renditions=Rendition.parse(payload['renditions']) if payload.get('renditions') else None,
+            **window_for(lease)
+        )
+        return {'output_video': composition_result['output_video'],
+                'renditions': composition_result.get('renditions')}
+    
+    handlers = {'download': download, 'transcribe': transcribe, 'compose': compose}
+    try:
+        return run_worker(queue, handlers, stages=stages, worker_id=default_worker_id(), drain=args.drain,
+                          on_finished=release_artifacts)
+    finally:
+        for translator in translators.values():
+            translator.close()
 
 def check_dependencies():
     """
@@ -1,8 +1,17 @@
 """YouTube Short 下载与中文字幕生成工具包"""
 
+import os
+import sys
+
+# 包内模块之间按顶层模块名互相导入（与 main.py 一样把 src 目录加入导入路径），
+# 作为包导入时同样加入，并从同一批模块导出，避免同一模块以两个名字各加载一份
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
 # 从各个模块导入主要类和函数
-from .downloader import YouTubeDownloader
-from .translator import AudioTranslator
+from downloader import YouTubeDownloader
+from translator import AudioTranslator
 # 暂时移除compositor的导入，避免依赖问题
 
 __version__ = "0.1.0"
@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import fcntl
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Iterator
+
+from events import EventBus
+
+class ArtifactStore:
+    """
+    产物登记簿：记录下载视频、提取的音频、字幕和合成输出等文件，
+    在磁盘配额内按 LRU 淘汰缓存，并按策略清理中间文件
+
+    索引保存在 root 目录下的 JSON 文件中，读写时加文件锁，
+    因此多个进程可以共用一个产物目录。任务记录了所在的主机和进程，
+    本机任务按进程是否存在判断是否结束；共享存储上其他机器的任务无法检查进程，
+    在期限内一直视为仍在运行。
+    """
+
+    INDEX_FILENAME = ".artifacts.json"
+    LOCK_FILENAME = ".artifacts.lock"
+
+    # cache: 可复用的缓存（下载的视频、字幕）；intermediate: 中间文件（提取的音频）；output: 最终输出
+    KINDS = ('cache', 'intermediate', 'output')
+
+    # keep: 保留中间文件；on_success: 任务成功后清理；always: 任务结束后总是清理
+    CLEANUP_POLICIES = ('keep', 'on_success', 'always')
+
+    # 任务的默认期限（秒），超过期限仍没有结束或续期的任务视为已放弃
+    JOB_TTL_SECONDS = 24 * 3600
+
+    def __init__(self, root: str, quota_bytes: Optional[int] = None, cleanup_policy: str = 'on_success',
+                 events: Optional[EventBus] = None):
+        """
+        初始化产物登记簿
+
+        Args:
+            root: 存放索引文件的目录，通常就是输出目录
+            quota_bytes: 所有登记文件的总字节数上限，None 表示不限制
+            cleanup_policy: 中间文件的清理策略，取值见 CLEANUP_POLICIES
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        if cleanup_policy not in self.CLEANUP_POLICIES:
+            raise ValueError(f"Unknown cleanup policy: {cleanup_policy}")
+
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.cleanup_policy = cleanup_policy
+        self.events = events or EventBus.with_console()
+        self.index_path = os.path.join(root, self.INDEX_FILENAME)
+        self.lock_path = os.path.join(root, self.LOCK_FILENAME)
+        self._thread_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[Dict[str, Any]]:
+        """
+        加锁读取索引，退出时写回
+
+        Yields:
+            Dict: 索引内容，包含 entries 和 jobs 两部分
+        """
+        with self._thread_lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = {'entries': {}, 'jobs': {}}
+                if os.path.exists(self.index_path):
+                    try:
+                        with open(self.index_path, 'r', encoding='utf-8') as f:
+                            index.update(json.load(f))
+                    except (OSError, ValueError) as e:
+                        self.events.warning('artifacts', f"产物索引损坏，将重新建立: {e}")
+
+                yield index
+
+                # 先写临时文件再替换，避免写到一半被中断导致索引损坏
+                tmp_path = self.index_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(index, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def track(self, path: str, job_id: Optional[str] = None, kind: str = 'cache') -> str:
+        """
+        登记一个新写入的文件，并在超出配额时触发淘汰
+
+        Args:
+            path: 文件路径
+            job_id: 产生该文件的任务ID
+            kind: 文件类别，取值见 KINDS
+
+        Returns:
+            str: 文件路径（原样返回，便于链式使用）
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        if not os.path.isfile(path):
+            return path
+
+        key = os.path.abspath(path)
+        now = time.time()
+        with self._locked_index() as index:
+            index['entries'][key] = {
+                'size': os.path.getsize(key),
+                'kind': kind,
+                'job_id': job_id,
+                'created': now,
+                'last_access': now,
+            }
+            if job_id and job_id in index['jobs']:
+                job = index['jobs'][job_id]
+                if key not in job['paths']:
+                    job['paths'].append(key)
+            self._evict_locked(index)
+
+        return path
+
+    def touch(self, path: str, job_id: Optional[str] = None) -> None:
+        """
+        记录一次对已登记文件的访问；如果给出 job_id，该文件在任务结束前不会被淘汰
+
+        Args:
+            path: 文件路径
+            job_id: 正在使用该文件的任务ID
+        """
+        key = os.path.abspath(path)
+        with self._locked_index() as index:
+            entry = index['entries'].get(key)
+            if entry is None:
+                return
+            entry['last_access'] = time.time()
+            if job_id and job_id in index['jobs'] and key not in index['jobs'][job_id]['paths']:
+                index['jobs'][job_id]['paths'].append(key)
+
+    def begin_job(self, job_id: str, ttl_seconds: Optional[float] = None) -> None:
+        """
+        标记任务开始，任务使用的文件在结束前都不会被淘汰
+
+        Args:
+            job_id: 任务ID
+            ttl_seconds: 其他机器判断任务是否仍在运行时使用的期限（秒），默认 JOB_TTL_SECONDS；
+                         本机按进程是否存在判断
+        """
+        now = time.time()
+        with self._locked_index() as index:
+            index['jobs'][job_id] = {'pid': os.getpid(), 'host': socket.gethostname(), 'started': now,
+                                     'expires': now + (ttl_seconds or self.JOB_TTL_SECONDS), 'paths': []}
+
+    def hold(self, job_id: str, ttl_seconds: Optional[float] = None) -> None:
+        """
+        标记一个跨进程的任务（例如队列中分多个阶段、由不同工作进程处理的任务）仍在进行，
+        任务使用的文件在 end_job 之前都不会被淘汰，中间文件也不会被清理
+
+        与 begin_job 不同，持有者不绑定进程：重复调用会保留已登记的文件并延长期限，
+        超过 ttl_seconds 仍没有续期或结束时视为已放弃，避免文件被永久占用。
+
+        Args:
+            job_id: 任务ID
+            ttl_seconds: 持有期限（秒），默认 JOB_TTL_SECONDS
+        """
+        now = time.time()
+        with self._locked_index() as index:
+            job = index['jobs'].setdefault(job_id, {'started': now, 'paths': []})
+            job['pid'] = None
+            job['host'] = socket.gethostname()
+            job['expires'] = now + (ttl_seconds or self.JOB_TTL_SECONDS)
+
+    def end_job(self, job_id: str, success: bool = True) -> List[str]:
+        """
+        标记任务结束，按清理策略删除该任务的中间文件，并重新检查配额
+
+        Args:
+            job_id: 任务ID
+            success: 任务是否成功
+
+        Returns:
+            List[str]: 被删除的文件列表
+        """
+        removed = []
+        with self._locked_index() as index:
+            index['jobs'].pop(job_id, None)
+
+            cleanup = self.cleanup_policy == 'always' or (self.cleanup_policy == 'on_success' and success)
+            if cleanup:
+                for key, entry in list(index['entries'].items()):
+                    if entry['job_id'] == job_id and entry['kind'] == 'intermediate' \
+                            and not self._is_pinned(index, key):
+                        self._remove_locked(index, key)
+                        removed.append(key)
+
+            removed.extend(self._evict_locked(index))
+
+        if removed:
+            self.events.info('artifacts', f"已清理 {len(removed)} 个产物文件")
+        return removed
+
+    @contextmanager
+    def job(self, job_id: str) -> Iterator[str]:
+        """
+        以上下文管理器的方式包裹一个任务，异常退出时视为失败
+
+        Args:
+            job_id: 任务ID
+
+        Yields:
+            str: 任务ID
+        """
+        self.begin_job(job_id)
+        success = False
+        try:
+            yield job_id
+            success = True
+        finally:
+            self.end_job(job_id, success=success)
+
+    def evict(self) -> List[str]:
+        """
+        按 LRU 淘汰文件直到总大小不超过配额
+
+        Returns:
+            List[str]: 被淘汰的文件列表
+        """
+        with self._locked_index() as index:
+            return self._evict_locked(index)
+
+    def total_bytes(self) -> int:
+        """
+        统计所有登记文件的总大小
+
+        Returns:
+            int: 字节数
+        """
+        with self._locked_index() as index:
+            self._prune_missing_locked(index)
+            return sum(entry['size'] for entry in index['entries'].values())
+
+    def _evict_locked(self, index: Dict[str, Any]) -> List[str]:
+        """在已持有锁的情况下执行 LRU 淘汰"""
+        self._prune_missing_locked(index)
+        if self.quota_bytes is None:
+            return []
+
+        total = sum(entry['size'] for entry in index['entries'].values())
+        if total <= self.quota_bytes:
+            return []
+
+        evicted = []
+        candidates = sorted(
+            (key for key in index['entries'] if not self._is_pinned(index, key)),
+            key=lambda key: index['entries'][key]['last_access']
+        )
+        for key in candidates:
+            if total <= self.quota_bytes:
+                break
+            total -= index['entries'][key]['size']
+            self._remove_locked(index, key)
+            evicted.append(key)
+
+        if total > self.quota_bytes:
+            self.events.warning('artifacts', f"正在使用的产物共 {total} 字节，超出配额 {self.quota_bytes} 字节")
+        if evicted:
+            self.events.info('artifacts', f"磁盘配额已满，按LRU淘汰了 {len(evicted)} 个文件")
+        return evicted
+
+    def _is_pinned(self, index: Dict[str, Any], key: str) -> bool:
+        """判断文件是否被仍在运行的任务使用"""
+        now = time.time()
+        hostname = socket.gethostname()
+        for job_id, job in list(index['jobs'].items()):
+            if job['pid'] is not None and job.get('host', hostname) == hostname:
+                alive = self._pid_alive(job['pid'])
+            else:
+                # 跨进程持有的任务，以及其他机器上的任务（PID 在本机没有意义），在期限内都视为仍在运行
+                alive = job.get('expires', 0) > now
+            if not alive:
+                # 进程已经退出（或任务超过期限）但没有调用 end_job，视为任务已结束
+                index['jobs'].pop(job_id)
+                continue
+            if key in job['paths']:
+                return True
+        return False
+
+    def _prune_missing_locked(self, index: Dict[str, Any]) -> None:
+        """移除已经被外部删除的文件的登记"""
+        for key in list(index['entries']):
+            if not os.path.exists(key):
+                del index['entries'][key]
+
+    def _remove_locked(self, index: Dict[str, Any], key: str) -> None:
+        """删除文件及其登记"""
+        try:
+            os.remove(key)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.events.warning('artifacts', f"删除产物文件失败: {key}: {e}")
+            return
+        index['entries'].pop(key, None)
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        """检查进程是否仍然存在"""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+# 简单的测试函数
+if __name__ == "__main__":
+    store = ArtifactStore("./downloads")
+    print(f"Artifact store loaded successfully, tracked bytes: {store.total_bytes()}")
@@ -1,36 +1,98 @@
 import os
-import subprocess
 import shlex
 from moviepy import VideoFileClip, TextClip, CompositeVideoClip, ColorClip
 from moviepy.video.tools.subtitles import SubtitlesClip
 from typing import Optional, Dict, Any, List
 import tempfile
+from dataclasses import dataclass
+
+from artifacts import ArtifactStore
+from ffmpeg_runner import FFmpegRunner, FFmpegTimeoutError, window_args, window_suffix
+from fonts import FontIndex, get_font_index
+from events import EventBus, CompositionError
+
+@dataclass
+class Rendition:
+    """一档输出规格：分辨率、码率和 x264 预设"""
+    width: int
+    height: int
+    video_bitrate: Optional[str] = None
+    preset: str = 'medium'
+    crf: int = 23
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    @classmethod
+    def parse(cls, spec: str) -> List['Rendition']:
+        """
+        解析逗号分隔的输出规格，每项格式为 宽x高[:码率[:预设]]，例如 "1080x1920:4M:medium,720x1280:2500k"；
+        "default" 表示 DEFAULT_RENDITIONS
+
+        Args:
+            spec: 规格字符串
+
+        Returns:
+            List[Rendition]: 输出规格列表
+        """
+        if spec.strip() == 'default':
+            return list(DEFAULT_RENDITIONS)
+
+        renditions = []
+        for item in spec.split(','):
+            parts = item.strip().split(':')
+            try:
+                width, height = (int(value) for value in parts[0].lower().split('x'))
+            except ValueError:
+                raise ValueError(f"Invalid rendition: {item}")
+            rendition = cls(width, height)
+            if len(parts) > 1 and parts[1]:
+                rendition.video_bitrate = parts[1]
+            if len(parts) > 2 and parts[2]:
+                rendition.preset = parts[2]
+            renditions.append(rendition)
+        return renditions
+
+# 竖屏短视频常用的三档输出
+DEFAULT_RENDITIONS = (
+    Rendition(1080, 1920, video_bitrate='4M', preset='medium'),
+    Rendition(720, 1280, video_bitrate='2500k', preset='medium'),
+    Rendition(480, 854, video_bitrate='1M', preset='fast'),
+)
 
 class VideoCompositor:
     """视频合成器，用于将原视频与字幕合并"""
     
-    def __init__(self):
-        """初始化视频合成器"""
-        pass
+    def __init__(self, artifact_store: Optional[ArtifactStore] = None, job_id: Optional[str] = None,
+                 ffmpeg_runner: Optional[FFmpegRunner] = None, font_index: Optional[FontIndex] = None,
+                 events: Optional[EventBus] = None):
+        """
+        初始化视频合成器
+        
+        Args:
+            artifact_store: 可选的产物登记簿，合成输出的视频会登记到其中
+            job_id: 当前任务ID，用于登记产物归属
+            ffmpeg_runner: 可选的ffmpeg进程管理器，用于烧录字幕
+            font_index: 可选的字体索引，默认使用进程内共享的索引
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.artifact_store = artifact_store
+        self.job_id = job_id
+        self.events = events or EventBus.with_console(job_id=job_id)
+        self.ffmpeg_runner = ffmpeg_runner or FFmpegRunner(events=self.events)
+        self.font_index = font_index or get_font_index()
+        # 同一字体只解析一次，预览和完整编码使用相同的字体
+        self._subtitle_fonts: Dict[str, tuple] = {}
     
     def _pick_font_path(self, preferred_font: str) -> str:
         """
         尝试解析用户提供的字体，优先使用中文字符集友好的字体
         """
-        # 用户直接传入字体路径
-        if preferred_font and os.path.isfile(preferred_font):
-            return preferred_font
-
-        # 常见的系统中文字体候选
-        candidates = [
-            '/System/Library/Fonts/Hiragino Sans GB.ttc',
-            '/System/Library/Fonts/STHeiti Medium.ttc',
-            '/System/Library/Fonts/STHeiti Light.ttc',
-            '/System/Library/Fonts/HelveticaNeue.ttc',  # 备用，西文字体
-        ]
-        for path in candidates:
-            if os.path.isfile(path):
-                return path
+        # 通过字体索引解析，字体不存在或不含中文字形时自动换成支持中文的字体
+        font_info = self.font_index.resolve(preferred_font, script='zh')
+        if font_info:
+            return font_info['path']
 
         # 最后退回用户给的名字，由moviepy自己解析
         return preferred_font
@@ -83,7 +145,7 @@ class VideoCompositor:
                         
                         subtitles.append(((start_time, end_time), text))
             except Exception as e:
-                print(f"解析SRT文件时出错: {str(e)}")
+                self.events.warning('compose', f"解析SRT文件时出错: {str(e)}")
             
             return subtitles
         
@@ -92,7 +154,7 @@ class VideoCompositor:
             subtitle_clips = []
             
             font_path = self._pick_font_path(font)
-            print(f"使用字幕字体: {font_path}")
+            self.events.info('compose', f"使用字幕字体: {font_path}")
 
             for (start_time, end_time), text in parsed_subtitles:
                 try:
@@ -126,13 +188,13 @@ class VideoCompositor:
                     subtitle_clips.append(txt_clip)
                     
                 except Exception as e:
-                    print(f"创建字幕剪辑时出错: {str(e)}")
+                    self.events.warning('compose', f"创建字幕剪辑时出错: {str(e)}")
                     continue
             
             return subtitle_clips
             
         except Exception as e:
-            print(f"手动创建字幕剪辑时出错: {str(e)}")
+            self.events.warning('compose', f"手动创建字幕剪辑时出错: {str(e)}")
             return []
     
     def _create_subtitle_clip_fallback(self, subtitle_path: str, video_width: int, font_size: int = 24,
@@ -177,7 +239,7 @@ class VideoCompositor:
                         
                         subtitles.append(((start_time, end_time), text))
             except Exception as e:
-                print(f"解析SRT文件时出错: {str(e)}")
+                self.events.warning('compose', f"解析SRT文件时出错: {str(e)}")
             
             return subtitles
         
@@ -200,7 +262,7 @@ class VideoCompositor:
                 )
                 return text_clip
             except Exception as e:
-                print(f"创建文本剪辑时出错: {str(e)}")
+                self.events.warning('compose', f"创建文本剪辑时出错: {str(e)}")
                 # 如果失败，返回空剪辑
                 return ColorClip((0, 0), (0, 0, 0, 0))
         
@@ -212,7 +274,7 @@ class VideoCompositor:
             subtitles = SubtitlesClip(parsed_subtitles, make_textclip)
             return subtitles
         except Exception as e:
-            print(f"SubtitlesClip创建失败，使用备用方法: {e}")
+            self.events.warning('compose', f"SubtitlesClip创建失败，使用备用方法: {e}")
             # 如果失败，回到原始的视频复制方式
             return None
     
@@ -241,7 +303,7 @@ class VideoCompositor:
     
     def add_subtitles_to_video(self, video_path: str, subtitle_path: str, output_path: Optional[str] = None,
                              font_size: int = 24, font: str = 'Hiragino Sans GB', subtitle_position: tuple = ('center', 'bottom'),
-                             margin: int = 50) -> str:
+                             margin: int = 50, start: Optional[float] = None, end: Optional[float] = None) -> str:
         """
         将字幕添加到视频中
         
@@ -253,25 +315,33 @@ class VideoCompositor:
             font: 字体名称
             subtitle_position: 字幕位置
             margin: 边距
+            start: 可选的时间窗口起点（秒），只编码窗口内的画面，字幕时间轴需从窗口起点算起
+            end: 可选的时间窗口终点（秒）
             
         Returns:
             str: 输出视频路径
+            
+        Raises:
+            CompositionError: ffmpeg 和 MoviePy 两种方案都失败时
         """
-        # 优先使用 ffmpeg 硬字幕方案，以避免 MoviePy 的兼容性问题
-        ffmpeg_output = self._add_subtitles_with_ffmpeg(
-            video_path=video_path,
-            subtitle_path=subtitle_path,
-            output_path=output_path,
-            font=font,
-            font_size=font_size
-        )
-        if ffmpeg_output:
-            return ffmpeg_output
-
-        try:
-            print(f"正在加载视频: {video_path}")
+        with self.events.stage('compose', f"正在为视频添加字幕: {video_path}", error_type=CompositionError):
+            # 优先使用 ffmpeg 硬字幕方案，以避免 MoviePy 的兼容性问题
+            ffmpeg_output = self._add_subtitles_with_ffmpeg(
+                video_path=video_path,
+                subtitle_path=subtitle_path,
+                output_path=output_path,
+                font=font,
+                font_size=font_size,
+                start=start,
+                end=end
+            )
+            if ffmpeg_output:
+                return ffmpeg_output
+            
+            self.events.info('compose', f"正在加载视频: {video_path}")
             # 使用上下文管理器加载视频以确保资源正确释放
-            with VideoFileClip(video_path) as video:
+            with VideoFileClip(video_path) as source:
+                video = source.subclipped(start or 0, end) if start or end is not None else source
                 video_width = video.w
                 
                 # 创建字幕剪辑
@@ -284,15 +354,14 @@ class VideoCompositor:
                     margin=margin
                 )
                 
-                # 如果字幕创建失败，返回原始视频
+                # 字幕创建失败时不再悄悄返回原始视频，而是抛出错误交给调用方处理
                 if not subtitle_clips:
-                    print("字幕创建失败，返回原始视频")
-                    return video_path
+                    raise CompositionError("字幕创建失败")
                 
-                print(f"成功创建 {len(subtitle_clips)} 个字幕剪辑")
+                self.events.info('compose', f"成功创建 {len(subtitle_clips)} 个字幕剪辑")
                 
                 # 合成本视频和字幕
-                print("正在合成视频和字幕...")
+                self.events.info('compose', "正在合成视频和字幕...")
                 final_clip = CompositeVideoClip([video] + subtitle_clips)
                 
                 # 生成输出路径
@@ -302,7 +371,7 @@ class VideoCompositor:
                     output_path = os.path.join(output_dir, f"{base_name}_subtitled.mp4")
                 
                 # 写入输出视频
-                print(f"正在保存视频: {output_path}")
+                self.events.info('compose', f"正在保存视频: {output_path}")
                 final_clip.write_videofile(
                     output_path,
                     fps=video.fps,
@@ -310,17 +379,133 @@ class VideoCompositor:
                     audio_codec="aac",
                     threads=4
                 )
+                if self.artifact_store:
+                    self.artifact_store.track(output_path, job_id=self.job_id, kind='output')
                 
-                print(f"字幕已成功添加到视频: {output_path}")
+                self.events.info('compose', f"字幕已成功添加到视频: {output_path}")
                 return output_path
-                
-        except Exception as e:
-            print(f"添加字幕时出错: {str(e)}")
-            # 返回原始视频路径作为备选
-            return video_path
     
+    def render_preview(self, video_path: str, subtitle_path: str, output_path: Optional[str] = None,
+                       font_size: int = 24, font: str = 'Hiragino Sans GB', height: int = 480,
+                       fps: Optional[float] = None, crf: int = 32, start: Optional[float] = None,
+                       end: Optional[float] = None) -> str:
+        """
+        快速渲染低分辨率的字幕预览，用于在完整编码前检查字幕时间轴
+
+        缩小分辨率、使用 ultrafast 预设和较高的 crf，并可以降低帧率，
+        字幕滤镜、字体解析与完整编码完全相同。
+
+        Args:
+            video_path: 原始视频路径
+            subtitle_path: SRT字幕文件路径
+            output_path: 输出路径，默认在原视频同目录下添加_preview后缀
+            font_size: 字体大小
+            font: 字体名称
+            height: 预览视频的高度（像素），宽度按比例缩放
+            fps: 可选的预览帧率，默认保持原帧率
+            crf: x264 质量参数，越大文件越小、画质越差
+            start: 可选的时间窗口起点（秒）
+            end: 可选的时间窗口终点（秒）
+
+        Returns:
+            str: 预览视频路径
+
+        Raises:
+            CompositionError: ffmpeg 渲染失败时
+        """
+        with self.events.stage('preview', f"正在渲染 {height}p 字幕预览: {video_path}", error_type=CompositionError):
+            if not output_path:
+                base_name = os.path.splitext(os.path.basename(video_path))[0]
+                output_path = os.path.join(os.path.dirname(video_path),
+                                           f"{base_name}{window_suffix(start, end)}_preview.mp4")
+
+            # 先缩小、抽帧再烧录字幕，字幕渲染只在小画面上进行
+            filters = [f"scale=-2:{int(height)}"]
+            if fps:
+                filters.append(f"fps={fps}")
+            filters.append(self._subtitles_filter(subtitle_path, font, font_size))
+
+            self.ffmpeg_runner.run(window_args(start, end) + [
+                "-i", video_path,
+                "-vf", ",".join(filters),
+                "-c:v", "libx264",
+                "-preset", "ultrafast",
+                "-crf", str(crf),
+            ] + self._audio_args(start, end) + [
+                "-threads", str(FFmpegRunner.threads_per_job()),
+                output_path
+            ], duration=self._window_duration(start, end), stage='preview', events=self.events)
+            if self.artifact_store:
+                self.artifact_store.track(output_path, job_id=self.job_id, kind='output')
+
+            self.events.info('preview', f"字幕预览已生成: {output_path}")
+            return output_path
+
+    def render_renditions(self, video_path: str, subtitle_path: str, renditions: List[Rendition],
+                          output_paths: List[str], font_size: int = 24, font: str = 'Hiragino Sans GB',
+                          start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
+        """
+        一次 ffmpeg 运行输出多档分辨率：源视频只解码一次，字幕在原始分辨率下只烧录一次，
+        然后用 split 分成多路，分别缩放并按各自的码率和预设编码
+
+        Args:
+            video_path: 原始视频路径
+            subtitle_path: SRT字幕文件路径
+            renditions: 输出规格
+            output_paths: 与 renditions 一一对应的输出路径
+            font_size: 字体大小
+            font: 字体名称
+            start: 可选的时间窗口起点（秒）
+            end: 可选的时间窗口终点（秒）
+
+        Returns:
+            List[str]: 输出路径
+
+        Raises:
+            CompositionError: ffmpeg 运行失败时
+        """
+        names = ", ".join(rendition.name for rendition in renditions)
+        with self.events.stage('compose', f"正在一次性输出 {len(renditions)} 档分辨率: {names}",
+                               error_type=CompositionError):
+            # 缩放到目标尺寸内并居中填充，保证每档输出的宽高与规格完全一致
+            labels = [f"[s{i}]" for i in range(len(renditions))]
+            graph = [f"[0:v]{self._subtitles_filter(subtitle_path, font, font_size)},"
+                     f"split={len(renditions)}{''.join(labels)}"]
+            for i, rendition in enumerate(renditions):
+                w, h = rendition.width, rendition.height
+                graph.append(f"{labels[i]}scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                             f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1[v{i}]")
+
+            args = window_args(start, end) + [
+                "-i", video_path,
+                "-filter_complex", ";".join(graph),
+            ]
+            # 所有编码器在同一个进程中运行，平分这个 ffmpeg 任务的线程预算
+            threads = max(1, FFmpegRunner.threads_per_job() // len(renditions))
+            for i, (rendition, output_path) in enumerate(zip(renditions, output_paths)):
+                args += ["-map", f"[v{i}]", "-map", "0:a?", "-c:v", "libx264", "-preset", rendition.preset,
+                         "-threads", str(threads)]
+                if rendition.video_bitrate:
+                    # 限制峰值码率，便于按档位分发
+                    args += ["-b:v", rendition.video_bitrate, "-maxrate", rendition.video_bitrate,
+                             "-bufsize", self._double_bitrate(rendition.video_bitrate)]
+                else:
+                    args += ["-crf", str(rendition.crf)]
+                args += self._audio_args(start, end) + ["-movflags", "+faststart", output_path]
+
+            self.ffmpeg_runner.run(args, duration=self._window_duration(start, end), stage='compose',
+                                   events=self.events)
+
+            for output_path in output_paths:
+                if self.artifact_store:
+                    self.artifact_store.track(output_path, job_id=self.job_id, kind='output')
+                self.events.info('compose', f"字幕已成功添加到视频: {output_path}")
+            return output_paths
+
     def process_video_with_subtitles(self, video_path: str, subtitle_path: str, output_dir: Optional[str] = None,
-                                    font_size: Optional[int] = None, font: Optional[str] = None) -> Dict[str, Any]:
+                                    font_size: Optional[int] = None, font: Optional[str] = None,
+                                    start: Optional[float] = None, end: Optional[float] = None,
+                                    renditions: Optional[List[Rendition]] = None) -> Dict[str, Any]:
         """
         处理视频并添加字幕的综合方法
         
@@ -328,25 +513,53 @@ class VideoCompositor:
             video_path: 原始视频路径
             subtitle_path: SRT字幕文件路径
             output_dir: 输出目录
+            start: 可选的时间窗口起点（秒）
+            end: 可选的时间窗口终点（秒）
+            renditions: 可选的多档输出规格，提供时一次解码、一次烧录字幕后输出所有分辨率
             
         Returns:
-            Dict: 包含处理结果的字典
+            Dict: 包含处理结果的字典；多档输出时 output_video 为第一档，renditions 为 {规格: 路径}
         """
         # 确定输出路径
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
-            base_name = os.path.basename(video_path)
-            output_path = os.path.join(output_dir, f"subtitled_{base_name}")
+        base_name, ext = os.path.splitext(os.path.basename(video_path))
+        base_name = f"subtitled_{base_name}{window_suffix(start, end)}"
+        if output_dir:
+            output_path = os.path.join(output_dir, f"{base_name}{ext}")
         else:
             output_path = None
         
+        if renditions:
+            output_paths = [os.path.join(output_dir or os.path.dirname(video_path),
+                                         f"{base_name}_{rendition.name}.mp4")
+                            for rendition in renditions]
+            self.render_renditions(
+                video_path=video_path,
+                subtitle_path=subtitle_path,
+                renditions=renditions,
+                output_paths=output_paths,
+                font_size=font_size or 24,
+                font=font or 'Hiragino Sans GB',
+                start=start,
+                end=end
+            )
+            return {
+                'original_video': video_path,
+                'subtitle_file': subtitle_path,
+                'output_video': output_paths[0],
+                'renditions': {rendition.name: path for rendition, path in zip(renditions, output_paths)}
+            }
+        
         # 添加字幕
         output_video_path = self.add_subtitles_to_video(
             video_path=video_path,
             subtitle_path=subtitle_path,
             output_path=output_path,
             font_size=font_size or 24,
-            font=font or 'Hiragino Sans GB'
+            font=font or 'Hiragino Sans GB',
+            start=start,
+            end=end
         )
         
         return {
@@ -356,7 +569,8 @@ class VideoCompositor:
         }
 
     def _add_subtitles_with_ffmpeg(self, video_path: str, subtitle_path: str, output_path: Optional[str],
-                                  font: str, font_size: int) -> Optional[str]:
+                                  font: str, font_size: int, start: Optional[float] = None,
+                                  end: Optional[float] = None) -> Optional[str]:
         """
         使用 ffmpeg 将字幕烧录到视频中。如果失败则返回 None 继续走 MoviePy 方案。
         """
@@ -364,39 +578,90 @@ class VideoCompositor:
             if not output_path:
                 base_name = os.path.splitext(os.path.basename(video_path))[0]
                 output_dir = os.path.dirname(video_path)
-                output_path = os.path.join(output_dir, f"{base_name}_subtitled.mp4")
-
-            fonts_dir = "/System/Library/Fonts"
-            force_style = (
-                f"FontName={font},"
-                f"FontSize={int(font_size)},"
-                f"PrimaryColour=&H00FFFFFF,"
-                f"OutlineColour=&H00000000,"
-                f"BorderStyle=3,"
-                f"Outline=6,"
-                f"Shadow=0,"
-                f"BackColour=&HC0000000,"
-                f"MarginV=40"
-            )
-            vf_filter = f"subtitles={shlex.quote(subtitle_path)}:fontsdir={fonts_dir}:force_style={shlex.quote(force_style)}"
+                output_path = os.path.join(output_dir, f"{base_name}{window_suffix(start, end)}_subtitled.mp4")
 
-            cmd = [
-                "ffmpeg",
-                "-y",
+            vf_filter = self._subtitles_filter(subtitle_path, font, font_size)
+
+            # 有时间窗口时在输入端定位，只解码和编码窗口内的帧
+            args = window_args(start, end) + [
                 "-i", video_path,
                 "-vf", vf_filter,
-                "-c:a", "copy",
+            ] + self._audio_args(start, end) + [
+                "-threads", str(FFmpegRunner.threads_per_job()),
                 output_path
             ]
 
-            print(f"使用 ffmpeg 添加字幕: {' '.join(shlex.quote(c) for c in cmd)}")
-            subprocess.run(cmd, check=True)
-            print(f"字幕已成功添加到视频: {output_path}")
+            self.events.info('compose', "使用 ffmpeg 添加字幕...")
+            self.ffmpeg_runner.run(args, duration=self._window_duration(start, end), stage='compose',
+                                   events=self.events)
+            if self.artifact_store:
+                self.artifact_store.track(output_path, job_id=self.job_id, kind='output')
+            self.events.info('compose', f"字幕已成功添加到视频: {output_path}")
             return output_path
+        except FFmpegTimeoutError:
+            # ffmpeg 卡死通常说明输入有问题，回退到更慢的 MoviePy 也无济于事
+            raise
         except Exception as e:
-            print(f"ffmpeg 添加字幕失败，回退到 MoviePy: {e}")
+            self.events.warning('compose', f"ffmpeg 添加字幕失败，回退到 MoviePy: {e}")
             return None
 
+    @staticmethod
+    def _audio_args(start: Optional[float], end: Optional[float]) -> List[str]:
+        """音频默认直接复制；截取时间窗口时重新编码，避免音频包边界导致音画不同步"""
+        if start or end is not None:
+            return ["-c:a", "aac"]
+        return ["-c:a", "copy"]
+
+    @staticmethod
+    def _double_bitrate(bitrate: str) -> str:
+        """把 "2500k"、"4M" 这样的码率翻倍，用作 -bufsize"""
+        units = {'k': 1000, 'm': 1000 ** 2, 'g': 1000 ** 3}
+        unit = bitrate[-1].lower()
+        if unit in units:
+            return str(int(float(bitrate[:-1]) * units[unit] * 2))
+        return str(int(float(bitrate) * 2))
+
+    @staticmethod
+    def _window_duration(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        """时间窗口的长度，用于计算进度；没有终点时由 ffmpeg 输出推断"""
+        return None if end is None else end - (start or 0)
+
+    def _subtitles_filter(self, subtitle_path: str, font: str, font_size: int) -> str:
+        """
+        生成 libass 字幕滤镜，预览和完整编码共用
+
+        libass 按视频高度缩放字幕，因此缩小分辨率的预览中字幕的相对大小和位置与完整编码一致。
+        """
+        # 只把解析出的字体所在的单独目录交给 libass，避免每次编码都扫描系统字体
+        if font not in self._subtitle_fonts:
+            font_info = self.font_index.resolve(font, script='zh')
+            if font_info and font_info['family']:
+                self._subtitle_fonts[font] = (self.font_index.font_dir_for(font_info), font_info['family'])
+                self.events.info('compose', f"使用字幕字体: {font_info['family']}")
+            else:
+                # 找不到字体时不指定 fontsdir，由 libass 通过系统的字体配置选择替代字体
+                self._subtitle_fonts[font] = (None, font)
+                self.events.warning('compose', f"未找到支持中文的字体 {font}，由 libass 选择替代字体，"
+                                               f"字幕中的中文可能无法正常显示")
+        fonts_dir, font_name = self._subtitle_fonts[font]
+
+        force_style = (
+            f"FontName={font_name},"
+            f"FontSize={int(font_size)},"
+            f"PrimaryColour=&H00FFFFFF,"
+            f"OutlineColour=&H00000000,"
+            f"BorderStyle=3,"
+            f"Outline=6,"
+            f"Shadow=0,"
+            f"BackColour=&HC0000000,"
+            f"MarginV=40"
+        )
+        options = [f"subtitles={shlex.quote(subtitle_path)}"]
+        if fonts_dir:
+            options.append(f"fontsdir={shlex.quote(fonts_dir)}")
+        options.append(f"force_style={shlex.quote(force_style)}")
+        return ":".join(options)
+
 # 简单的测试函数
 if __name__ == "__main__":
     compositor = VideoCompositor()
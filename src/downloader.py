@@ -1,40 +1,73 @@
 import os
+import threading
 import yt_dlp
+from yt_dlp.utils import download_range_func
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Optional, Dict, Any
 
+from artifacts import ArtifactStore
+from events import EventBus, DownloadError, InvalidURLError
+from ffmpeg_runner import window_suffix
+
+class _YtDlpLogger:
+    """把yt-dlp的日志转发到事件总线"""
+    
+    def __init__(self, events: EventBus):
+        self.events = events
+    
+    def debug(self, msg: str):
+        # yt-dlp 把普通信息也通过 debug 输出，带 [debug] 前缀的才是真正的调试信息
+        if not msg.startswith('[debug] '):
+            self.events.info('download', msg)
+    
+    def info(self, msg: str):
+        self.events.info('download', msg)
+    
+    def warning(self, msg: str):
+        self.events.warning('download', msg)
+    
+    def error(self, msg: str):
+        self.events.warning('download', msg)
+
 class YouTubeDownloader:
     """YouTube视频下载器，专注于short视频的下载"""
     
-    def __init__(self, output_dir: str = "./downloads"):
+    def __init__(self, output_dir: str = "./downloads", artifact_store: Optional[ArtifactStore] = None,
+                 job_id: Optional[str] = None, events: Optional[EventBus] = None):
         """
         初始化下载器
         
         Args:
             output_dir: 下载文件的输出目录
+            artifact_store: 可选的产物登记簿，下载的文件会登记到其中
+            job_id: 当前任务ID，用于登记产物归属
+            events: 可选的事件总线，默认只输出到控制台
         """
         self.output_dir = output_dir
+        self.artifact_store = artifact_store
+        self.job_id = job_id
+        self.events = events or EventBus.with_console(job_id=job_id)
         os.makedirs(output_dir, exist_ok=True)
     
-    def download_short(self, url: str, filename: Optional[str] = None, cookies: Optional[str] = None) -> Dict[str, Any]:
+    def _build_ydl_opts(self, outtmpl: str, cookies: Optional[str] = None, audio_only: bool = False,
+                        start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
         """
-        下载YouTube short视频
+        构建yt-dlp选项
         
         Args:
-            url: YouTube short视频的URL
-            filename: 可选的输出文件名（不含扩展名）
-            cookies: 可选的cookies文件路径，用于绕过YouTube的机器人验证
-            
+            outtmpl: 输出文件名模板
+            cookies: 可选的cookies文件路径
+            audio_only: 是否只下载音频流
+            start: 可选的片段起点（秒）
+            end: 可选的片段终点（秒）
+        
         Returns:
-            Dict: 包含下载信息的字典，包括视频路径、标题等
+            Dict: yt-dlp选项
         """
-        # 确保URL是有效的YouTube short格式
-        if not self._is_valid_youtube_url(url):
-            raise ValueError("Invalid YouTube URL")
-        
         # 配置yt-dlp选项，添加额外的选项来尝试绕过验证
         ydl_opts = {
             'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4',
-            'outtmpl': os.path.join(self.output_dir, f'{filename or "%(title)s"}.%(ext)s'),
+            'outtmpl': outtmpl,
             'quiet': False,
             'no_warnings': False,
             'merge_output_format': 'mp4',
@@ -52,54 +85,197 @@ class YouTubeDownloader:
             'retries': 5,
             'fragment_retries': 10,
             'skip_unavailable_fragments': True,
+            # 进度通过 progress_hooks 转成事件，yt-dlp 自身的日志也转发到事件总线
+            'noprogress': True,
+            'logger': _YtDlpLogger(self.events),
         }
         
+        if audio_only:
+            # 只取音频流，不做合并和格式转换
+            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio'
+            ydl_opts.pop('merge_output_format')
+            ydl_opts['postprocessors'] = []
+        
+        if start or end is not None:
+            # 只下载时间窗口内的片段；在切点强制插入关键帧，使片段精确地从 start 开始、时间戳从 0 开始
+            ydl_opts['download_ranges'] = download_range_func(None, [(start or 0, float('inf') if end is None else end)])
+            ydl_opts['force_keyframes_at_cuts'] = True
+        
+        # 尝试使用--cookies-from-browser来绕过验证
+        # 这会自动从Chrome浏览器获取cookies
         try:
-            # 尝试使用--cookies-from-browser来绕过验证
-            # 这会自动从Chrome浏览器获取cookies
+            self.events.info('download', "尝试从Chrome浏览器自动获取cookies...")
+            ydl_opts['cookiesfrombrowser'] = ('chrome',)
+        except Exception as e:
+            self.events.warning('download', f"从浏览器获取cookies失败: {e}，尝试其他方法...")
+            
+            # 如果提供了cookies文件，添加到选项中
+            if cookies:
+                self.events.info('download', f"使用提供的cookies文件: {cookies}")
+                ydl_opts['cookiefile'] = cookies
+            else:
+                self.events.warning('download', "未提供cookies文件，可能会遇到机器人验证问题，"
+                                                "可以使用--cookies参数提供cookies文件")
+        
+        return ydl_opts
+    
+    def download_short(self, url: str, filename: Optional[str] = None, cookies: Optional[str] = None,
+                       start: Optional[float] = None, end: Optional[float] = None,
+                       cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        下载YouTube short视频
+        
+        Args:
+            url: YouTube short视频的URL
+            filename: 可选的输出文件名（不含扩展名）
+            cookies: 可选的cookies文件路径，用于绕过YouTube的机器人验证
+            start: 可选的片段起点（秒），与 end 一起只下载这段时间窗口
+            end: 可选的片段终点（秒）
+            cancel: 可选的取消事件，下载过程中被设置时中止下载并抛出 DownloadError
+        
+        Returns:
+            Dict: 包含下载信息的字典，包括视频路径、标题等；只下载了片段时 clipped 为 True
+        """
+        # 确保URL是有效的YouTube short格式
+        if not self._is_valid_youtube_url(url):
+            raise InvalidURLError("Invalid YouTube URL")
+        
+        with self.events.stage('download', f"开始下载视频: {url}", error_type=DownloadError):
+            ydl_opts = self._build_ydl_opts(
+                os.path.join(self.output_dir, f'{filename or "%(title)s"}{window_suffix(start, end)}.%(ext)s'),
+                cookies=cookies,
+                start=start,
+                end=end
+            )
+            ydl_opts['progress_hooks'] = [self._progress_hook('download', cancel)]
+            
             try:
-                print("尝试从Chrome浏览器自动获取cookies...")
-                ydl_opts['cookiesfrombrowser'] = ('chrome',)
-            except Exception as e:
-                print(f"从浏览器获取cookies失败: {e}")
-                print("尝试其他方法...")
-                
-                # 如果提供了cookies文件，添加到选项中
-                if cookies:
-                    print(f"使用提供的cookies文件: {cookies}")
-                    ydl_opts['cookiefile'] = cookies
-                else:
-                    print("未提供cookies文件，可能会遇到机器人验证问题")
-                    print("可以使用--cookies参数提供cookies文件")
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info_dict = ydl.extract_info(url, download=True)
+                    
+                    # 获取下载后的文件路径
+                    video_path = ydl.prepare_filename(info_dict)
+            except Exception:
+                if cancel is not None and cancel.is_set():
+                    raise DownloadError("视频下载已取消")
+                self._warn_bot_check()
+                raise
             
-            print(f"开始下载视频: {url}")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(url, download=True)
-                
-                # 获取下载后的文件路径
-                video_path = ydl.prepare_filename(info_dict)
-                
-                # 如果文件扩展名不是mp4，修改为mp4
-                if not video_path.endswith('.mp4'):
-                    base, _ = os.path.splitext(video_path)
-                    video_path = base + '.mp4'
-                
-                result = {
-                    'video_path': video_path,
-                    'title': info_dict.get('title', 'Untitled'),
-                    'duration': info_dict.get('duration', 0),
-                    'uploader': info_dict.get('uploader', 'Unknown'),
-                    'url': url
-                }
-                
-                print(f"视频下载完成: {result['video_path']}")
-                return result
-                
-        except Exception as e:
-            print(f"下载视频时出错: {str(e)}")
-            print("提示：如果遇到YouTube的机器人验证问题，您可能需要提供cookies文件")
-            print("请参考: https://github.com/yt-dlp/yt-dlp/wiki/FAQ#how-do-i-pass-cookies-to-yt-dlp")
-            raise
+            # 如果文件扩展名不是mp4，修改为mp4
+            if not video_path.endswith('.mp4'):
+                base, _ = os.path.splitext(video_path)
+                video_path = base + '.mp4'
+            
+            result = {
+                'video_path': video_path,
+                'title': info_dict.get('title', 'Untitled'),
+                'duration': info_dict.get('duration', 0),
+                'uploader': info_dict.get('uploader', 'Unknown'),
+                'url': url,
+                'clipped': bool(start or end is not None)
+            }
+            
+            if self.artifact_store:
+                self.artifact_store.track(video_path, job_id=self.job_id, kind='cache')
+            
+            self.events.info('download', f"视频下载完成: {result['video_path']}")
+            return result
+    
+    def download_short_pipelined(self, url: str, filename: Optional[str] = None, cookies: Optional[str] = None,
+                                 start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        流水线下载：先下载体积很小的纯音频流并立即返回，视频在后台继续下载
+        
+        调用方可以马上用 audio_path 开始语音识别，等到合成阶段再通过
+        video_future.result() 取得完整视频的下载结果（与 download_short 的返回值相同）。
+        后续步骤出错、不再需要视频时，设置 video_cancel 中止后台下载，再等待 video_future 结束。
+        
+        Args:
+            url: YouTube short视频的URL
+            filename: 可选的输出文件名（不含扩展名）
+            cookies: 可选的cookies文件路径
+            start: 可选的片段起点（秒），音频和视频都只下载这段时间窗口
+            end: 可选的片段终点（秒）
+        
+        Returns:
+            Dict: 包含 audio_path、预计的 video_path、title、video_future 和 video_cancel 的字典
+        """
+        if not self._is_valid_youtube_url(url):
+            raise InvalidURLError("Invalid YouTube URL")
+        
+        with self.events.stage('download_audio', f"开始下载音频流: {url}", error_type=DownloadError):
+            ydl_opts = self._build_ydl_opts(
+                os.path.join(self.output_dir, f'{filename or "%(title)s"}{window_suffix(start, end)}.audio.%(ext)s'),
+                cookies=cookies,
+                audio_only=True,
+                start=start,
+                end=end
+            )
+            ydl_opts['progress_hooks'] = [self._progress_hook('download_audio')]
+            
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info_dict = ydl.extract_info(url, download=True)
+                    audio_path = ydl.prepare_filename(info_dict)
+            except Exception:
+                self._warn_bot_check()
+                raise
+            
+            if self.artifact_store:
+                self.artifact_store.track(audio_path, job_id=self.job_id, kind='intermediate')
+            
+            self.events.info('download_audio', f"音频流下载完成: {audio_path}")
+        
+        # 完整视频在后台线程中下载，文件名与 download_short 保持一致
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-download")
+        video_cancel = threading.Event()
+        video_future: Future = executor.submit(self.download_short, url, filename, cookies, start, end,
+                                               video_cancel)
+        executor.shutdown(wait=False)
+        
+        audio_base = os.path.splitext(audio_path)[0]
+        if audio_base.endswith('.audio'):
+            audio_base = audio_base[:-len('.audio')]
+        
+        return {
+            'audio_path': audio_path,
+            'video_path': audio_base + '.mp4',
+            'video_future': video_future,
+            'video_cancel': video_cancel,
+            'title': info_dict.get('title', 'Untitled'),
+            'duration': info_dict.get('duration', 0),
+            'uploader': info_dict.get('uploader', 'Unknown'),
+            'url': url,
+            'clipped': bool(start or end is not None)
+        }
+    
+    def _warn_bot_check(self):
+        """下载失败时提示可能需要提供cookies文件"""
+        self.events.warning('download', "如果遇到YouTube的机器人验证问题，您可能需要提供cookies文件，"
+                                        "请参考: https://github.com/yt-dlp/yt-dlp/wiki/FAQ#how-do-i-pass-cookies-to-yt-dlp")
+    
+    def _progress_hook(self, stage: str, cancel: Optional[threading.Event] = None):
+        """
+        生成把yt-dlp下载进度转换为进度事件的回调
+        
+        Args:
+            stage: 进度事件所属的阶段
+            cancel: 可选的取消事件，被设置后回调抛出异常，yt-dlp 随之中止下载
+            
+        Returns:
+            Callable: yt-dlp progress_hooks 使用的回调
+        """
+        def hook(status: Dict[str, Any]):
+            if cancel is not None and cancel.is_set():
+                raise DownloadError("视频下载已取消", stage=stage)
+            if status.get('status') != 'downloading':
+                return
+            total = status.get('total_bytes') or status.get('total_bytes_estimate')
+            downloaded = status.get('downloaded_bytes') or 0
+            self.events.progress(stage, downloaded / total if total else None, "下载进度",
+                                 eta=status.get('eta'), bytes_per_second=status.get('speed'),
+                                 downloaded_bytes=downloaded, total_bytes=total)
+        return hook
     
     def _is_valid_youtube_url(self, url: str) -> bool:
         """
@@ -107,7 +283,7 @@ class YouTubeDownloader:
         
         Args:
             url: 要检查的URL
-            
+        
         Returns:
             bool: 如果是有效的YouTube URL则返回True
         """
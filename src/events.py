@@ -0,0 +1,290 @@
+import sys
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Iterator, AsyncIterator, Type
+
+class PipelineError(Exception):
+    """处理流程中的错误基类，stage 表示出错的阶段"""
+
+    stage = 'pipeline'
+
+    def __init__(self, message: str, stage: Optional[str] = None):
+        super().__init__(message)
+        if stage:
+            self.stage = stage
+
+class DownloadError(PipelineError):
+    """下载视频或音频失败"""
+    stage = 'download'
+
+class InvalidURLError(DownloadError, ValueError):
+    """URL 不是有效的 YouTube 链接；同时是 ValueError，兼容按 ValueError 捕获的调用方"""
+
+class ExtractionError(PipelineError):
+    """从视频中提取音频失败"""
+    stage = 'extract'
+
+class TranscriptionError(PipelineError):
+    """语音识别失败"""
+    stage = 'transcribe'
+
+class TranslationError(PipelineError):
+    """翻译失败"""
+    stage = 'translate'
+
+class CompositionError(PipelineError):
+    """字幕烧录或视频合成失败"""
+    stage = 'compose'
+
+@dataclass(kw_only=True)
+class Event:
+    """所有事件的基类"""
+    stage: str
+    job_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+@dataclass(kw_only=True)
+class StageStarted(Event):
+    """阶段开始"""
+    message: str = ""
+
+@dataclass(kw_only=True)
+class StageFinished(Event):
+    """阶段成功结束"""
+    elapsed: float = 0.0
+    message: str = ""
+
+@dataclass(kw_only=True)
+class Progress(Event):
+    """阶段内的进度，fraction 为 0 到 1，未知时为 None"""
+    fraction: Optional[float] = None
+    message: str = ""
+    details: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass(kw_only=True)
+class ItemResult(Event):
+    """逐项处理的结果，例如每个翻译片段；error 不为空表示该项失败"""
+    index: int = 0
+    total: int = 0
+    item: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[Exception] = None
+    message: str = ""
+
+@dataclass(kw_only=True)
+class LogMessage(Event):
+    """普通的状态信息，level 为 info 或 warning"""
+    message: str = ""
+    level: str = 'info'
+
+@dataclass(kw_only=True)
+class ErrorEvent(Event):
+    """阶段失败"""
+    error: Exception = None
+    elapsed: float = 0.0
+
+class EventBus:
+    """
+    事件总线：各模块通过它报告阶段开始/结束、进度、逐项结果和错误
+
+    订阅者在发出事件的线程中同步调用；asyncio 代码可以用 stream() 异步迭代事件。
+    for_job() 返回共享订阅者、但会在事件上标记任务ID的子总线。
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        """
+        初始化事件总线
+
+        Args:
+            job_id: 通过本总线发出的事件默认标记的任务ID
+        """
+        self.job_id = job_id
+        self._subscribers: List[Callable[[Event], None]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def with_console(cls, job_id: Optional[str] = None) -> 'EventBus':
+        """
+        创建一个已订阅控制台输出的事件总线，作为各模块未传入总线时的默认值
+
+        Returns:
+            EventBus: 事件总线
+        """
+        bus = cls(job_id=job_id)
+        bus.subscribe(ConsoleReporter())
+        return bus
+
+    def for_job(self, job_id: str) -> 'EventBus':
+        """
+        返回共享订阅者列表、事件标记为指定任务ID的子总线
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            EventBus: 子总线
+        """
+        child = EventBus(job_id=job_id)
+        child._subscribers = self._subscribers
+        child._lock = self._lock
+        return child
+
+    def subscribe(self, callback: Callable[[Event], None]) -> Callable[[], None]:
+        """
+        订阅事件
+
+        Args:
+            callback: 接收事件的回调
+
+        Returns:
+            Callable: 调用即取消订阅
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def emit(self, event: Event) -> None:
+        """
+        发出事件，订阅者抛出的异常不会影响处理流程
+
+        Args:
+            event: 事件
+        """
+        if event.job_id is None:
+            event.job_id = self.job_id
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"事件订阅者出错: {e}", file=sys.stderr)
+
+    def info(self, stage: str, message: str) -> None:
+        """发出一条普通状态信息"""
+        self.emit(LogMessage(stage=stage, message=message))
+
+    def warning(self, stage: str, message: str) -> None:
+        """发出一条警告信息"""
+        self.emit(LogMessage(stage=stage, message=message, level='warning'))
+
+    def progress(self, stage: str, fraction: Optional[float], message: str = "", **details) -> None:
+        """发出进度事件"""
+        self.emit(Progress(stage=stage, fraction=fraction, message=message, details=details))
+
+    def item(self, stage: str, index: int, total: int, item: Dict[str, Any],
+             error: Optional[Exception] = None, message: str = "") -> None:
+        """发出逐项结果事件"""
+        self.emit(ItemResult(stage=stage, index=index, total=total, item=item, error=error, message=message))
+
+    @contextmanager
+    def stage(self, stage: str, message: str = "",
+              error_type: Type[PipelineError] = PipelineError) -> Iterator[None]:
+        """
+        包裹一个处理阶段，自动发出开始、结束或错误事件
+
+        阶段内抛出的非 PipelineError 异常会被包装成 error_type 再抛出。
+
+        Args:
+            stage: 阶段名称
+            message: 开始时的说明
+            error_type: 包装异常使用的错误类型
+        """
+        started = time.monotonic()
+        self.emit(StageStarted(stage=stage, message=message))
+        try:
+            yield
+        except PipelineError as e:
+            self.emit(ErrorEvent(stage=stage, error=e, elapsed=time.monotonic() - started))
+            raise
+        except Exception as e:
+            error = error_type(str(e), stage=stage)
+            self.emit(ErrorEvent(stage=stage, error=error, elapsed=time.monotonic() - started))
+            raise error from e
+        self.emit(StageFinished(stage=stage, elapsed=time.monotonic() - started))
+
+    async def stream(self, max_queue: int = 1000) -> AsyncIterator[Event]:
+        """
+        在 asyncio 中异步迭代事件，事件可以来自任意线程
+
+        消费跟不上时，积压超过 max_queue 后新的进度事件会被丢弃，其余事件不会丢失。
+        迭代结束（break 或取消）时自动取消订阅。
+
+        Args:
+            max_queue: 积压多少事件后开始丢弃进度事件
+
+        Yields:
+            Event: 事件
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def enqueue(event: Event):
+            if isinstance(event, Progress) and queue.qsize() >= max_queue:
+                return
+            queue.put_nowait(event)
+
+        def on_event(event: Event):
+            loop.call_soon_threadsafe(enqueue, event)
+
+        unsubscribe = self.subscribe(on_event)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+class ConsoleReporter:
+    """把事件打印到控制台的订阅者"""
+
+    def __init__(self, stream=None):
+        """
+        Args:
+            stream: 输出流，默认 sys.stdout
+        """
+        self.stream = stream
+
+    def __call__(self, event: Event) -> None:
+        out = self.stream or sys.stdout
+        if isinstance(event, LogMessage):
+            prefix = "警告: " if event.level == 'warning' else ""
+            print(f"{prefix}{event.message}", file=out)
+        elif isinstance(event, StageStarted):
+            if event.message:
+                print(event.message, file=out)
+        elif isinstance(event, StageFinished):
+            if event.message:
+                print(event.message, file=out)
+        elif isinstance(event, ErrorEvent):
+            print(f"[{event.stage}] 出错: {event.error}", file=out)
+        elif isinstance(event, ItemResult):
+            if event.error is not None:
+                print(f"处理第 {event.index + 1}/{event.total} 项时出错: {event.error}", file=out)
+            elif event.message:
+                print(event.message, file=out)
+        elif isinstance(event, Progress):
+            self._print_progress(event, out)
+
+    @staticmethod
+    def _print_progress(event: Progress, out) -> None:
+        """在同一行刷新打印进度"""
+        details = event.details
+        parts = [event.message] if event.message else []
+        if event.fraction is not None:
+            parts.append(f"{event.fraction * 100:5.1f}%")
+        if details.get('fps') is not None:
+            parts.append(f"{details['fps']:.1f} fps")
+        if details.get('speed') is not None:
+            parts.append(f"{details['speed']:.2f}x")
+        if details.get('eta') is not None:
+            parts.append(f"剩余约 {details['eta']:.0f} 秒")
+        end = "\n" if details.get('done') or event.fraction is None else "\r"
+        print(" | ".join(parts), end=end, file=out, flush=True)
@@ -0,0 +1,304 @@
+import os
+import re
+import time
+import shlex
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from events import EventBus
+
+class FFmpegError(RuntimeError):
+    """ffmpeg 以非零状态退出"""
+
+    def __init__(self, message: str, returncode: Optional[int] = None, stderr_tail: str = ""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+
+class FFmpegTimeoutError(FFmpegError):
+    """ffmpeg 超时或长时间没有进度，已被强制终止"""
+
+def window_args(start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
+    """
+    生成只读取时间窗口的输入参数，需要放在对应的 -i 之前
+
+    作为输入参数时 ffmpeg 会直接定位到窗口起点，输出的时间戳从 0 开始。
+
+    Args:
+        start: 窗口起点（秒），None 表示从头开始
+        end: 窗口终点（秒，相对于原始输入），None 表示到结尾
+
+    Returns:
+        List[str]: ffmpeg 参数
+    """
+    args = []
+    if start:
+        args += ["-ss", f"{start:.3f}"]
+    if end is not None:
+        args += ["-to", f"{end:.3f}"]
+    return args
+
+def window_suffix(start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """
+    为时间窗口生成文件名后缀，避免片段的产物覆盖完整视频的产物
+
+    Returns:
+        str: 例如 ".10-40"、".10-end"；没有时间窗口时为空字符串
+    """
+    if not start and end is None:
+        return ""
+    return f".{start or 0:g}-{'end' if end is None else f'{end:g}'}"
+
+class FFmpegRunner:
+    """
+    共享的 ffmpeg 进程管理器
+
+    用 asyncio 子进程运行 ffmpeg，解析 -progress 输出得到 fps、速度和预计剩余时间，
+    超时或长时间无进度时强制终止进程。所有实例共用一个全局信号量限制同时运行的
+    ffmpeg 数量，并把配置的线程预算平均分给每个并发任务。
+    """
+
+    # 全局并发配置，通过 configure() 修改
+    thread_budget = os.cpu_count() or 1
+    max_concurrent = 2
+    _semaphore = threading.BoundedSemaphore(max_concurrent)
+    _config_lock = threading.Lock()
+
+    DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+    def __init__(self, timeout: Optional[float] = None, stall_timeout: Optional[float] = 60.0,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 events: Optional[EventBus] = None):
+        """
+        初始化进程管理器
+
+        Args:
+            timeout: 单次运行的总超时时间（秒），None 表示不限制
+            stall_timeout: 没有任何进度输出的最长时间（秒），超过即认为 ffmpeg 卡死
+            progress_callback: 可选的进度回调，接收解析出的进度字典
+            events: 可选的事件总线，进度会作为 Progress 事件发出，默认只输出到控制台
+        """
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.progress_callback = progress_callback
+        self.events = events or EventBus.with_console()
+
+    @classmethod
+    def configure(cls, thread_budget: Optional[int] = None, max_concurrent: Optional[int] = None) -> None:
+        """
+        修改全局线程预算和最大并发数，应在启动任何 ffmpeg 之前调用
+
+        Args:
+            thread_budget: 所有 ffmpeg 进程共享的线程总数
+            max_concurrent: 同时运行的 ffmpeg 进程数上限
+        """
+        with cls._config_lock:
+            if thread_budget is not None:
+                cls.thread_budget = max(1, int(thread_budget))
+            if max_concurrent is not None:
+                cls.max_concurrent = max(1, int(max_concurrent))
+                cls._semaphore = threading.BoundedSemaphore(cls.max_concurrent)
+
+    @classmethod
+    def threads_per_job(cls) -> int:
+        """
+        每个 ffmpeg 进程可使用的线程数，调用方据此设置 -threads
+
+        按 max_concurrent 固定平分线程预算，而不是按获取信号量时实际在运行的进程数计算：
+        -threads 在排队之前就写进了参数，ffmpeg 启动后也无法缩小线程池，先启动的进程
+        如果占用了全部预算，后面并发启动的进程就会超出预算。并发不满时会有部分线程闲置。
+
+        Returns:
+            int: 线程数
+        """
+        return max(1, cls.thread_budget // cls.max_concurrent)
+
+    def run(self, args: List[str], duration: Optional[float] = None,
+            progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+            stage: str = 'ffmpeg', events: Optional[EventBus] = None) -> None:
+        """
+        同步运行 ffmpeg，供非 asyncio 代码调用
+
+        调用线程中已经有正在运行的事件循环时（例如在协程里调用了同步接口），
+        asyncio.run() 无法嵌套使用，改为在一个辅助线程中运行，当前线程阻塞等待结果。
+
+        Args:
+            args: ffmpeg 参数（不含程序名，-y 和进度相关参数会自动添加）
+            duration: 输出的预计时长（秒），用于计算进度百分比和剩余时间；
+                      不提供时从 ffmpeg 输出的输入时长推断
+            progress_callback: 本次运行的进度回调，默认使用实例的回调
+            stage: 进度事件所属的阶段
+            events: 本次运行使用的事件总线，默认使用实例的总线
+        """
+        def run_to_completion() -> None:
+            asyncio.run(self.run_async(args, duration=duration, progress_callback=progress_callback,
+                                       stage=stage, events=events))
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            run_to_completion()
+            return
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ffmpeg-run") as executor:
+            executor.submit(run_to_completion).result()
+
+    async def run_async(self, args: List[str], duration: Optional[float] = None,
+                        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        stage: str = 'ffmpeg', events: Optional[EventBus] = None) -> None:
+        """
+        在 asyncio 中运行 ffmpeg，参数同 run()
+        """
+        events = events or self.events
+        user_callback = progress_callback or self.progress_callback
+
+        def callback(progress: Dict[str, Any]):
+            details = {key: value for key, value in progress.items() if key != 'fraction'}
+            events.progress(stage, progress['fraction'], "ffmpeg 进度", **details)
+            if user_callback:
+                user_callback(progress)
+
+        cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-y", "-progress", "pipe:1", "-nostats"] + list(args)
+
+        # 轮询获取全局信号量，任务被取消时不会泄漏许可
+        semaphore = type(self)._semaphore
+        while not semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+
+        try:
+            events.info(stage, f"运行 ffmpeg: {' '.join(shlex.quote(c) for c in cmd)}")
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+
+            state = {'last_activity': time.monotonic(), 'duration': duration}
+            stderr_tail = deque(maxlen=40)
+            readers = [
+                asyncio.create_task(self._read_progress(process.stdout, state, callback)),
+                asyncio.create_task(self._read_stderr(process.stderr, state, stderr_tail)),
+            ]
+
+            try:
+                await self._wait_with_watchdog(process, state)
+            finally:
+                # 任务被取消（外层超时、调用方取消、Ctrl-C）时 ffmpeg 仍在运行，
+                # 终止并回收它，避免留下孤儿进程继续占用 CPU 和输出文件
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                for reader in readers:
+                    reader.cancel()
+                await asyncio.gather(*readers, return_exceptions=True)
+
+            if process.returncode != 0:
+                tail = "\n".join(stderr_tail)
+                raise FFmpegError(f"ffmpeg 退出码 {process.returncode}: {tail[-500:]}",
+                                  returncode=process.returncode, stderr_tail=tail)
+        finally:
+            semaphore.release()
+
+    async def _wait_with_watchdog(self, process: asyncio.subprocess.Process, state: Dict[str, Any]) -> None:
+        """等待进程结束，超时或卡死时终止进程并抛出 FFmpegTimeoutError"""
+        started = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=1.0)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.monotonic()
+            reason = None
+            if self.timeout is not None and now - started > self.timeout:
+                reason = f"运行超过 {self.timeout} 秒"
+            elif self.stall_timeout is not None and now - state['last_activity'] > self.stall_timeout:
+                reason = f"{self.stall_timeout} 秒内没有进度"
+
+            if reason:
+                process.kill()
+                await process.wait()
+                raise FFmpegTimeoutError(f"ffmpeg 已被终止: {reason}", returncode=process.returncode)
+
+    async def _read_stderr(self, stream: asyncio.StreamReader, state: Dict[str, Any], tail: deque) -> None:
+        """读取 stderr，保留最后若干行用于报错，并从中解析输入时长"""
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            text = line.decode('utf-8', errors='replace').rstrip()
+            tail.append(text)
+            state['last_activity'] = time.monotonic()
+            if state['duration'] is None:
+                match = self.DURATION_PATTERN.search(text)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    state['duration'] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    async def _read_progress(self, stream: asyncio.StreamReader, state: Dict[str, Any],
+                             callback: Callable[[Dict[str, Any]], None]) -> None:
+        """解析 -progress 输出的 key=value 块，每块结束时回调一次"""
+        block = {}
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            state['last_activity'] = time.monotonic()
+            key, _, value = line.decode('utf-8', errors='replace').strip().partition('=')
+            block[key] = value
+            if key != 'progress':
+                continue
+
+            progress = self._parse_progress_block(block, state['duration'])
+            block = {}
+            try:
+                callback(progress)
+            except Exception as e:
+                self.events.warning('ffmpeg', f"进度回调出错: {e}")
+
+    @staticmethod
+    def _parse_progress_block(block: Dict[str, str], duration: Optional[float]) -> Dict[str, Any]:
+        """
+        把一块 -progress 输出转换为进度字典
+
+        Returns:
+            Dict: 包含 out_time、fps、speed、fraction、eta 和 done
+        """
+        def to_float(value: Optional[str]) -> Optional[float]:
+            try:
+                return float(value.rstrip('x')) if value else None
+            except ValueError:
+                return None
+
+        # out_time_ms 实际上也是微秒，优先使用 out_time_us
+        out_time_us = to_float(block.get('out_time_us')) or to_float(block.get('out_time_ms')) or 0.0
+        out_time = max(0.0, out_time_us / 1_000_000)
+        speed = to_float(block.get('speed'))
+        done = block.get('progress') == 'end'
+
+        fraction = None
+        eta = None
+        if duration:
+            fraction = 1.0 if done else min(1.0, out_time / duration)
+            if speed:
+                eta = max(0.0, duration - out_time) / speed
+
+        return {
+            'out_time': out_time,
+            'fps': to_float(block.get('fps')),
+            'speed': speed,
+            'frame': int(to_float(block.get('frame')) or 0),
+            'fraction': fraction,
+            'eta': 0.0 if done else eta,
+            'done': done,
+        }
+
+# 简单的测试函数
+if __name__ == "__main__":
+    print(f"FFmpeg runner loaded successfully, {FFmpegRunner.threads_per_job()} threads per job")
@@ -0,0 +1,374 @@
+import os
+import glob
+import json
+import time
+import wave
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from events import EventBus
+
+# 指纹参数：重采样到约 5.5kHz，约 0.37 秒的分析窗口，每约 23 毫秒一帧（窗口重叠较多，
+# 两份音频的帧没有对齐时误码率也不会明显升高），300-2000Hz 之间 33 个对数频带相邻差分得到 32 位
+TARGET_RATE = 5512
+FRAME_SAMPLES = 2048
+HOP_SAMPLES = 128
+HOP_SECONDS = HOP_SAMPLES / TARGET_RATE
+BAND_EDGES_HZ = np.geomspace(300, 2000, 34)
+
+# 一次做FFT的帧数，限制长音频的内存占用
+FFT_BLOCK_FRAMES = 2048
+
+# 倒排索引只保存取值经过混合后最高 INDEX_SAMPLING_BITS 位为 0 的子指纹（按取值挑选，查询和记录挑中的是
+# 同一批取值），内存约为完整指纹的 1/4；查询时还查找每个子指纹翻转 1 位后的取值，重新编码后仍能命中
+INDEX_SAMPLING_BITS = 2
+_BIT_FLIPS = np.concatenate([[0], 1 << np.arange(32)]).astype(np.uint32)
+
+def read_wav_mono(audio_path: str) -> Tuple[np.ndarray, int]:
+    """
+    读取 extract_audio 生成的 16 位 PCM WAV，混合为单声道
+
+    Returns:
+        Tuple[np.ndarray, int]: float32 采样和采样率
+    """
+    with wave.open(audio_path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Unsupported WAV sample width: {wav.getsampwidth()}")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    samples = samples.astype(np.float32).reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+def compute_fingerprint(audio_path: str) -> np.ndarray:
+    """
+    计算音频的声学指纹：每帧一个 32 位整数
+
+    每一位表示相邻两个频带的能量差在相邻两帧之间是变大还是变小，
+    对重新编码、音量变化和轻微的频响差异都不敏感。
+
+    Args:
+        audio_path: WAV 文件路径
+
+    Returns:
+        np.ndarray: uint32 数组，帧间隔为 HOP_SECONDS
+    """
+    samples, rate = read_wav_mono(audio_path)
+
+    # 先按整数倍取平均降采样（相当于简单的低通滤波），再插值到统一的采样率，
+    # 不同采样率的音频得到的帧才能一一对应
+    factor = max(1, rate // TARGET_RATE)
+    usable = len(samples) // factor * factor
+    samples = samples[:usable].reshape(-1, factor).mean(axis=1)
+    rate = rate / factor
+    count = int(len(samples) * TARGET_RATE / rate)
+    samples = np.interp(np.arange(count) * (rate / TARGET_RATE), np.arange(len(samples)), samples).astype(np.float32)
+
+    if len(samples) < FRAME_SAMPLES + HOP_SAMPLES:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SAMPLES)[::HOP_SAMPLES]
+    window = np.hanning(FRAME_SAMPLES).astype(np.float32)
+    band_index = np.searchsorted(BAND_EDGES_HZ, np.fft.rfftfreq(FRAME_SAMPLES, d=1.0 / TARGET_RATE)) - 1
+    bands = [band_index == band for band in range(len(BAND_EDGES_HZ) - 1)]
+    energies = np.empty((len(frames), len(bands)), dtype=np.float32)
+    for block in range(0, len(frames), FFT_BLOCK_FRAMES):
+        spectrum = np.abs(np.fft.rfft(frames[block:block + FFT_BLOCK_FRAMES] * window, axis=1)) ** 2
+        energies[block:block + FFT_BLOCK_FRAMES] = np.stack([spectrum[:, mask].sum(axis=1) for mask in bands], axis=1)
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(32, dtype=np.uint64))
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+def index_keys(hashes: np.ndarray, flip_bits: bool = False) -> np.ndarray:
+    """
+    取出用于倒排索引的子指纹
+
+    Args:
+        hashes: compute_fingerprint() 的结果
+        flip_bits: 是否同时加入每个子指纹翻转 1 位后的取值（查询时使用）
+
+    Returns:
+        np.ndarray: 去重后的 uint32 数组，不含静音帧的 0
+    """
+    keys = np.unique(hashes[hashes != 0]).astype(np.uint32)
+    if flip_bits:
+        keys = np.unique((keys[:, None] ^ _BIT_FLIPS[None, :]).ravel())
+    mixed = keys * np.uint32(2654435761)
+    return keys[(mixed >> np.uint32(32 - INDEX_SAMPLING_BITS)) == 0]
+
+def _bit_planes(hashes: np.ndarray) -> np.ndarray:
+    """把指纹展开成 (帧数, 32) 的 ±1 矩阵"""
+    bits = (hashes[:, None] >> np.arange(32, dtype=np.uint32)) & 1
+    return bits.astype(np.float32) * 2 - 1
+
+def best_alignment(query: np.ndarray, stored: np.ndarray, min_overlap: int) -> Optional[Tuple[float, int]]:
+    """
+    在所有时间偏移中找出两段指纹误码率最低的对齐位置
+
+    按位展开成 ±1 后做互相关（FFT），一次得到每个偏移下相同位数减不同位数的差，
+    不依赖任何一帧的 32 位完全相同，重新编码后误码率较高的音频也能找到。
+
+    Args:
+        query: 新音频的指纹
+        stored: 已有记录的指纹
+        min_overlap: 对齐后至少重叠的帧数
+
+    Returns:
+        Optional[Tuple[float, int]]: (误码率, 偏移帧数)，query 的第 i 帧对应 stored 的第 i + 偏移 帧；
+                                     没有满足重叠要求的偏移时为 None
+    """
+    size = 1 << int(len(query) + len(stored) - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(_bit_planes(stored), size, axis=0)
+                               * np.conj(np.fft.rfft(_bit_planes(query), size, axis=0)), size, axis=0).sum(axis=1)
+
+    offsets = np.arange(-len(query) + 1, len(stored))
+    overlap = np.minimum(len(query), len(stored) - offsets) - np.maximum(0, -offsets)
+    valid = overlap >= max(1, min_overlap)
+    if not valid.any():
+        return None
+    offsets, overlap = offsets[valid], overlap[valid]
+    agreement = correlation[offsets % size]
+    errors = (32 * overlap - agreement) / (64 * overlap)
+    best = int(np.argmin(errors))
+    return float(errors[best]), int(offsets[best])
+
+@dataclass
+class FingerprintMatch:
+    """指纹索引中找到的相似音频"""
+    entry_id: str
+    bit_error_rate: float
+    offset: float
+    source: Optional[str] = None
+    model: Optional[str] = None
+    segments: List[Dict[str, Any]] = field(default_factory=list)
+
+class FingerprintIndex:
+    """
+    本地声学指纹索引：把已处理过的音频的指纹和识别、翻译结果保存下来，
+    之后遇到重新上传的同一段音频（不同的视频ID、不同的编码、或者只是其中一段）时直接复用
+
+    每条记录是索引目录下的一个 JSON 文件，写入时先写临时文件再替换，多个进程可以共用。
+    记录同时保存生成它时的设置（模型、目标语言等），只复用设置相同的记录。
+    内存中只保存每条记录的帧数和抽样子指纹组成的倒排索引；查找时先用倒排索引挑出命中次数最多的
+    少数候选记录，再从文件读取它们的完整指纹，计算所有时间偏移下的误码率，取最低的一个。
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_dir: Optional[str] = None, max_bit_error_rate: float = 0.2,
+                 min_coverage: float = 0.9, min_frames: int = 200, min_key_hits: int = 2,
+                 max_candidates: int = 5, events: Optional[EventBus] = None):
+        """
+        初始化指纹索引
+
+        Args:
+            index_dir: 索引目录，默认 ~/.cache/you-video/fingerprints
+            max_bit_error_rate: 误码率低于该值视为同一段音频（无关音频约为 0.5）
+            min_coverage: 新音频至少有多大比例落在已有记录的时间范围内
+            min_frames: 有声音的帧少于该数（每帧 HOP_SECONDS 秒，默认约 4.6 秒）的音频太短，不做匹配
+            min_key_hits: 倒排索引中至少命中几个子指纹的记录才作为候选
+            max_candidates: 最多对几条候选记录做完整的对齐计算
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.index_dir = index_dir or os.path.join(os.path.expanduser('~'), '.cache', 'you-video', 'fingerprints')
+        self.max_bit_error_rate = max_bit_error_rate
+        self.min_coverage = min_coverage
+        self.min_frames = min_frames
+        self.min_key_hits = min_key_hits
+        self.max_candidates = max_candidates
+        self.events = events or EventBus.with_console()
+        # 记录ID -> 帧数；完整指纹和字幕片段只在成为候选时从文件读取
+        self._frames: Dict[str, int] = {}
+        self._entry_ids: List[str] = []
+        self._key_parts: List[np.ndarray] = []
+        self._keys: Optional[np.ndarray] = None
+        self._owners: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _refresh(self) -> None:
+        """把其他进程新写入的记录加入倒排索引"""
+        for path in glob.glob(os.path.join(self.index_dir, '*.json')):
+            entry_id = os.path.splitext(os.path.basename(path))[0]
+            if entry_id in self._frames:
+                continue
+            entry = self._load(entry_id)
+            if entry is None:
+                continue
+            self._frames[entry_id] = len(entry['hashes'])
+            self._entry_ids.append(entry_id)
+            self._key_parts.append(index_keys(entry['hashes']))
+            self._keys = None
+
+    def _load(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        """从文件读取一条完整的记录，文件损坏、已删除或版本不同时返回 None"""
+        path = os.path.join(self.index_dir, f"{entry_id}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.events.warning('fingerprint', f"跳过损坏的指纹记录 {path}: {e}")
+            return None
+        if entry.get('version') != self.VERSION:
+            return None
+        entry['hashes'] = np.frombuffer(base64.b64decode(entry['hashes']), dtype=np.uint32)
+        return entry
+
+    def _candidates(self, hashes: np.ndarray, min_overlap: int) -> List[str]:
+        """
+        用倒排索引挑出候选记录
+
+        Args:
+            hashes: 新音频的指纹
+            min_overlap: 对齐后至少重叠的帧数，帧数不足的记录不可能满足覆盖率要求
+
+        Returns:
+            List[str]: 按命中的子指纹数从多到少排列的记录ID，最多 max_candidates 个
+        """
+        if not self._entry_ids:
+            return []
+        if self._keys is None:
+            self._keys = np.concatenate(self._key_parts)
+            self._owners = np.repeat(np.arange(len(self._entry_ids), dtype=np.int32),
+                                     [len(part) for part in self._key_parts])
+
+        hits = np.bincount(self._owners[np.isin(self._keys, index_keys(hashes, flip_bits=True))],
+                           minlength=len(self._entry_ids))
+        ranked = [(int(hits[i]), entry_id) for i, entry_id in enumerate(self._entry_ids)
+                  if hits[i] >= self.min_key_hits and self._frames[entry_id] >= min_overlap]
+        ranked.sort(reverse=True)
+        return [entry_id for _, entry_id in ranked[:self.max_candidates]]
+
+    def lookup(self, hashes: np.ndarray, duration: float,
+               settings: Optional[Dict[str, Any]] = None) -> Optional[FingerprintMatch]:
+        """
+        查找与给定指纹匹配的记录
+
+        Args:
+            hashes: compute_fingerprint() 的结果
+            duration: 音频时长（秒）
+            settings: 当前的处理设置，只匹配 add() 时设置完全相同的记录
+
+        Returns:
+            Optional[FingerprintMatch]: 误码率最低的匹配，segments 已平移到新音频的时间轴；
+                                        没有匹配时为 None
+        """
+        if not self._usable(hashes):
+            return None
+
+        min_overlap = int(self.min_coverage * len(hashes))
+        with self._lock:
+            self._refresh()
+            candidates = self._candidates(hashes, min_overlap)
+
+        best = None
+        for entry_id in candidates:
+            entry = self._load(entry_id)
+            if entry is None or entry.get('settings') != settings:
+                continue
+            alignment = best_alignment(hashes, entry['hashes'], min_overlap)
+            if alignment and alignment[0] <= self.max_bit_error_rate and (best is None or alignment[0] < best[0]):
+                best = (alignment[0], entry_id, alignment[1], entry)
+
+        if best is None:
+            return None
+        ber, entry_id, frame_offset, entry = best
+        offset = frame_offset * HOP_SECONDS
+        return FingerprintMatch(
+            entry_id=entry_id,
+            bit_error_rate=ber,
+            offset=offset,
+            source=entry.get('source'),
+            model=entry.get('model'),
+            segments=self._shift_segments(entry['segments'], offset, duration),
+        )
+
+    def add(self, hashes: np.ndarray, duration: float, segments: List[Dict[str, Any]],
+            source: Optional[str] = None, model: Optional[str] = None,
+            settings: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        保存一段已经识别和翻译完成的音频
+
+        Args:
+            hashes: compute_fingerprint() 的结果
+            duration: 音频时长（秒）
+            segments: 包含 translated_text 的字幕片段
+            source: 来源（视频路径或URL），仅用于记录
+            model: 识别使用的模型
+            settings: 生成这些片段时的处理设置，需要可以序列化为 JSON，lookup() 据此过滤
+
+        Returns:
+            Optional[str]: 记录ID；音频太短不值得保存时为 None
+        """
+        if not self._usable(hashes):
+            return None
+
+        entry_id = hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+        keep = ('id', 'start', 'end', 'text', 'translated_text', 'avg_logprob', 'no_speech_prob')
+        entry = {
+            'version': self.VERSION,
+            'duration': duration,
+            'hop': HOP_SECONDS,
+            'hashes': base64.b64encode(hashes.astype(np.uint32).tobytes()).decode('ascii'),
+            'segments': [{key: segment[key] for key in keep if key in segment} for segment in segments],
+            'source': source,
+            'model': model,
+            'settings': settings,
+            'created': time.time(),
+        }
+        path = os.path.join(self.index_dir, f"{entry_id}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return entry_id
+
+    def _usable(self, hashes: np.ndarray) -> bool:
+        """静音帧的子指纹全为 0，任意两段静音都会“匹配”，只统计有声音的帧"""
+        return int(np.count_nonzero(hashes)) >= self.min_frames
+
+    @staticmethod
+    def _shift_segments(segments: List[Dict[str, Any]], offset: float, duration: float) -> List[Dict[str, Any]]:
+        """
+        把记录中的片段平移到新音频的时间轴：新音频的 t 秒对应记录中的 t + offset 秒，
+        只保留落在新音频范围内的部分
+        """
+        shifted = []
+        for segment in segments:
+            start = segment['start'] - offset
+            end = segment['end'] - offset
+            if end <= 0 or start >= duration:
+                continue
+            segment = dict(segment)
+            segment['id'] = len(shifted)
+            segment['start'] = max(0.0, start)
+            segment['end'] = min(duration, end)
+            shifted.append(segment)
+        return shifted
+
+# 简单的测试函数
+if __name__ == "__main__":
+    # 比较两个WAV文件: python src/fingerprint.py a.wav b.wav
+    import sys
+
+    if len(sys.argv) == 3:
+        index = FingerprintIndex(index_dir=os.path.join(os.path.dirname(sys.argv[1]) or '.', '.fingerprint-test'))
+        first = compute_fingerprint(sys.argv[1])
+        index.add(first, len(first) * HOP_SECONDS, [], source=sys.argv[1])
+        second = compute_fingerprint(sys.argv[2])
+        match = index.lookup(second, len(second) * HOP_SECONDS)
+        if match:
+            print(f"Match: BER {match.bit_error_rate:.3f}, offset {match.offset:.2f}s")
+        else:
+            print("No match")
+    else:
+        print("Fingerprint module loaded successfully")
@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import struct
+import hashlib
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from events import EventBus
+
+# 各平台的系统字体目录
+FONT_DIRS = {
+    'darwin': ['/System/Library/Fonts', '/Library/Fonts', '~/Library/Fonts'],
+    'linux': ['/usr/share/fonts', '/usr/local/share/fonts', '~/.local/share/fonts', '~/.fonts'],
+    'win32': ['C:\\Windows\\Fonts'],
+}
+
+# 用于判断字体是否覆盖某种文字的常用字样本
+SCRIPT_SAMPLES = {
+    'zh': "的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会自着去之过家学对可里后小么心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见经头面公同三已老从动两长知民样现分将外但身些与高意进把法此实回二理美点月明其种声全工己话，。！？",
+    'latin': "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789,.!?",
+}
+
+# 某种文字没有指定字体时优先选用的字体族
+PREFERRED_FAMILIES = {
+    'zh': [
+        'Hiragino Sans GB', 'PingFang SC', 'Noto Sans CJK SC', 'Source Han Sans SC',
+        'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei', 'Microsoft YaHei', 'SimHei', 'STHeiti',
+    ],
+    'latin': ['Helvetica Neue', 'DejaVu Sans', 'Liberation Sans', 'Arial'],
+}
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc', '.otc')
+
+# 视为常规体的样式名
+REGULAR_STYLES = ('Regular', 'Book', 'Normal', 'Roman', 'W3')
+
+# 覆盖样本字的比例达到该值即认为字体支持这种文字
+COVERAGE_THRESHOLD = 0.95
+
+class FontIndex:
+    """
+    持久化的字体索引
+
+    首次使用时扫描系统字体目录，解析每个字体的 name 表和 cmap 表，记录字体族名和
+    对目标文字的覆盖情况，并保存到缓存文件。之后只需比较各目录的修改时间即可判断
+    缓存是否有效，按字体族名或文字查找字体都是字典查询。
+    """
+
+    INDEX_VERSION = 2
+
+    def __init__(self, font_dirs: Optional[List[str]] = None, cache_dir: Optional[str] = None,
+                 events: Optional[EventBus] = None):
+        """
+        初始化字体索引
+
+        Args:
+            font_dirs: 要扫描的字体目录，默认使用当前平台的系统字体目录
+            cache_dir: 缓存目录，默认 ~/.cache/you-video
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        platform_dirs = FONT_DIRS.get(sys.platform, FONT_DIRS['linux'])
+        self.font_dirs = [os.path.expanduser(d) for d in (font_dirs or platform_dirs)]
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser('~'), '.cache', 'you-video')
+        self.cache_path = os.path.join(self.cache_dir, 'font_index.json')
+        self._fonts: List[Dict[str, Any]] = []
+        self._by_family: Dict[str, Dict[str, Any]] = {}
+        self._by_path: Dict[str, Dict[str, Any]] = {}
+        self._by_script: Dict[str, Dict[str, Any]] = {}
+        self.events = events or EventBus.with_console()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def resolve(self, font: Optional[str], script: str = 'zh') -> Optional[Dict[str, Any]]:
+        """
+        解析字体名称或路径，保证返回的字体覆盖指定文字
+
+        Args:
+            font: 字体族名、全名或字体文件路径
+            script: 需要覆盖的文字，取值见 SCRIPT_SAMPLES
+
+        Returns:
+            Optional[Dict]: 字体信息（path、index、family、coverage），找不到任何可用字体时返回 None
+        """
+        self._ensure_loaded()
+
+        entry = None
+        if font and os.path.isfile(font):
+            entry = self._by_path.get(os.path.abspath(font))
+            if entry is None:
+                # 不在索引目录中的字体文件，直接解析
+                parsed = _parse_font_file(font)
+                entry = parsed[0] if parsed else {'path': font, 'index': 0, 'family': None, 'style': None,
+                                                  'names': [], 'coverage': {}}
+        elif font:
+            entry = self._by_family.get(font.lower())
+
+        if entry and entry['coverage'].get(script, True):
+            return entry
+
+        fallback = self._by_script.get(script)
+        if fallback:
+            if font:
+                reason = "未找到" if entry is None else "不支持所需文字"
+                self.events.warning('fonts', f"字体 {font} {reason}，改用 {fallback['family']}: {fallback['path']}")
+            return fallback
+
+        return entry
+
+    def font_dir_for(self, entry: Dict[str, Any]) -> str:
+        """
+        返回只包含该字体文件的目录，供 libass 的 fontsdir 使用，避免扫描整个系统字体目录
+
+        Args:
+            entry: resolve() 返回的字体信息
+
+        Returns:
+            str: 目录路径
+        """
+        digest = hashlib.sha1(entry['path'].encode('utf-8')).hexdigest()[:16]
+        font_dir = os.path.join(self.cache_dir, 'fontdirs', digest)
+        link_path = os.path.join(font_dir, os.path.basename(entry['path']))
+        if not os.path.lexists(link_path):
+            os.makedirs(font_dir, exist_ok=True)
+            try:
+                os.symlink(os.path.abspath(entry['path']), link_path)
+            except FileExistsError:
+                pass
+        return font_dir
+
+    def _ensure_loaded(self) -> None:
+        """加载缓存，缓存缺失或目录有变化时重建"""
+        with self._lock:
+            if self._loaded:
+                return
+
+            cached = self._load_cache()
+            if cached is not None and cached.get('dir_mtimes') == self._scan_dir_mtimes():
+                fonts = cached['fonts']
+            else:
+                self.events.info('fonts', "正在建立字体索引...")
+                fonts, dir_mtimes = self._build()
+                self._save_cache({'version': self.INDEX_VERSION, 'dir_mtimes': dir_mtimes, 'fonts': fonts})
+                self.events.info('fonts', f"字体索引已建立: {len(fonts)} 个字体")
+
+            self._set_fonts(fonts)
+            self._loaded = True
+
+    def _set_fonts(self, fonts: List[Dict[str, Any]]) -> None:
+        """建立按族名、路径和文字查找的字典"""
+        self._fonts = fonts
+        self._by_family = {}
+        self._by_path = {}
+        for entry in fonts:
+            self._by_path.setdefault(entry['path'], entry)
+            for name in entry['names']:
+                # 同一字体族有多个字重时，优先使用常规体
+                existing = self._by_family.get(name.lower())
+                if existing is None or (existing.get('style') not in REGULAR_STYLES
+                                        and entry.get('style') in REGULAR_STYLES):
+                    self._by_family[name.lower()] = entry
+
+        self._by_script = {}
+        for script in SCRIPT_SAMPLES:
+            covering = [entry for entry in fonts if entry['coverage'].get(script)]
+            preferred = [self._by_family.get(name.lower()) for name in PREFERRED_FAMILIES.get(script, [])]
+            preferred = [entry for entry in preferred if entry and entry['coverage'].get(script)]
+            if preferred or covering:
+                self._by_script[script] = (preferred or covering)[0]
+
+    def _scan_dir_mtimes(self) -> Dict[str, float]:
+        """收集所有字体目录及其子目录的修改时间，任一目录增删文件都会改变其修改时间"""
+        mtimes = {}
+        for root_dir in self.font_dirs:
+            if not os.path.isdir(root_dir):
+                continue
+            for dirpath, _, _ in os.walk(root_dir, followlinks=True):
+                try:
+                    mtimes[dirpath] = os.stat(dirpath).st_mtime
+                except OSError:
+                    continue
+        return mtimes
+
+    def _build(self) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """扫描所有字体目录，解析字体文件"""
+        fonts = []
+        dir_mtimes = self._scan_dir_mtimes()
+        for dirpath in sorted(dir_mtimes):
+            try:
+                filenames = sorted(os.listdir(dirpath))
+            except OSError:
+                continue
+            for filename in filenames:
+                if filename.lower().endswith(FONT_EXTENSIONS):
+                    fonts.extend(_parse_font_file(os.path.join(dirpath, filename)))
+        return fonts, dir_mtimes
+
+    def _load_cache(self) -> Optional[Dict[str, Any]]:
+        """读取缓存文件，版本不符或损坏时返回 None"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('version') != self.INDEX_VERSION:
+            return None
+        return cached
+
+    def _save_cache(self, data: Dict[str, Any]) -> None:
+        """原子地写入缓存文件"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            self.events.warning('fonts', f"保存字体索引失败: {e}")
+
+def _parse_font_file(path: str) -> List[Dict[str, Any]]:
+    """
+    解析字体文件（TTF/OTF/TTC），返回其中每个字体的族名和文字覆盖情况
+
+    Args:
+        path: 字体文件路径
+
+    Returns:
+        List[Dict]: 字体信息列表，解析失败时为空
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return []
+
+    try:
+        if data[:4] == b'ttcf':
+            num_fonts = struct.unpack_from('>I', data, 8)[0]
+            offsets = struct.unpack_from(f'>{num_fonts}I', data, 12)
+        else:
+            offsets = (0,)
+
+        fonts = []
+        for index, offset in enumerate(offsets):
+            tables = _read_table_directory(data, offset)
+            if 'name' not in tables or 'cmap' not in tables:
+                continue
+            family, style, names = _read_names(data, tables['name'])
+            codepoints = _read_cmap_ranges(data, tables['cmap'])
+            fonts.append({
+                'path': os.path.abspath(path),
+                'index': index,
+                'family': family,
+                'style': style,
+                'names': names,
+                'coverage': {script: _covers(codepoints, sample) for script, sample in SCRIPT_SAMPLES.items()},
+            })
+        return fonts
+    except (struct.error, IndexError, ValueError):
+        return []
+
+def _read_table_directory(data: bytes, offset: int) -> Dict[str, int]:
+    """读取 sfnt 表目录，返回表名到偏移的映射"""
+    num_tables = struct.unpack_from('>H', data, offset + 4)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from('>4sIII', data, offset + 12 + i * 16)
+        tables[tag.decode('latin-1')] = table_offset
+    return tables
+
+def _read_names(data: bytes, offset: int) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """
+    读取 name 表中的字体族名（ID 1、16）、字重样式（ID 2）和全名（ID 4）
+
+    Returns:
+        Tuple: (首选的英文族名, 英文样式名, 所有语言的族名和全名)
+    """
+    _, count, string_offset = struct.unpack_from('>HHH', data, offset)
+    family = None
+    style = None
+    names = []
+    for i in range(count):
+        platform_id, encoding_id, language_id, name_id, length, name_offset = \
+            struct.unpack_from('>HHHHHH', data, offset + 6 + i * 12)
+        if name_id not in (1, 2, 4, 16):
+            continue
+        raw = data[offset + string_offset + name_offset:offset + string_offset + name_offset + length]
+        if platform_id in (0, 3):
+            name = raw.decode('utf-16-be', errors='ignore')
+        elif platform_id == 1 and encoding_id == 0:
+            name = raw.decode('mac_roman', errors='ignore')
+        else:
+            continue
+        name = name.strip('\x00').strip()
+        if not name:
+            continue
+        if name_id == 2:
+            if style is None or (platform_id == 3 and language_id == 0x409):
+                style = name
+            continue
+        if name not in names:
+            names.append(name)
+        # 优先使用 Windows 平台英文的族名
+        if name_id == 1 and (family is None or (platform_id == 3 and language_id == 0x409)):
+            family = name
+    return family, style, names
+
+def _read_cmap_ranges(data: bytes, offset: int) -> List[Tuple[int, int]]:
+    """
+    读取 Unicode cmap 子表，返回有字形的码位区间列表
+
+    只支持最常见的 format 4（BMP）和 format 12（全码位）子表。
+    """
+    _, num_subtables = struct.unpack_from('>HH', data, offset)
+    subtables = {}
+    for i in range(num_subtables):
+        platform_id, encoding_id, sub_offset = struct.unpack_from('>HHI', data, offset + 4 + i * 8)
+        sub_format = struct.unpack_from('>H', data, offset + sub_offset)[0]
+        subtables.setdefault((platform_id, encoding_id, sub_format), offset + sub_offset)
+
+    for key in ((3, 10, 12), (0, 4, 12), (0, 6, 12), (3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)):
+        if key in subtables:
+            if key[2] == 12:
+                return _read_cmap_format12(data, subtables[key])
+            return _read_cmap_format4(data, subtables[key])
+    return []
+
+def _read_cmap_format4(data: bytes, offset: int) -> List[Tuple[int, int]]:
+    """解析 format 4 子表，逐个码位检查字形ID是否为0"""
+    seg_count = struct.unpack_from('>H', data, offset + 6)[0] // 2
+    end_codes = struct.unpack_from(f'>{seg_count}H', data, offset + 14)
+    start_codes = struct.unpack_from(f'>{seg_count}H', data, offset + 16 + seg_count * 2)
+    id_deltas = struct.unpack_from(f'>{seg_count}h', data, offset + 16 + seg_count * 4)
+    range_offsets_pos = offset + 16 + seg_count * 6
+    id_range_offsets = struct.unpack_from(f'>{seg_count}H', data, range_offsets_pos)
+
+    ranges = []
+    for i in range(seg_count):
+        start, end = start_codes[i], end_codes[i]
+        if start == 0xFFFF:
+            continue
+        if id_range_offsets[i] == 0:
+            # 字形ID = 码位 + idDelta，只有映射到0的那个码位没有字形
+            ranges.append((start, end))
+            continue
+        run_start = None
+        for code in range(start, end + 1):
+            glyph_pos = range_offsets_pos + i * 2 + id_range_offsets[i] + (code - start) * 2
+            glyph = struct.unpack_from('>H', data, glyph_pos)[0]
+            if glyph != 0 and run_start is None:
+                run_start = code
+            elif glyph == 0 and run_start is not None:
+                ranges.append((run_start, code - 1))
+                run_start = None
+        if run_start is not None:
+            ranges.append((run_start, end))
+    return ranges
+
+def _read_cmap_format12(data: bytes, offset: int) -> List[Tuple[int, int]]:
+    """解析 format 12 子表的码位分组"""
+    num_groups = struct.unpack_from('>I', data, offset + 12)[0]
+    ranges = []
+    for i in range(num_groups):
+        start, end, _ = struct.unpack_from('>III', data, offset + 16 + i * 12)
+        ranges.append((start, end))
+    return ranges
+
+def _covers(ranges: List[Tuple[int, int]], sample: str) -> bool:
+    """判断码位区间是否覆盖足够比例的样本字"""
+    if not ranges:
+        return False
+    covered = sum(1 for char in sample if any(start <= ord(char) <= end for start, end in ranges))
+    return covered / len(sample) >= COVERAGE_THRESHOLD
+
+_default_index: Optional[FontIndex] = None
+_default_index_lock = threading.Lock()
+
+def get_font_index() -> FontIndex:
+    """
+    返回进程内共享的默认字体索引
+
+    Returns:
+        FontIndex: 字体索引
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = FontIndex()
+        return _default_index
+
+# 简单的测试函数
+if __name__ == "__main__":
+    font = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"Font index loaded successfully, resolved: {get_font_index().resolve(font)}")
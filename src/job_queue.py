@@ -0,0 +1,547 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Iterator
+
+from events import EventBus
+
+class LeaseLostError(RuntimeError):
+    """租约已过期并被其他工作进程领取，当前进程的结果不再有效"""
+
+@dataclass
+class Lease:
+    """工作进程对某个任务当前阶段的租约"""
+    job_id: int
+    stage: str
+    token: str
+    worker_id: str
+    attempt: int
+    expires: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+    state: Dict[str, Any] = field(default_factory=dict)
+    available_at: float = 0.0
+    claimed_at: float = 0.0
+
+class JobQueue:
+    """
+    基于 SQLite 的多机任务队列
+
+    每个任务依次经过 STAGES 中的各个阶段，工作进程按阶段领取任务并获得一个有期限的租约，
+    处理期间定时续约；进程崩溃或失联导致租约过期后，任务会被其他工作进程重新领取。
+    阶段失败时按指数退避重试，超过最大次数后任务标记为失败。
+
+    数据库文件可以放在多台机器共享的存储上。领取任务使用 BEGIN IMMEDIATE 事务，
+    并且使用 DELETE 日志模式（WAL 模式依赖共享内存，不能跨机器使用）。
+    租约时间使用各机器的本地时钟，机器之间需要保持时钟同步。
+    """
+
+    STAGES = ('download', 'transcribe', 'compose')
+
+    # pending: 等待领取；leased: 已被领取；done: 全部阶段完成；failed: 重试次数用尽
+    STATUSES = ('pending', 'leased', 'done', 'failed')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT '{}',
+            stage TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            available_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_token TEXT,
+            lease_expires REAL,
+            last_error TEXT,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, stage, available_at);
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3,
+                 backoff_base: float = 30.0, backoff_max: float = 900.0, events: Optional[EventBus] = None):
+        """
+        打开（必要时创建）任务队列
+
+        Args:
+            path: SQLite 数据库文件路径，多机使用时放在共享存储上
+            lease_seconds: 租约时长（秒），工作进程需要在到期前续约
+            max_attempts: 每个阶段的最大尝试次数（包括租约过期的尝试）
+            backoff_base: 第一次重试前的等待时间（秒），之后每次翻倍
+            backoff_max: 重试等待时间的上限（秒）
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.events = events or EventBus.with_console()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        打开一个新连接；每次操作单独连接，因此可以在续约线程等任意线程中使用
+
+        Yields:
+            sqlite3.Connection: 自动提交模式的连接，事务由 _transaction() 显式开启
+        """
+        conn = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """开启写事务（BEGIN IMMEDIATE 立即获取写锁），正常退出时提交，异常时回滚"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, payload: Dict[str, Any], stage: Optional[str] = None,
+                max_attempts: Optional[int] = None) -> int:
+        """
+        添加一个任务
+
+        Args:
+            payload: 任务参数（URL、模型、字体等），需要可以序列化为 JSON
+            stage: 起始阶段，默认第一个阶段
+            max_attempts: 该任务每个阶段的最大尝试次数，默认使用队列的设置
+
+        Returns:
+            int: 任务ID
+        """
+        stage = stage or self.STAGES[0]
+        if stage not in self.STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (payload, stage, max_attempts, available_at, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), stage, max_attempts or self.max_attempts, now, now, now)
+            )
+            job_id = cursor.lastrowid
+
+        self.events.info('queue', f"已加入任务 #{job_id}，起始阶段: {stage}")
+        return job_id
+
+    def claim(self, worker_id: str, stages: Optional[List[str]] = None,
+              on_expired: Optional[Callable[[Lease], None]] = None) -> Optional[Lease]:
+        """
+        领取一个可处理的任务：等待中且已到重试时间的，或者租约已经过期的
+
+        租约过期且尝试次数已用尽的任务在领取时标记为失败，原持有者已经无法报告结果，
+        因此通过 on_expired 通知调用方。
+
+        Args:
+            worker_id: 工作进程标识，仅用于记录
+            stages: 只领取这些阶段的任务，默认所有阶段
+            on_expired: 可选的回调，参数是因租约过期而最终失败的任务的原租约
+
+        Returns:
+            Optional[Lease]: 租约；没有可领取的任务时为 None
+        """
+        stages = list(stages or self.STAGES)
+        placeholders = ", ".join("?" for _ in stages)
+        now = time.time()
+
+        with self._transaction() as conn:
+            # 租约过期且尝试次数已用尽的任务直接标记为失败，不再重新领取
+            expired = conn.execute(
+                f"SELECT * FROM jobs WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts "
+                f"AND stage IN ({placeholders})",
+                [now] + stages
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', lease_token = NULL, updated = ?, "
+                "last_error = COALESCE(last_error, '') || '租约过期' WHERE id = ?",
+                [(now, row['id']) for row in expired]
+            )
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE stage IN ({placeholders}) AND "
+                f"((status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?)) "
+                f"ORDER BY available_at, id LIMIT 1",
+                stages + [now, now]
+            ).fetchone()
+            if row is not None:
+                token = uuid.uuid4().hex
+                expires = now + self.lease_seconds
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_token = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                    (worker_id, token, expires, now, row['id'])
+                )
+
+        # 事务提交后再通知，回调看到的是已经标记为失败的任务
+        for expired_row in expired:
+            self.events.warning('queue', f"任务 #{expired_row['id']} 的租约已过期（原持有者: "
+                                         f"{expired_row['lease_owner']}），尝试次数已用尽，标记为失败")
+            if on_expired:
+                on_expired(Lease(
+                    job_id=expired_row['id'],
+                    stage=expired_row['stage'],
+                    token=expired_row['lease_token'],
+                    worker_id=expired_row['lease_owner'],
+                    attempt=expired_row['attempts'],
+                    expires=expired_row['lease_expires'],
+                    payload=json.loads(expired_row['payload']),
+                    state=json.loads(expired_row['state']),
+                    available_at=expired_row['available_at'],
+                ))
+
+        if row is None:
+            return None
+        if row['status'] == 'leased':
+            self.events.warning('queue', f"任务 #{row['id']} 的租约已过期（原持有者: {row['lease_owner']}），重新领取")
+
+        return Lease(
+            job_id=row['id'],
+            stage=row['stage'],
+            token=token,
+            worker_id=worker_id,
+            attempt=row['attempts'] + 1,
+            expires=expires,
+            payload=json.loads(row['payload']),
+            state=json.loads(row['state']),
+            available_at=row['available_at'],
+            claimed_at=now,
+        )
+
+    def heartbeat(self, lease: Lease) -> None:
+        """
+        续约，把租约延长 lease_seconds 秒
+
+        Args:
+            lease: 当前持有的租约
+
+        Raises:
+            LeaseLostError: 租约已经被其他工作进程接手
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._update_leased(conn, lease, "lease_expires = ?, updated = ?", (now + self.lease_seconds, now))
+        lease.expires = now + self.lease_seconds
+
+    def complete(self, lease: Lease, outputs: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        完成当前阶段，把输出合并到任务状态中并进入下一阶段
+
+        各阶段可以开始的时间、被领取的时间和完成时间记录在任务状态的 timings 中，
+        用于统计排队等待和处理耗时。
+
+        Args:
+            lease: 当前持有的租约
+            outputs: 本阶段的输出（例如生成的文件路径），后续阶段可以从 Lease.state 读取
+
+        Returns:
+            Optional[str]: 下一阶段名称；全部阶段完成时为 None
+
+        Raises:
+            LeaseLostError: 租约已经被其他工作进程接手，本次结果被丢弃
+        """
+        now = time.time()
+        state = dict(lease.state)
+        state.update(outputs or {})
+        state['timings'] = dict(state.get('timings') or {})
+        state['timings'][lease.stage] = {'available': lease.available_at, 'claimed': lease.claimed_at, 'done': now}
+        index = self.STAGES.index(lease.stage)
+        next_stage = self.STAGES[index + 1] if index + 1 < len(self.STAGES) else None
+
+        with self._transaction() as conn:
+            if next_stage:
+                self._update_leased(
+                    conn, lease,
+                    "state = ?, stage = ?, status = 'pending', attempts = 0, available_at = ?, "
+                    "lease_owner = NULL, lease_token = NULL, lease_expires = NULL, last_error = NULL, updated = ?",
+                    (json.dumps(state, ensure_ascii=False), next_stage, now, now)
+                )
+            else:
+                self._update_leased(
+                    conn, lease,
+                    "state = ?, status = 'done', lease_owner = NULL, lease_token = NULL, "
+                    "lease_expires = NULL, updated = ?",
+                    (json.dumps(state, ensure_ascii=False), now)
+                )
+
+        lease.state = state
+        return next_stage
+
+    def fail(self, lease: Lease, error: str) -> Optional[float]:
+        """
+        记录当前阶段失败，尝试次数未用尽时按指数退避安排重试
+
+        Args:
+            lease: 当前持有的租约
+            error: 错误信息
+
+        Returns:
+            Optional[float]: 距离下次重试的秒数；不再重试时为 None
+
+        Raises:
+            LeaseLostError: 租约已经被其他工作进程接手
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (lease.job_id,)).fetchone()
+            if row is not None and row['attempts'] < row['max_attempts']:
+                # 指数退避并加入随机抖动，避免多台机器同时重试
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (row['attempts'] - 1))
+                delay *= random.uniform(0.5, 1.0)
+                self._update_leased(
+                    conn, lease,
+                    "status = 'pending', available_at = ?, lease_owner = NULL, lease_token = NULL, "
+                    "lease_expires = NULL, last_error = ?, updated = ?",
+                    (now + delay, error, now)
+                )
+                return delay
+
+            self._update_leased(
+                conn, lease,
+                "status = 'failed', lease_token = NULL, lease_expires = NULL, last_error = ?, updated = ?",
+                (error, now)
+            )
+            return None
+
+    def _update_leased(self, conn: sqlite3.Connection, lease: Lease, assignments: str, params: tuple) -> None:
+        """只在租约仍属于当前持有者时更新任务，否则抛出 LeaseLostError"""
+        cursor = conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND lease_token = ? AND status = 'leased'",
+            tuple(params) + (lease.job_id, lease.token)
+        )
+        if cursor.rowcount != 1:
+            raise LeaseLostError(f"任务 #{lease.job_id} 的 {lease.stage} 阶段租约已失效")
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        查询任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict]: 任务记录，payload 和 state 已解析；任务不存在时为 None
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['state'] = json.loads(job['state'])
+        return job
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        按阶段和状态统计任务数
+
+        Returns:
+            Dict: {阶段: {状态: 数量}}，全部完成的任务计在最后一个阶段的 done 下
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, status, COUNT(*) AS n FROM jobs GROUP BY stage, status").fetchall()
+        result = {stage: {status: 0 for status in self.STATUSES} for stage in self.STAGES}
+        for row in rows:
+            result.setdefault(row['stage'], {})[row['status']] = row['n']
+        return result
+
+    def has_unfinished(self) -> bool:
+        """
+        是否还有未完成（等待中或已被领取）的任务
+
+        Returns:
+            bool: 有未完成的任务时为 True
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM jobs WHERE status IN ('pending', 'leased') LIMIT 1").fetchone()
+        return row is not None
+
+class _Heartbeat:
+    """后台线程定时续约，租约丢失时记录下来，由工作循环在阶段结束后处理"""
+
+    def __init__(self, queue: JobQueue, lease: Lease):
+        self.queue = queue
+        self.lease = lease
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{lease.job_id}", daemon=True)
+
+    def _run(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                self.queue.heartbeat(self.lease)
+            except LeaseLostError as e:
+                self.queue.events.warning('queue', str(e))
+                self.lost.set()
+                return
+            except sqlite3.Error as e:
+                # 共享存储暂时不可用时继续尝试，租约在到期前仍然有效
+                self.queue.events.warning('queue', f"续约失败，稍后重试: {e}")
+
+    def __enter__(self) -> '_Heartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def default_worker_id() -> str:
+    """
+    生成工作进程标识：主机名和进程ID
+
+    Returns:
+        str: 工作进程标识
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(queue: JobQueue, handlers: Dict[str, Callable[[Lease], Optional[Dict[str, Any]]]],
+               stages: Optional[List[str]] = None, worker_id: Optional[str] = None,
+               poll_interval: float = 5.0, drain: bool = False, max_jobs: Optional[int] = None,
+               on_finished: Optional[Callable[[Lease, bool], None]] = None) -> int:
+    """
+    工作循环：不断领取指定阶段的任务并交给对应的处理函数
+
+    处理函数接收租约，返回本阶段的输出字典；抛出异常表示本阶段失败。
+    处理期间后台线程定时续约。
+
+    Args:
+        queue: 任务队列
+        handlers: {阶段: 处理函数}
+        stages: 只处理这些阶段，默认 handlers 中的所有阶段
+        worker_id: 工作进程标识，默认 主机名:进程ID
+        poll_interval: 没有可领取任务时的轮询间隔（秒）
+        drain: 为 True 时，队列中没有未完成的任务后退出，否则一直运行
+        max_jobs: 最多处理多少个阶段后退出，默认不限制
+        on_finished: 任务全部完成（True）或最终失败不再重试（False）时的回调，
+            用于释放跨阶段占用的资源；回调出错只记录警告
+
+    Returns:
+        int: 成功完成的阶段数
+    """
+    stages = list(stages or handlers)
+    missing = [stage for stage in stages if stage not in handlers]
+    if missing:
+        raise ValueError(f"No handler for stages: {missing}")
+    worker_id = worker_id or default_worker_id()
+    events = queue.events
+    completed = 0
+    processed = 0
+
+    events.info('queue', f"工作进程 {worker_id} 已启动，处理阶段: {', '.join(stages)}")
+    while max_jobs is None or processed < max_jobs:
+        # 其他工作进程崩溃后留下的、不再重试的任务同样算作最终失败
+        lease = queue.claim(worker_id, stages,
+                            on_expired=lambda expired: _notify_finished(on_finished, expired, False, events))
+        if lease is None:
+            if drain and not queue.has_unfinished():
+                break
+            time.sleep(poll_interval * random.uniform(0.5, 1.5))
+            continue
+
+        processed += 1
+        events.info('queue', f"领取任务 #{lease.job_id} 的 {lease.stage} 阶段（第 {lease.attempt} 次尝试）")
+        try:
+            with _Heartbeat(queue, lease) as heartbeat:
+                try:
+                    outputs = handlers[lease.stage](lease)
+                except Exception as e:
+                    if heartbeat.lost.is_set():
+                        raise LeaseLostError(f"任务 #{lease.job_id} 的租约已失效，失败结果被丢弃") from e
+                    delay = queue.fail(lease, f"{type(e).__name__}: {e}")
+                    if delay is None:
+                        events.warning('queue', f"任务 #{lease.job_id} 的 {lease.stage} 阶段失败，不再重试: {e}")
+                        _notify_finished(on_finished, lease, False, events)
+                    else:
+                        events.warning('queue', f"任务 #{lease.job_id} 的 {lease.stage} 阶段失败，"
+                                                f"{delay:.0f} 秒后重试: {e}")
+                    continue
+
+            next_stage = queue.complete(lease, outputs)
+            completed += 1
+            if next_stage:
+                events.info('queue', f"任务 #{lease.job_id} 的 {lease.stage} 阶段完成，等待 {next_stage} 阶段")
+            else:
+                events.info('queue', f"任务 #{lease.job_id} 已全部完成")
+                _notify_finished(on_finished, lease, True, events)
+        except LeaseLostError as e:
+            events.warning('queue', str(e))
+
+    events.info('queue', f"工作进程 {worker_id} 退出，完成 {completed} 个阶段")
+    return completed
+
+def _notify_finished(on_finished: Optional[Callable[[Lease, bool], None]], lease: Lease, success: bool,
+                     events: EventBus) -> None:
+    """调用任务结束回调，回调出错不影响工作循环"""
+    if on_finished is None:
+        return
+    try:
+        on_finished(lease, success)
+    except Exception as e:
+        events.warning('queue', f"任务 #{lease.job_id} 的结束回调出错: {e}")
+
+def _demo_worker(path: str, stages: List[str], results_path: str) -> None:
+    """本地多进程演示用的工作进程：每个阶段只记录处理者"""
+    queue = JobQueue(path, lease_seconds=5, backoff_base=0.1)
+
+    def handler(lease: Lease) -> Dict[str, Any]:
+        time.sleep(random.uniform(0.01, 0.05))
+        if lease.payload.get('flaky') and lease.attempt == 1:
+            raise RuntimeError("模拟的临时错误")
+        with open(results_path, 'a') as f:
+            f.write(f"{lease.job_id} {lease.stage} {os.getpid()}\n")
+        return {f"{lease.stage}_by": os.getpid()}
+
+    run_worker(queue, {stage: handler for stage in stages}, poll_interval=0.1, drain=True)
+
+# 简单的测试函数
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import multiprocessing
+
+    # 用几个本地进程模拟多台机器：一个只下载，一个只识别，两个处理所有阶段
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "queue.db")
+        results_path = os.path.join(tmp, "results.txt")
+        queue = JobQueue(db_path, backoff_base=0.1)
+        job_ids = [queue.enqueue({'url': f"https://example.com/{i}", 'flaky': i % 5 == 0}) for i in range(20)]
+
+        roles = [['download'], ['transcribe'], list(JobQueue.STAGES), list(JobQueue.STAGES)]
+        processes = [multiprocessing.Process(target=_demo_worker, args=(db_path, stages, results_path))
+                     for stages in roles]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        with open(results_path) as f:
+            records = [line.split() for line in f]
+        done = sum(1 for job_id in job_ids if queue.get(job_id)['status'] == 'done')
+        duplicates = len(records) - len({(job_id, stage) for job_id, stage, _ in records})
+        print(f"{done}/{len(job_ids)} jobs done, {len(records)} stage runs, {duplicates} duplicates")
+        print(json.dumps(queue.counts(), indent=2))
+        sys.exit(0 if done == len(job_ids) and duplicates == 0 else 1)
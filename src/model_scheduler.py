@@ -0,0 +1,222 @@
+import os
+import json
+import socket
+from typing import Optional, Dict, Any, List
+
+from events import EventBus
+
+class ModelScheduler:
+    """
+    按任务选择Whisper模型：在目标耗时内选择能完成的最大模型
+
+    实时率（RTF）= 识别耗时 / 音频时长，按 主机名/设备 记录在本机缓存文件中，
+    每次识别后用指数滑动平均更新；还没有测量值的模型使用保守的默认值。
+    记录文件在第一次使用时读取一次，之后只在 record() 写入时重新读取并刷新。
+    队列中还有其他任务等待识别时，目标耗时按排队数平均分配给每个任务。
+    """
+
+    # 按从小到大排列，选择时默认模型越大效果越好
+    MODELS = ('tiny', 'base', 'small', 'medium', 'large')
+
+    # 没有测量值时使用的 CPU 实时率估计，首次运行后会被实测值替换
+    DEFAULT_RTF = {'tiny': 0.1, 'base': 0.2, 'small': 0.6, 'medium': 1.5, 'large': 3.0}
+
+    # 新测量值在滑动平均中的权重
+    SMOOTHING = 0.3
+
+    def __init__(self, target_seconds: Optional[float] = None, models: Optional[List[str]] = None,
+                 device: Optional[str] = None, rtf_path: Optional[str] = None, events: Optional[EventBus] = None):
+        """
+        初始化调度器
+
+        Args:
+            target_seconds: 每个任务的目标识别耗时（秒），默认与音频时长相同（即不慢于实时）
+            models: 可选的候选模型，按从小到大排列，默认 MODELS
+            device: 推理设备，不同设备的实时率分开记录；不提供时由使用它的 AudioTranslator
+                    设置为自己的推理设备
+            rtf_path: 实时率记录文件，默认 ~/.cache/you-video/rtf.json
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.target_seconds = target_seconds
+        self.models = [model for model in self.MODELS if model in (models or self.MODELS)]
+        self.device = device
+        self.rtf_path = rtf_path or os.path.join(os.path.expanduser('~'), '.cache', 'you-video', 'rtf.json')
+        self.events = events or EventBus.with_console()
+        self._data: Optional[Dict[str, Any]] = None
+
+    @property
+    def host_key(self) -> str:
+        """实时率记录的键：主机名/设备，设备未设置时按CPU记录"""
+        return f"{socket.gethostname()}/{self.device or 'cpu'}"
+
+    def _load(self) -> Dict[str, Any]:
+        """读取所有主机的实时率记录，文件不存在或损坏时返回空记录"""
+        try:
+            with open(self.rtf_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def rtf(self, model: str) -> float:
+        """
+        本机上某个模型的实时率
+
+        Args:
+            model: 模型名称
+
+        Returns:
+            float: 实测的实时率，没有测量值时为默认估计
+        """
+        if self._data is None:
+            self._data = self._load()
+        measured = self._data.get(self.host_key, {}).get(model)
+        if measured:
+            return measured['rtf']
+        return self.DEFAULT_RTF.get(model, max(self.DEFAULT_RTF.values()))
+
+    def estimate(self, model: str, duration: float) -> float:
+        """
+        估计用某个模型识别一段音频的耗时
+
+        Args:
+            model: 模型名称
+            duration: 音频时长（秒）
+
+        Returns:
+            float: 预计耗时（秒）
+        """
+        return self.rtf(model) * duration
+
+    def record(self, model: str, duration: float, elapsed: float) -> float:
+        """
+        记录一次识别的实际耗时，更新本机的实时率
+
+        Args:
+            model: 模型名称
+            duration: 音频时长（秒）
+            elapsed: 识别耗时（秒）
+
+        Returns:
+            float: 更新后的实时率
+        """
+        if duration <= 0:
+            return self.rtf(model)
+
+        sample = elapsed / duration
+        # 重新读取，合并其他进程写入的测量值
+        data = self._load()
+        entry = data.setdefault(self.host_key, {}).get(model)
+        if entry:
+            entry['rtf'] = (1 - self.SMOOTHING) * entry['rtf'] + self.SMOOTHING * sample
+            entry['samples'] += 1
+        else:
+            entry = {'rtf': sample, 'samples': 1}
+        data[self.host_key][model] = entry
+
+        # 先写临时文件再替换，多个进程同时写入时最多丢失一次测量
+        os.makedirs(os.path.dirname(self.rtf_path), exist_ok=True)
+        tmp_path = f"{self.rtf_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.rtf_path)
+        self._data = data
+        return entry['rtf']
+
+    def budget(self, duration: float, queue_depth: int = 0) -> float:
+        """
+        本任务可用的识别时间
+
+        Args:
+            duration: 音频时长（秒）
+            queue_depth: 排在本任务之后、同样等待识别的任务数
+
+        Returns:
+            float: 可用时间（秒）
+        """
+        target = self.target_seconds or duration
+        return target / (queue_depth + 1)
+
+    def choose(self, duration: float, queue_depth: int = 0) -> str:
+        """
+        选择预计能在可用时间内完成的最大模型，都来不及时选择最小的模型
+
+        Args:
+            duration: 音频时长（秒）
+            queue_depth: 排在本任务之后、同样等待识别的任务数
+
+        Returns:
+            str: 模型名称
+        """
+        budget = self.budget(duration, queue_depth)
+        chosen = self.models[0]
+        for model in self.models:
+            if self.estimate(model, duration) <= budget:
+                chosen = model
+
+        self.events.info('schedule', f"音频时长 {duration:.1f} 秒，排队 {queue_depth} 个，可用 {budget:.1f} 秒，"
+                                     f"选择模型 {chosen}（预计 {self.estimate(chosen, duration):.1f} 秒）")
+        return chosen
+
+    def next_model(self, model: str) -> Optional[str]:
+        """
+        比给定模型大一级的候选模型
+
+        Returns:
+            Optional[str]: 模型名称；已经是最大的模型时为 None
+        """
+        if model not in self.models:
+            return None
+        index = self.models.index(model)
+        return self.models[index + 1] if index + 1 < len(self.models) else None
+
+    @staticmethod
+    def low_confidence_ratio(segments: List[Dict[str, Any]], logprob_threshold: float = -1.0,
+                             no_speech_threshold: float = 0.6) -> float:
+        """
+        低置信度片段占识别出的语音时长的比例
+
+        平均对数概率低于阈值，或者识别出了文字但模型认为很可能没有语音（常见于幻听）的片段
+        视为低置信度。
+
+        Args:
+            segments: Whisper 识别结果中的片段
+            logprob_threshold: avg_logprob 低于该值视为低置信度
+            no_speech_threshold: no_speech_prob 高于该值视为低置信度
+
+        Returns:
+            float: 0 到 1 之间的比例；没有片段时为 0
+        """
+        total = 0.0
+        low = 0.0
+        for segment in segments:
+            if not segment.get('text', '').strip():
+                continue
+            length = max(0.0, segment['end'] - segment['start'])
+            total += length
+            if segment.get('avg_logprob', 0.0) < logprob_threshold \
+                    or segment.get('no_speech_prob', 0.0) > no_speech_threshold:
+                low += length
+        return low / total if total else 0.0
+
+# 简单的测试函数
+if __name__ == "__main__":
+    # 传入音频文件时依次用各个模型识别，测量本机的实时率: python src/model_scheduler.py a.wav ...
+    import sys
+    import time
+    import torch
+    import whisper
+    from whisper.audio import SAMPLE_RATE
+
+    scheduler = ModelScheduler(device="cuda" if torch.cuda.is_available() else "cpu")
+    if len(sys.argv) > 1:
+        audios = [whisper.load_audio(path) for path in sys.argv[1:]]
+        duration = sum(len(audio) for audio in audios) / SAMPLE_RATE
+        for model_name in scheduler.models:
+            model = whisper.load_model(model_name, device=scheduler.device)
+            started = time.perf_counter()
+            for audio in audios:
+                model.transcribe(audio, language="en", fp16=False)
+            rtf = scheduler.record(model_name, duration, time.perf_counter() - started)
+            print(f"{model_name:>8}: RTF {rtf:.3f}")
+    for model_name in scheduler.models:
+        print(f"{model_name:>8}: RTF {scheduler.rtf(model_name):.3f}")
@@ -0,0 +1,176 @@
+import os
+import json
+from typing import Optional, Dict, Any, Callable
+
+from events import EventBus
+
+class SubtitleStream:
+    """
+    把字幕逐条追加到原文和译文两个SRT文件，并在检查点把进度持久化
+
+    每条字幕写入后只刷新到操作系统；检查点时先 fsync 两个SRT文件，再原子地替换检查点文件，
+    检查点中记录两个文件当时的长度。进程崩溃后从检查点恢复时，把SRT文件截断到记录的长度，
+    丢掉检查点之后写入的不完整内容，再从记录的位置继续。
+    """
+
+    VERSION = 1
+
+    def __init__(self, original_path: str, translated_path: str, checkpoint_path: str,
+                 format_time: Callable[[float], str], events: Optional[EventBus] = None):
+        """
+        初始化字幕流
+
+        Args:
+            original_path: 原文SRT文件路径
+            translated_path: 译文SRT文件路径
+            checkpoint_path: 检查点文件路径
+            format_time: 把秒数格式化为SRT时间戳的函数
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.paths = {'original': original_path, 'translated': translated_path}
+        self.checkpoint_path = checkpoint_path
+        self.format_time = format_time
+        self.events = events or EventBus.with_console()
+        self.cues = 0
+        self.identity: Dict[str, Any] = {}
+        self.state: Dict[str, Any] = {}
+        self._files = {}
+
+    def open(self, identity: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        打开SRT文件；有与本次任务一致的检查点时从检查点恢复，否则从头开始
+
+        Args:
+            identity: 标识本次任务输入的字段（音频路径、帧数等），与检查点中记录的不同时不恢复
+
+        Returns:
+            Dict: 恢复的状态（open 之前最后一次 checkpoint() 传入的 state），从头开始时为空
+        """
+        checkpoint = self.load_checkpoint()
+        if checkpoint and checkpoint.get('identity') != identity:
+            self.events.warning('subtitles', f"检查点与当前输入不一致，从头开始: {self.checkpoint_path}")
+            checkpoint = None
+        if checkpoint and not all(os.path.exists(path) and os.path.getsize(path) >= checkpoint['sizes'][name]
+                                  for name, path in self.paths.items()):
+            self.events.warning('subtitles', f"字幕文件比检查点记录的短，从头开始: {self.checkpoint_path}")
+            checkpoint = None
+
+        self.identity = identity
+        for name, path in self.paths.items():
+            # 'a+' 不会截断已有内容，随后按检查点记录的长度截断
+            self._files[name] = open(path, 'a+', encoding='utf-8')
+            self._files[name].truncate(checkpoint['sizes'][name] if checkpoint else 0)
+            self._files[name].seek(0, os.SEEK_END)
+
+        if checkpoint:
+            self.cues = checkpoint['cues']
+            self.state = checkpoint['state']
+            self.events.info('subtitles', f"从检查点恢复: 已写入 {self.cues} 条字幕")
+        return dict(self.state)
+
+    def append(self, segment: Dict[str, Any]) -> None:
+        """
+        追加一条字幕到两个SRT文件
+
+        Args:
+            segment: 包含 start、end、text 以及可选 translated_text 的片段
+        """
+        self.cues += 1
+        timing = f"{self.format_time(segment['start'])} --> {self.format_time(segment['end'])}"
+        texts = {'original': segment['text'].strip(),
+                 'translated': segment.get('translated_text', segment['text']).strip()}
+        for name, f in self._files.items():
+            f.write(f"{self.cues}\n{timing}\n{texts[name]}\n\n")
+            f.flush()
+
+    def checkpoint(self, **state) -> None:
+        """
+        把已写入的字幕落盘，并原子地记录进度
+
+        Args:
+            **state: 恢复时需要的状态（处理到的位置、使用的模型等），必须可以序列化为JSON
+        """
+        sizes = {}
+        for name, f in self._files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            sizes[name] = f.tell()
+
+        self.state = state
+        data = {'version': self.VERSION, 'identity': self.identity, 'cues': self.cues, 'sizes': sizes,
+                'state': state}
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self._fsync_directory()
+
+    def finish(self) -> None:
+        """全部写完：落盘并删除检查点"""
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def close(self) -> None:
+        """关闭SRT文件，保留检查点"""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """读取检查点，不存在、损坏或版本不同时返回 None"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return checkpoint if checkpoint.get('version') == self.VERSION else None
+
+    def _fsync_directory(self) -> None:
+        """替换文件后同步所在目录，确保断电后检查点文件名指向新内容（部分平台不支持，忽略）"""
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.checkpoint_path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'SubtitleStream':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# 简单的测试函数
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = [os.path.join(tmp_dir, name) for name in ('en.srt', 'zh.srt', 'checkpoint.json')]
+        format_time = lambda seconds: f"00:00:{int(seconds):02d},000"
+
+        # 写两条并建立检查点，再写一条后模拟崩溃
+        stream = SubtitleStream(*paths, format_time=format_time)
+        stream.open({'audio': 'demo'})
+        stream.append({'start': 0, 'end': 2, 'text': 'Hello', 'translated_text': '你好'})
+        stream.append({'start': 2, 'end': 4, 'text': 'World', 'translated_text': '世界'})
+        stream.checkpoint(position=4.0)
+        stream.append({'start': 4, 'end': 6, 'text': 'Lost', 'translated_text': '丢失'})
+        stream.close()
+
+        # 恢复后第三条被丢弃，从 4 秒继续
+        with SubtitleStream(*paths, format_time=format_time) as resumed:
+            print("恢复状态:", resumed.open({'audio': 'demo'}))
+            resumed.append({'start': 4, 'end': 6, 'text': 'Again', 'translated_text': '再次'})
+            resumed.finish()
+        with open(paths[1], 'r', encoding='utf-8') as f:
+            print(f.read())
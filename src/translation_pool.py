@@ -0,0 +1,410 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from events import EventBus, TranslationError
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后暂停使用该后端，冷却时间过后放行一个探测请求
+
+    closed: 正常；open: 熔断中，拒绝请求；half_open: 冷却结束，等待探测请求的结果。
+    探测请求超过 reset_timeout 仍没有结果时视为失败，重新熔断，冷却后再放行下一个探测请求。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后多久允许探测请求（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        是否允许发出请求；冷却结束时只放行一个探测请求
+
+        Returns:
+            bool: 允许时为 True
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'half_open' and now - self.probe_started >= self.reset_timeout:
+                # 探测请求一直没有结果（例如被对冲请求抢先后迟迟不返回），按失败处理
+                self.state = 'open'
+                self.opened_at = now
+                return False
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """请求成功，恢复正常"""
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """请求失败或超时；探测请求失败时重新熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+class LatencyStats:
+    """记录最近若干次成功请求的延迟，以及错误和超时次数"""
+
+    def __init__(self, window: int = 200):
+        """
+        Args:
+            window: 计算分位数时使用的最近请求数
+        """
+        self.latencies = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """记录一次成功请求的延迟（秒）"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.count += 1
+
+    def record_error(self, timeout: bool = False) -> None:
+        """记录一次失败的请求"""
+        with self._lock:
+            self.errors += 1
+            if timeout:
+                self.timeouts += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        延迟分位数
+
+        Args:
+            p: 0 到 100 之间的百分位
+
+        Returns:
+            Optional[float]: 延迟（秒）；还没有成功请求时为 None
+        """
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * (len(samples) - 1)))))
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict: 成功次数、错误次数、超时次数和 p50/p95/p99 延迟
+        """
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+class TranslationBackend:
+    """一个翻译后端：翻译函数加上各自的超时时间、熔断器和延迟统计"""
+
+    def __init__(self, name: str, translate: Callable[[str], str], timeout: float = 10.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: 后端名称
+            translate: 翻译函数，接收原文返回译文，失败时抛出异常
+            timeout: 单次请求的超时时间（秒）
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后多久允许探测请求（秒）
+        """
+        self.name = name
+        self.translate = translate
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = LatencyStats()
+
+def _deep_translator_backend(name: str, factory: Callable[[], Any], timeout: float) -> TranslationBackend:
+    """把 deep_translator 的翻译器包装成后端，空结果视为失败"""
+    translator = factory()
+
+    def translate(text: str) -> str:
+        result = translator.translate(text)
+        if not result or not result.strip():
+            raise TranslationError(f"{name} 返回了空结果")
+        return result
+
+    return TranslationBackend(name, translate, timeout=timeout)
+
+# 内置后端的翻译目标语言
+TARGET_LANGUAGE = 'zh-CN'
+
+def _google_backend(timeout: float) -> TranslationBackend:
+    from deep_translator import GoogleTranslator
+    return _deep_translator_backend('google', lambda: GoogleTranslator(source='en', target=TARGET_LANGUAGE), timeout)
+
+def _mymemory_backend(timeout: float) -> TranslationBackend:
+    from deep_translator import MyMemoryTranslator
+    return _deep_translator_backend('mymemory', lambda: MyMemoryTranslator(source='en-US', target=TARGET_LANGUAGE), timeout)
+
+# 可以通过名称创建的内置后端
+BACKENDS = {
+    'google': _google_backend,
+    'mymemory': _mymemory_backend,
+}
+
+def create_backends(names: List[str], timeout: float = 10.0) -> List[TranslationBackend]:
+    """
+    按名称创建内置翻译后端，顺序即优先级
+
+    Args:
+        names: 后端名称列表，取值见 BACKENDS
+        timeout: 每个后端单次请求的超时时间（秒）
+
+    Returns:
+        List[TranslationBackend]: 后端列表
+    """
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown translation backends: {unknown}")
+    return [BACKENDS[name](timeout) for name in names]
+
+class _Call:
+    """一次已发出的请求"""
+
+    def __init__(self, backend: TranslationBackend):
+        self.backend = backend
+        self.started = time.monotonic()
+        self.deadline = self.started + backend.timeout
+        self.abandoned = False
+
+class TranslationPool:
+    """
+    翻译后端池
+
+    按优先级使用第一个未熔断的后端；请求在该后端的 p95 延迟内还没有返回时，
+    向下一个后端发出一份相同的对冲请求，取先成功的结果。请求失败或超时后换一个后端重试，
+    所有后端都失败才放弃。每个后端分别记录延迟分位数、错误和超时次数。
+    """
+
+    def __init__(self, backends: List[TranslationBackend], hedge: bool = True, hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.2, min_samples: int = 20, max_attempts: Optional[int] = None,
+                 events: Optional[EventBus] = None):
+        """
+        Args:
+            backends: 翻译后端，顺序即优先级
+            hedge: 是否发出对冲请求
+            hedge_delay: 后端的延迟样本不足时使用的对冲等待时间（秒）
+            min_hedge_delay: 对冲等待时间的下限（秒），避免 p95 很小时几乎每个请求都被对冲
+            min_samples: 至少有多少个延迟样本后才使用 p95 作为对冲等待时间
+            max_attempts: 每段文本最多尝试几轮（对冲请求与原请求算同一轮），默认等于后端数量（至少2轮）
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        if not backends:
+            raise ValueError("TranslationPool needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge and len(backends) > 1
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts or max(2, len(backends))
+        self.events = events or EventBus.with_console()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        # 超时的请求无法取消，线程数留出余量，避免卡住的请求占满线程池
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(backends)),
+                                            thread_name_prefix="translate")
+
+    def translate(self, text: str) -> Tuple[str, str]:
+        """
+        翻译一段文本
+
+        Args:
+            text: 原文
+
+        Returns:
+            Tuple[str, str]: 译文和实际返回结果的后端名称
+
+        Raises:
+            TranslationError: 所有后端都失败或处于熔断状态
+        """
+        errors = []
+        tried = set()
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+            backend = self._pick(tried)
+            if backend is None and tried:
+                # 每个后端都试过一次，剩余的尝试次数重新从优先级最高的后端开始
+                tried.clear()
+                backend = self._pick(tried)
+            if backend is None:
+                break
+            tried.add(backend.name)
+
+            calls: Dict[Future, _Call] = {}
+            self._submit(backend, text, calls)
+            hedge_at = time.monotonic() + self._hedge_delay(backend) if self.hedge else None
+
+            while calls:
+                now = time.monotonic()
+                deadlines = [call.deadline for call in calls.values()]
+                if hedge_at is not None:
+                    deadlines.append(hedge_at)
+                done, _ = wait(list(calls), timeout=max(0.0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    call = calls.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(f"{call.backend.name}: {e}")
+                        continue
+                    # 先返回的结果胜出，其余请求不再等待，它们完成后仍会计入各自的延迟统计
+                    for other in calls.values():
+                        other.abandoned = True
+                    if call.backend is not backend:
+                        self.hedge_wins += 1
+                    return result, call.backend.name
+
+                now = time.monotonic()
+                for future, call in list(calls.items()):
+                    if now >= call.deadline:
+                        call.abandoned = True
+                        calls.pop(future)
+                        call.backend.stats.record_error(timeout=True)
+                        call.backend.breaker.record_failure()
+                        errors.append(f"{call.backend.name}: 超过 {call.backend.timeout} 秒未返回")
+
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    hedge_backend = self._pick(tried)
+                    if hedge_backend is not None and calls:
+                        tried.add(hedge_backend.name)
+                        self.hedges += 1
+                        self._submit(hedge_backend, text, calls)
+
+        raise TranslationError("所有翻译后端都失败: " + "; ".join(errors or ["没有可用的后端"]))
+
+    def _pick(self, exclude: set) -> Optional[TranslationBackend]:
+        """按优先级选择第一个未排除且未熔断的后端"""
+        for backend in self.backends:
+            if backend.name not in exclude and backend.breaker.allow():
+                return backend
+        return None
+
+    def _hedge_delay(self, backend: TranslationBackend) -> float:
+        """对冲等待时间：该后端最近的 p95 延迟，样本不足时使用默认值"""
+        p95 = backend.stats.percentile(95)
+        delay = p95 if p95 is not None and len(backend.stats.latencies) >= self.min_samples else self.hedge_delay
+        return min(max(delay, self.min_hedge_delay), backend.timeout)
+
+    def _submit(self, backend: TranslationBackend, text: str, calls: Dict[Future, _Call]) -> None:
+        """在线程池中发出请求，完成时更新该后端的统计和熔断器"""
+        call = _Call(backend)
+        future = self._executor.submit(backend.translate, text)
+        calls[future] = call
+        future.add_done_callback(lambda f: self._on_done(call, f))
+
+    @staticmethod
+    def _on_done(call: _Call, future: Future) -> None:
+        """
+        请求完成的回调；已经按超时处理过的请求不再重复计数
+
+        熔断器处于 half_open 时，不论请求是否已被放弃或超时，结果都要交给熔断器，
+        否则被对冲请求抢先、之后又超时返回的探测请求会让熔断器一直停在 half_open。
+        """
+        late = time.monotonic() >= call.deadline
+        breaker = call.backend.breaker
+        probing = breaker.state == 'half_open'
+        if future.exception() is None:
+            call.backend.stats.record(time.monotonic() - call.started)
+            # 超时后才返回的结果只计入延迟，不让过慢的后端因此恢复；探测请求超时按失败处理
+            if not late:
+                breaker.record_success()
+            elif probing:
+                breaker.record_failure()
+        elif probing or not (call.abandoned and late):
+            call.backend.stats.record_error()
+            breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict: 每个后端的延迟分位数、错误次数和熔断状态，以及对冲和重试次数
+        """
+        return {
+            'backends': {
+                backend.name: {**backend.stats.snapshot(), 'state': backend.breaker.state}
+                for backend in self.backends
+            },
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'retries': self.retries,
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """
+        通过事件总线输出各后端的延迟统计
+
+        Returns:
+            Dict: 同 stats()
+        """
+        stats = self.stats()
+
+        def ms(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value * 1000:.0f}ms"
+
+        for name, backend in stats['backends'].items():
+            self.events.info('translate', f"翻译后端 {name}: 成功 {backend['count']} 次，错误 {backend['errors']} 次"
+                                          f"（超时 {backend['timeouts']} 次），p50 {ms(backend['p50'])}，"
+                                          f"p95 {ms(backend['p95'])}，p99 {ms(backend['p99'])}，状态 {backend['state']}")
+        self.events.info('translate', f"对冲请求 {stats['hedges']} 次（胜出 {stats['hedge_wins']} 次），"
+                                      f"换后端重试 {stats['retries']} 次")
+        return stats
+
+    def close(self) -> None:
+        """关闭线程池，不等待仍未返回的请求"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# 简单的测试函数
+if __name__ == "__main__":
+    import random
+
+    # 用模拟后端演示对冲和故障切换：primary 偶尔很慢或出错，backup 稳定
+    def flaky(text: str) -> str:
+        roll = random.random()
+        if roll < 0.1:
+            raise RuntimeError("模拟的后端错误")
+        time.sleep(1.5 if roll < 0.2 else random.uniform(0.01, 0.03))
+        return f"[primary] {text}"
+
+    def stable(text: str) -> str:
+        time.sleep(random.uniform(0.02, 0.05))
+        return f"[backup] {text}"
+
+    pool = TranslationPool([TranslationBackend('primary', flaky, timeout=1.0),
+                            TranslationBackend('backup', stable, timeout=1.0)],
+                           hedge_delay=0.1, min_hedge_delay=0.05)
+    winners = [pool.translate(f"segment {i}")[1] for i in range(100)]
+    print({name: winners.count(name) for name in set(winners)})
+    pool.report()
+    pool.close()
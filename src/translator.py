@@ -1,111 +1,395 @@
 import os
+import sys
+import time
+import torch
 import whisper
-from pydub import AudioSegment
-from deep_translator import GoogleTranslator
-from typing import List, Dict, Any, Optional
+from whisper.audio import N_SAMPLES, SAMPLE_RATE, HOP_LENGTH
+from whisper.tokenizer import get_tokenizer
+from typing import List, Dict, Any, Optional, Tuple, Union, Sequence
 import json
+import wave
+import numpy as np
 import tempfile
 
+from artifacts import ArtifactStore
+from ffmpeg_runner import FFmpegRunner, window_args, window_suffix
+from events import EventBus, ExtractionError, TranscriptionError, TranslationError
+from worker_pool import WhisperWorkerPool
+from model_scheduler import ModelScheduler
+from translation_pool import TranslationPool, create_backends, TARGET_LANGUAGE
+from fingerprint import FingerprintIndex, FingerprintMatch, compute_fingerprint
+from subtitle_stream import SubtitleStream
+
 class AudioTranslator:
     """音频提取、语音识别和翻译器"""
     
-    def __init__(self, model_name: str = "base"):
+    # 低置信度语音超过该比例时升级模型
+    LOW_CONFIDENCE_RATIO = 0.2
+    
+    def __init__(self, model_name: str = "base", artifact_store: Optional[ArtifactStore] = None,
+                 job_id: Optional[str] = None, device: Optional[str] = None,
+                 ffmpeg_runner: Optional[FFmpegRunner] = None, events: Optional[EventBus] = None,
+                 num_workers: int = 0, model_scheduler: Optional[ModelScheduler] = None, escalate: bool = False,
+                 translation_pool: Optional[TranslationPool] = None,
+                 fingerprint_index: Optional[FingerprintIndex] = None):
         """
         初始化翻译器
         
         Args:
-            model_name: Whisper模型名称 (tiny, base, small, medium, large)
+            model_name: Whisper模型名称 (tiny, base, small, medium, large)，
+                        auto 表示由 model_scheduler 按音频时长和排队情况为每个任务选择
+            artifact_store: 可选的产物登记簿，提取的音频和生成的字幕会登记到其中
+            job_id: 当前任务ID，用于登记产物归属
+            device: 可选的推理设备（如 "cpu"、"cuda"），默认与Whisper相同（有GPU时为cuda）
+            ffmpeg_runner: 可选的ffmpeg进程管理器，用于提取音频
+            events: 可选的事件总线，默认只输出到控制台
+            num_workers: 语音识别工作进程数，大于0时启用共享权重的多进程模式（仅CPU）
+            model_scheduler: 可选的模型调度器，记录各模型在本机的实时率；model_name 为 auto 或
+                             启用 escalate 时需要
+            escalate: 识别结果置信度低时，是否换用大一级的模型重新识别
+            translation_pool: 可选的翻译后端池，默认依次使用 Google 和 MyMemory
+            fingerprint_index: 可选的声学指纹索引，提供时相同的音频（例如重新上传的视频）
+                               直接复用以前在相同设置下的识别和翻译结果
         """
-        print(f"正在加载Whisper模型: {model_name}")
-        self.whisper_model = whisper.load_model(model_name)
-        self.translator = GoogleTranslator(source='en', target='zh-CN')
+        self.artifact_store = artifact_store
+        self.job_id = job_id
+        self.events = events or EventBus.with_console(job_id=job_id)
+        self.ffmpeg_runner = ffmpeg_runner or FFmpegRunner(events=self.events)
+        self.model_name = model_name
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.escalate = escalate
+        self.model_scheduler = model_scheduler
+        if self.model_scheduler is None and (model_name == 'auto' or escalate):
+            self.model_scheduler = ModelScheduler(events=self.events)
+        if self.model_scheduler is not None and self.model_scheduler.device is None:
+            # 实时率按实际使用的推理设备记录
+            self.model_scheduler.device = self.device
+        
+        # 已加载的模型按名称缓存，自动选择或升级模型时同一进程内只加载一次
+        self.whisper_models: Dict[str, Any] = {}
+        self.worker_pool = None
+        if model_name == 'auto':
+            if num_workers > 0:
+                self.events.warning('load_model', "自动选择模型时不使用语音识别工作进程")
+        elif num_workers > 0:
+            # 模型只在父进程加载一次，工作进程通过mmap共享同一份权重
+            self.worker_pool = WhisperWorkerPool(model_name, num_workers=num_workers, events=self.events)
+            self.whisper_models[model_name] = self.worker_pool.model
+        else:
+            self.load_model(model_name)
+        self.translation_pool = translation_pool or TranslationPool(create_backends(['google', 'mymemory']),
+                                                                    events=self.events)
+        self.fingerprint_index = fingerprint_index
     
-    def extract_audio(self, video_path: str) -> str:
+    @property
+    def whisper_model(self) -> Any:
+        """默认模型；自动选择模式下为最小的候选模型"""
+        if self.model_name == 'auto':
+            return self.load_model(self.model_scheduler.models[0])
+        return self.load_model(self.model_name)
+    
+    def load_model(self, model_name: str) -> Any:
+        """
+        加载Whisper模型，已加载过的模型直接复用
+        
+        Args:
+            model_name: 模型名称
+            
+        Returns:
+            whisper.model.Whisper: 模型
+        """
+        if model_name not in self.whisper_models:
+            self.events.info('load_model', f"正在加载Whisper模型: {model_name}")
+            self.whisper_models[model_name] = whisper.load_model(model_name, device=self.device)
+        return self.whisper_models[model_name]
+    
+    def extract_audio(self, video_path: str, source_path: Optional[str] = None,
+                      start: Optional[float] = None, end: Optional[float] = None,
+                      sample_rate: Optional[int] = None) -> str:
         """
         从视频中提取音频
         
         Args:
-            video_path: 视频文件路径
+            video_path: 视频文件路径，用于确定音频文件的存放位置和文件名
+            source_path: 可选的实际读取来源（如流水线下载得到的纯音频文件），默认读取 video_path
+            start: 可选的时间窗口起点（秒），只提取窗口内的音频
+            end: 可选的时间窗口终点（秒）
+            sample_rate: 可选的输出采样率，指定时同时混合为单声道（流式识别按该格式直接读取）
             
         Returns:
             str: 提取的音频文件路径
         """
-        try:
-            print(f"正在从视频中提取音频: {video_path}")
-            
+        source_path = source_path or video_path
+        with self.events.stage('extract', f"正在从视频中提取音频: {source_path}", error_type=ExtractionError):
             # 创建临时音频文件
             base_name = os.path.splitext(os.path.basename(video_path))[0]
             audio_dir = os.path.join(os.path.dirname(video_path), "audio")
             os.makedirs(audio_dir, exist_ok=True)
-            audio_path = os.path.join(audio_dir, f"{base_name}.wav")
+            rate_suffix = f".{sample_rate}hz" if sample_rate else ""
+            audio_path = os.path.join(audio_dir, f"{base_name}{window_suffix(start, end)}{rate_suffix}.wav")
+            resample_args = ["-ac", "1", "-ar", str(sample_rate)] if sample_rate else []
             
-            # 使用pydub提取音频
-            audio = AudioSegment.from_file(video_path, format="mp4")
-            audio.export(audio_path, format="wav")
+            # 使用ffmpeg直接把音轨转成WAV，不在内存中解码整段音频；有时间窗口时只解码窗口内的部分
+            self.ffmpeg_runner.run(window_args(start, end) + [
+                "-i", source_path,
+                "-vn",
+                "-acodec", "pcm_s16le",
+            ] + resample_args + [
+                "-threads", str(FFmpegRunner.threads_per_job()),
+                audio_path
+            ], duration=None if end is None else end - (start or 0), stage='extract', events=self.events)
+            if self.artifact_store:
+                self.artifact_store.track(audio_path, job_id=self.job_id, kind='intermediate')
             
-            print(f"音频提取完成: {audio_path}")
+            self.events.info('extract', f"音频提取完成: {audio_path}")
             return audio_path
-            
-        except Exception as e:
-            print(f"提取音频时出错: {str(e)}")
-            raise
     
-    def transcribe_audio(self, audio_path: str, language: str = "en") -> Dict[str, Any]:
+    def transcribe_audio(self, audio_path: Union[str, np.ndarray], language: str = "en",
+                         model_name: Optional[str] = None, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
         """
         使用Whisper进行语音识别
         
         Args:
-            audio_path: 音频文件路径
+            audio_path: 音频文件路径，或者 16kHz 单声道的 float32 采样（流式识别的一个窗口）
             language: 语言代码，默认为英语
+            model_name: 可选的模型名称，默认使用初始化时指定的模型
+            initial_prompt: 可选的提示文本，流式识别时传入上一个窗口的结尾，保持上下文连贯
             
         Returns:
             Dict: 包含识别结果的字典
         """
-        try:
-            print(f"正在进行语音识别: {audio_path}")
+        if not model_name or model_name == 'auto':
+            model_name = self.whisper_model_name()
+        if isinstance(audio_path, str):
+            label, duration = audio_path, None
+        else:
+            label, duration = f"{len(audio_path) / SAMPLE_RATE:.1f} 秒音频", len(audio_path) / SAMPLE_RATE
+        options = {'language': language}
+        if initial_prompt:
+            options['initial_prompt'] = initial_prompt
+        with self.events.stage('transcribe', f"正在进行语音识别: {label}（模型 {model_name}）",
+                               error_type=TranscriptionError):
+            # 使用Whisper进行语音识别，启用工作进程池时交给工作进程处理
+            use_pool = self.worker_pool is not None and model_name == self.model_name
+            model = None if use_pool else self.load_model(model_name)
+            started = time.perf_counter()
+            if use_pool:
+                result = self.worker_pool.transcribe(audio_path, **options)
+            else:
+                result = model.transcribe(audio_path, **options)
             
-            # 使用Whisper进行语音识别
-            result = self.whisper_model.transcribe(audio_path, language=language)
+            # 记录本机的实时率（不含模型加载时间），供之后的任务选择模型
+            if self.model_scheduler:
+                self.model_scheduler.record(model_name, duration or self._audio_duration(audio_path),
+                                            time.perf_counter() - started)
             
-            print(f"语音识别完成，检测到文本长度: {len(result['text'])} 字符")
+            self.events.info('transcribe', f"语音识别完成，检测到文本长度: {len(result['text'])} 字符")
             return result
+    
+    def transcribe_batch(self, audio_paths: List[str], language: str = "en",
+                         batch_size: int = 8) -> List[Dict[str, Any]]:
+        """
+        批量语音识别：把多个音频的log-mel频谱填充并堆叠成一个批次，
+        编码器和解码器对整个批次一起推理，适合大量短视频排队的场景
+        
+        超过30秒的音频会被切成多个30秒的块，每块作为批次中的一项，
+        识别完成后按时间偏移拼回各自的结果。
+        
+        Args:
+            audio_paths: 音频文件路径列表
+            language: 语言代码，默认为英语
+            batch_size: 每批推理的30秒块数量
             
-        except Exception as e:
-            print(f"语音识别时出错: {str(e)}")
-            raise
+        Returns:
+            List[Dict]: 与 audio_paths 一一对应的识别结果，格式与 transcribe_audio 相同
+        """
+        model = self.whisper_model
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                  language=language, task="transcribe")
+        options = whisper.DecodingOptions(language=language, task="transcribe",
+                                          fp16=model.device.type != "cpu")
+        
+        with self.events.stage('transcribe', f"正在批量进行语音识别: {len(audio_paths)} 个音频，批大小 {batch_size}",
+                               error_type=TranscriptionError):            
+            # 解码音频并切成30秒的块，每块记录所属音频和起始时间
+            audios = [whisper.load_audio(path) for path in audio_paths]
+            chunks = []
+            for clip_index, audio in enumerate(audios):
+                for offset in range(0, max(len(audio), 1), N_SAMPLES):
+                    chunks.append((clip_index, offset))
+            
+            results = [{'text': '', 'segments': [], 'language': language} for _ in audio_paths]
+            for batch_start in range(0, len(chunks), batch_size):
+                batch = chunks[batch_start:batch_start + batch_size]
+                
+                # 每块填充到30秒后计算log-mel频谱，堆叠成 (batch, n_mels, 3000)
+                mel_batch = torch.stack([
+                    whisper.log_mel_spectrogram(
+                        whisper.pad_or_trim(audios[clip_index][offset:offset + N_SAMPLES]),
+                        n_mels=model.dims.n_mels
+                    )
+                    for clip_index, offset in batch
+                ]).to(model.device)
+                
+                decoded = whisper.decode(model, mel_batch, options)
+                
+                for (clip_index, offset), decoding_result in zip(batch, decoded):
+                    chunk_duration = min(N_SAMPLES, len(audios[clip_index]) - offset) / SAMPLE_RATE
+                    segments = self._segments_from_decoding(decoding_result, tokenizer,
+                                                            offset / SAMPLE_RATE, chunk_duration)
+                    for segment in segments:
+                        segment['id'] = len(results[clip_index]['segments'])
+                        results[clip_index]['segments'].append(segment)
+                
+                done = min(batch_start + batch_size, len(chunks))
+                self.events.progress('transcribe', done / len(chunks), "批量语音识别进度", chunks=done)
+            
+            for result in results:
+                result['text'] = ''.join(segment['text'] for segment in result['segments'])
+            
+            self.events.info('transcribe', f"批量语音识别完成: {len(audio_paths)} 个音频，共 {len(chunks)} 个30秒块")
+            return results
     
-    def translate_segments(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _segments_from_decoding(self, decoding_result: Any, tokenizer: Any, time_offset: float,
+                                chunk_duration: float) -> List[Dict[str, Any]]:
+        """
+        把一个30秒块的解码结果按时间戳token切分成片段
+        
+        Args:
+            decoding_result: whisper.decode 返回的 DecodingResult
+            tokenizer: Whisper分词器
+            time_offset: 该块在原音频中的起始时间（秒）
+            chunk_duration: 该块的实际时长（秒）
+            
+        Returns:
+            List[Dict]: 与 whisper transcribe 输出字段一致的片段列表
+        """
+        # 与 whisper.transcribe 相同的静音判定
+        if decoding_result.no_speech_prob > 0.6 and decoding_result.avg_logprob < -1.0:
+            return []
+        
+        time_precision = HOP_LENGTH * 2 / SAMPLE_RATE
+        timestamp_begin = tokenizer.timestamp_begin
+        segments = []
+        
+        def add_segment(start: float, end: float, text_tokens: List[int]):
+            text = tokenizer.decode(text_tokens)
+            if not text.strip():
+                return
+            segments.append({
+                'seek': int(time_offset * SAMPLE_RATE / HOP_LENGTH),
+                'start': round(time_offset + start, 3),
+                'end': round(time_offset + min(end, chunk_duration), 3),
+                'text': text,
+                'tokens': text_tokens,
+                'temperature': decoding_result.temperature,
+                'avg_logprob': decoding_result.avg_logprob,
+                'compression_ratio': decoding_result.compression_ratio,
+                'no_speech_prob': decoding_result.no_speech_prob,
+            })
+        
+        # 解码结果形如 <|0.00|> 文本 <|2.40|><|2.40|> 文本 <|5.00|>
+        segment_start = None
+        text_tokens = []
+        for token in decoding_result.tokens:
+            if token >= timestamp_begin:
+                timestamp = (token - timestamp_begin) * time_precision
+                if segment_start is not None and text_tokens:
+                    add_segment(segment_start, timestamp, text_tokens)
+                    segment_start = None
+                    text_tokens = []
+                else:
+                    segment_start = timestamp
+            else:
+                text_tokens.append(token)
+        
+        # 最后一段没有结束时间戳时，延续到块的末尾
+        if text_tokens:
+            add_segment(segment_start or 0.0, chunk_duration, text_tokens)
+        
+        return segments
+    
+    def benchmark_batch_sizes(self, audio_paths: List[str], batch_sizes: Sequence[int] = (1, 2, 4, 8, 16),
+                              language: str = "en") -> List[Dict[str, Any]]:
+        """
+        比较不同批大小下的批量识别吞吐量
+        
+        Args:
+            audio_paths: 用于测试的音频文件路径列表
+            batch_sizes: 要比较的批大小
+            language: 语言代码
+            
+        Returns:
+            List[Dict]: 每个批大小的耗时、每秒处理的音频数和实时倍速
+        """
+        total_audio_seconds = sum(len(whisper.load_audio(path)) for path in audio_paths) / SAMPLE_RATE
+        self.events.info('benchmark', f"批量识别吞吐量测试: 设备 {self.whisper_model.device}，"
+                                      f"{len(audio_paths)} 个音频，共 {total_audio_seconds:.1f} 秒")
+        
+        # 预热一次，避免把首次推理的初始化开销算进第一个批大小
+        self.transcribe_batch(audio_paths[:1], language=language, batch_size=1)
+        
+        report = []
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            self.transcribe_batch(audio_paths, language=language, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            report.append({
+                'batch_size': batch_size,
+                'elapsed': elapsed,
+                'clips_per_second': len(audio_paths) / elapsed,
+                'realtime_factor': total_audio_seconds / elapsed,
+            })
+        
+        self.events.info('benchmark', f"{'批大小':>6} {'耗时(秒)':>10} {'音频/秒':>10} {'实时倍速':>10}")
+        for row in report:
+            self.events.info('benchmark', f"{row['batch_size']:>6} {row['elapsed']:>10.2f} "
+                                          f"{row['clips_per_second']:>10.2f} {row['realtime_factor']:>10.2f}")
+        return report
+    
+    def translate_segments(self, segments: List[Dict[str, Any]], report: bool = True) -> List[Dict[str, Any]]:
         """
         翻译语音识别的片段
         
         Args:
             segments: Whisper识别的片段列表
+            report: 是否在翻译结束后输出各翻译后端的延迟统计（流式处理时只在最后输出一次）
             
         Returns:
             List[Dict]: 包含翻译后文本的片段列表
         """
         translated_segments = []
         
-        for i, segment in enumerate(segments):
-            try:
+        with self.events.stage('translate', f"正在翻译 {len(segments)} 个片段", error_type=TranslationError):
+            for i, segment in enumerate(segments):
                 # 翻译文本
                 original_text = segment['text'].strip()
-                if original_text:
-                    translated_text = self.translator.translate(original_text)
-                    
-                    # 创建包含翻译的新片段
-                    translated_segment = segment.copy()
-                    translated_segment['translated_text'] = translated_text
-                    translated_segments.append(translated_segment)
-                    
-                    print(f"翻译片段 {i+1}/{len(segments)}: {original_text[:30]}... -> {translated_text[:30]}...")
-                else:
+                if not original_text:
                     translated_segments.append(segment)
-                    
-            except Exception as e:
-                print(f"翻译片段时出错: {str(e)}")
-                # 出错时保留原文本
-                translated_segments.append(segment)
+                    continue
+                
+                try:
+                    # 后端池会在超时或失败时换用其他后端重试，只有所有后端都失败才会抛出
+                    translated_text, backend = self.translation_pool.translate(original_text)
+                except Exception as e:
+                    # 单个片段失败不中断整个任务，保留原文本并报告该片段的错误
+                    error = e if isinstance(e, TranslationError) else TranslationError(str(e))
+                    self.events.item('translate', i, len(segments), segment, error=error)
+                    translated_segments.append(segment)
+                    continue
+                
+                # 创建包含翻译的新片段
+                translated_segment = segment.copy()
+                translated_segment['translated_text'] = translated_text
+                translated_segment['translation_backend'] = backend
+                translated_segments.append(translated_segment)
+                
+                self.events.item('translate', i, len(segments), translated_segment,
+                                 message=f"翻译片段 {i+1}/{len(segments)} [{backend}]: "
+                                         f"{original_text[:30]}... -> {translated_text[:30]}...")
+            
+            if report:
+                self.translation_pool.report()
         
         return translated_segments
     
@@ -141,34 +425,111 @@ class AudioTranslator:
                     # 空行分隔
                     f.write("\n")
             
-            print(f"SRT字幕文件已生成: {output_path}")
+            if self.artifact_store:
+                self.artifact_store.track(output_path, job_id=self.job_id, kind='cache')
+            
+            self.events.info('subtitles', f"SRT字幕文件已生成: {output_path}")
             return output_path
             
         except Exception as e:
-            print(f"生成SRT文件时出错: {str(e)}")
+            self.events.warning('subtitles', f"生成SRT文件时出错: {str(e)}")
             raise
     
-    def process_video(self, video_path: str) -> Dict[str, Any]:
+    def whisper_model_name(self) -> str:
+        """默认模型的名称；自动选择模式下为最小的候选模型"""
+        if self.model_name == 'auto':
+            return self.model_scheduler.models[0]
+        return self.model_name
+    
+    def transcribe_adaptive(self, audio_path: str, language: str = "en", queue_depth: int = 0) -> Dict[str, Any]:
+        """
+        按调度策略识别：自动选择模型，并在置信度低时换用更大的模型重新识别
+        
+        升级前会检查剩余的可用时间，预计来不及时保留当前结果。
+        
+        Args:
+            audio_path: 音频文件路径
+            language: 语言代码
+            queue_depth: 排在本任务之后、同样等待识别的任务数
+            
+        Returns:
+            Dict: 识别结果，额外包含实际使用的 model 和低置信度比例 low_confidence
+        """
+        duration = self._audio_duration(audio_path)
+        if self.model_name == 'auto':
+            model_name = self.model_scheduler.choose(duration, queue_depth=queue_depth)
+        else:
+            model_name = self.model_name
+        
+        started = time.perf_counter()
+        result = self.transcribe_audio(audio_path, language=language, model_name=model_name)
+        low_confidence = ModelScheduler.low_confidence_ratio(result['segments'])
+        
+        while self.escalate and low_confidence > self.LOW_CONFIDENCE_RATIO:
+            next_model = self.model_scheduler.next_model(model_name)
+            if next_model is None:
+                break
+            if self.model_name == 'auto':
+                remaining = self.model_scheduler.budget(duration, queue_depth) - (time.perf_counter() - started)
+                if self.model_scheduler.estimate(next_model, duration) > remaining:
+                    self.events.info('schedule', f"{low_confidence:.0%} 的语音置信度较低，但剩余时间不足以换用 {next_model}")
+                    break
+            self.events.info('schedule', f"{low_confidence:.0%} 的语音置信度较低，换用 {next_model} 模型重新识别")
+            model_name = next_model
+            result = self.transcribe_audio(audio_path, language=language, model_name=model_name)
+            low_confidence = ModelScheduler.low_confidence_ratio(result['segments'])
+        
+        result['model'] = model_name
+        result['low_confidence'] = low_confidence
+        return result
+    
+    def process_video(self, video_path: str, audio_source: Optional[str] = None,
+                      start: Optional[float] = None, end: Optional[float] = None,
+                      queue_depth: int = 0) -> Dict[str, Any]:
         """
         处理视频文件：提取音频、语音识别、翻译
         
+        有时间窗口时只处理窗口内的音频，字幕时间轴从窗口起点算起，
+        与只包含该片段的合成输出对齐。
+        
         Args:
-            video_path: 视频文件路径
+            video_path: 视频文件路径（流水线模式下视频可能仍在下载中）
+            audio_source: 可选的纯音频文件路径，提供时直接从该文件提取音频
+            start: 可选的时间窗口起点（秒）
+            end: 可选的时间窗口终点（秒）
+            queue_depth: 排在本任务之后、同样等待识别的任务数，用于自动选择模型
             
         Returns:
             Dict: 包含处理结果的字典
         """
         # 提取音频
-        audio_path = self.extract_audio(video_path)
-        
-        # 语音识别
-        transcription_result = self.transcribe_audio(audio_path)
+        audio_path = self.extract_audio(video_path, source_path=audio_source, start=start, end=end)
         
-        # 翻译文本
-        translated_segments = self.translate_segments(transcription_result['segments'])
+        # 同一段音频以前处理过时（重新上传、换了视频ID）跳过语音识别和翻译
+        fingerprint, match = self.lookup_fingerprint(audio_path)
+        if match:
+            translated_segments = match.segments
+            transcription_result = {
+                'text': ' '.join(segment.get('text', '').strip() for segment in translated_segments),
+                'model': match.model or self.model_name,
+            }
+        else:
+            # 语音识别
+            if self.model_name == 'auto' or self.escalate:
+                transcription_result = self.transcribe_adaptive(audio_path, queue_depth=queue_depth)
+            else:
+                transcription_result = self.transcribe_audio(audio_path)
+            
+            # 翻译文本
+            translated_segments = self.translate_segments(transcription_result['segments'])
+            
+            if fingerprint is not None:
+                self.fingerprint_index.add(fingerprint, self._audio_duration(audio_path), translated_segments,
+                                           source=video_path, model=transcription_result.get('model', self.model_name),
+                                           settings=self.fingerprint_settings())
         
         # 生成SRT文件
-        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        base_name = os.path.splitext(os.path.basename(video_path))[0] + window_suffix(start, end)
         srt_dir = os.path.join(os.path.dirname(video_path), "subtitles")
         os.makedirs(srt_dir, exist_ok=True)
         
@@ -186,11 +547,190 @@ class AudioTranslator:
             'original_srt_path': original_srt_path,
             'translated_srt_path': translated_srt_path,
             'transcription': transcription_result['text'],
-            'segments': translated_segments
+            'segments': translated_segments,
+            'model': transcription_result.get('model', self.model_name),
+            'fingerprint_match': match.entry_id if match else None
         }
         
         return result
     
+    def process_video_streaming(self, video_path: str, audio_source: Optional[str] = None,
+                                start: Optional[float] = None, end: Optional[float] = None,
+                                window_seconds: float = 300, queue_depth: int = 0) -> Dict[str, Any]:
+        """
+        流式处理长视频：按窗口读取音频、识别、翻译，字幕逐条追加到SRT文件
+        
+        音频先由ffmpeg转成 16kHz 单声道WAV放在磁盘上，每次只读入一个窗口，
+        内存占用只与窗口长度有关，与视频总时长无关。每个窗口处理完后建立检查点，
+        进程崩溃后重新运行同一个任务会从最后一个检查点继续。
+        
+        窗口末尾的片段可能被截断在句子中间，除最后一个窗口外，末尾的片段留到下一个窗口
+        从它的起点重新识别；上一个窗口的最后一句作为提示文本传给下一个窗口。
+        
+        Args:
+            video_path: 视频文件路径
+            audio_source: 可选的纯音频文件路径，提供时直接从该文件提取音频
+            start: 可选的时间窗口起点（秒）
+            end: 可选的时间窗口终点（秒）
+            window_seconds: 每次识别的音频长度（秒）
+            queue_depth: 排在本任务之后、同样等待识别的任务数，用于自动选择模型
+            
+        Returns:
+            Dict: 包含处理结果的字典；不保留识别文本和片段列表，只返回片段数
+        """
+        base_name = os.path.splitext(os.path.basename(video_path))[0] + window_suffix(start, end)
+        srt_dir = os.path.join(os.path.dirname(video_path), "subtitles")
+        os.makedirs(srt_dir, exist_ok=True)
+        original_srt_path = os.path.join(srt_dir, f"{base_name}_en.srt")
+        translated_srt_path = os.path.join(srt_dir, f"{base_name}_zh.srt")
+        checkpoint_path = os.path.join(srt_dir, f"{base_name}.stream.json")
+        
+        # 检查点记录了提取完成的音频时，崩溃后恢复不需要重新提取
+        audio_path = os.path.join(os.path.dirname(video_path), "audio",
+                                  f"{base_name}.{SAMPLE_RATE}hz.wav")
+        stream = SubtitleStream(original_srt_path, translated_srt_path, checkpoint_path,
+                                format_time=self._format_time, events=self.events)
+        previous = stream.load_checkpoint()
+        if not (previous and os.path.exists(audio_path)
+                and previous['identity'].get('audio_frames') == self._wav_frames(audio_path)):
+            audio_path = self.extract_audio(video_path, source_path=audio_source, start=start, end=end,
+                                            sample_rate=SAMPLE_RATE)
+        elif self.artifact_store:
+            self.artifact_store.touch(audio_path, job_id=self.job_id)
+        if self.artifact_store:
+            self.artifact_store.track(checkpoint_path, job_id=self.job_id, kind='intermediate')
+        
+        with stream, wave.open(audio_path, 'rb') as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ExtractionError(f"流式识别需要 {SAMPLE_RATE}Hz 单声道16位WAV: {audio_path}")
+            total_frames = wav.getnframes()
+            duration = total_frames / SAMPLE_RATE
+            
+            state = stream.open({'audio_path': os.path.abspath(audio_path), 'audio_frames': total_frames,
+                                 'window_seconds': window_seconds})
+            position = state.get('position', 0.0)
+            prompt = state.get('prompt')
+            # 恢复时沿用中断前选择的模型，同一份字幕不混用不同模型的结果
+            model_name = state.get('model')
+            if not model_name:
+                if self.model_name == 'auto':
+                    model_name = self.model_scheduler.choose(duration, queue_depth=queue_depth)
+                else:
+                    model_name = self.model_name
+            
+            while position < duration:
+                window_end = min(duration, position + window_seconds)
+                wav.setpos(int(position * SAMPLE_RATE))
+                samples = np.frombuffer(wav.readframes(int((window_end - position) * SAMPLE_RATE)),
+                                        dtype=np.int16).astype(np.float32) / 32768.0
+                result = self.transcribe_audio(samples, model_name=model_name, initial_prompt=prompt)
+                
+                segments = []
+                for segment in result['segments']:
+                    segment = dict(segment, start=position + segment['start'],
+                                   end=min(window_end, position + segment['end']))
+                    if segment['text'].strip() and segment['end'] > segment['start']:
+                        segments.append(segment)
+                
+                next_position = window_end
+                if window_end < duration and len(segments) > 1 and segments[-1]['start'] > position + 1:
+                    next_position = segments[-1]['start']
+                    segments = segments[:-1]
+                
+                for segment in self.translate_segments(segments, report=False):
+                    stream.append(segment)
+                if segments:
+                    prompt = segments[-1]['text'].strip()
+                
+                position = next_position
+                stream.checkpoint(position=position, prompt=prompt, model=model_name)
+                self.events.progress('transcribe', position / duration, "流式识别进度",
+                                     position=round(position, 1), cues=stream.cues)
+            
+            self.translation_pool.report()
+            cues = stream.cues
+            stream.finish()
+        
+        if self.artifact_store:
+            self.artifact_store.track(original_srt_path, job_id=self.job_id, kind='cache')
+            self.artifact_store.track(translated_srt_path, job_id=self.job_id, kind='cache')
+        self.events.info('subtitles', f"流式处理完成，共 {cues} 条字幕: {translated_srt_path}")
+        
+        return {
+            'video_path': video_path,
+            'audio_path': audio_path,
+            'original_srt_path': original_srt_path,
+            'translated_srt_path': translated_srt_path,
+            'segment_count': cues,
+            'model': model_name,
+        }
+    
+    @staticmethod
+    def _wav_frames(audio_path: str) -> Optional[int]:
+        """WAV文件的帧数，文件不完整或不是WAV时为 None"""
+        try:
+            with wave.open(audio_path, 'rb') as wav:
+                return wav.getnframes()
+        except (OSError, wave.Error, EOFError):
+            return None
+    
+    def lookup_fingerprint(self, audio_path: str) -> Tuple[Optional[Any], Optional[FingerprintMatch]]:
+        """
+        计算音频的声学指纹并在指纹索引中查找
+        
+        指纹只是优化，计算或查找失败时给出警告并按没有匹配处理。
+        
+        Args:
+            audio_path: extract_audio 生成的WAV文件
+            
+        Returns:
+            Tuple: (指纹, 匹配结果)；没有指纹索引或计算失败时指纹为 None，没有匹配时匹配结果为 None
+        """
+        if self.fingerprint_index is None:
+            return None, None
+        
+        try:
+            fingerprint = compute_fingerprint(audio_path)
+            duration = self._audio_duration(audio_path)
+            match = self.fingerprint_index.lookup(fingerprint, duration, settings=self.fingerprint_settings())
+        except Exception as e:
+            self.events.warning('fingerprint', f"计算声学指纹失败，正常识别: {e}")
+            return None, None
+        
+        if match:
+            self.events.info('fingerprint', f"音频与已处理的 {match.source or match.entry_id} 相同"
+                                            f"（误码率 {match.bit_error_rate:.3f}，偏移 {match.offset:.2f} 秒），"
+                                            f"复用 {len(match.segments)} 个字幕片段，跳过语音识别和翻译")
+        return fingerprint, match
+    
+    def fingerprint_settings(self) -> Dict[str, Any]:
+        """
+        影响识别和翻译结果的设置，只有这些设置相同时才复用指纹索引中的记录
+
+        Returns:
+            Dict: 请求的模型（auto 时为 auto）、是否升级模型和翻译目标语言
+        """
+        return {'model': self.model_name, 'escalate': self.escalate, 'target_language': TARGET_LANGUAGE}
+    
+    @staticmethod
+    def _audio_duration(audio_path: str) -> float:
+        """
+        读取音频时长（秒）；extract_audio 生成的是WAV文件，直接读文件头即可，
+        其他格式用Whisper解码后计算
+        """
+        try:
+            with wave.open(audio_path, 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except (wave.Error, EOFError):
+            return len(whisper.load_audio(audio_path)) / SAMPLE_RATE
+    
+    def close(self):
+        """释放语音识别工作进程和翻译线程池"""
+        if self.worker_pool:
+            self.worker_pool.close()
+            self.worker_pool = None
+        self.translation_pool.close()
+    
     def _format_time(self, seconds: float) -> str:
         """
         将秒数格式化为SRT时间戳格式
@@ -210,5 +750,10 @@ class AudioTranslator:
 
 # 简单的测试函数
 if __name__ == "__main__":
-    translator = AudioTranslator(model_name="base")
-    print("Audio Translator module loaded successfully")
\ No newline at end of file
+    # 传入音频文件时在CPU上运行批量识别吞吐量测试: python src/translator.py a.wav b.wav ...
+    if len(sys.argv) > 1:
+        translator = AudioTranslator(model_name="base", device="cpu")
+        translator.benchmark_batch_sizes(sys.argv[1:])
+    else:
+        translator = AudioTranslator(model_name="base")
+        print("Audio Translator module loaded successfully")
\ No newline at end of file
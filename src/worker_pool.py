@@ -0,0 +1,374 @@
+import os
+import queue
+import itertools
+import collections
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, Union
+
+import numpy as np
+import torch
+import whisper
+from whisper.model import Whisper, ModelDimensions
+
+from events import EventBus, TranscriptionError
+
+def save_shared_weights(model: Whisper, path: str) -> str:
+    """
+    把已加载的Whisper模型序列化成可以被多个进程mmap共享的文件
+
+    文件格式与Whisper官方检查点相同（dims + model_state_dict）。
+
+    Args:
+        model: 已加载的Whisper模型
+        path: 输出文件路径
+
+    Returns:
+        str: 输出文件路径
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    state_dict = {name: tensor.detach().cpu() for name, tensor in model.state_dict().items()}
+    torch.save({'dims': vars(model.dims), 'model_state_dict': state_dict}, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def load_shared_model(path: str) -> Whisper:
+    """
+    以mmap方式加载序列化的Whisper权重
+
+    权重张量直接引用文件映射的页（写时复制），多个进程加载同一个文件时
+    共享操作系统页缓存中的同一份数据，不会各自复制一份。
+
+    Args:
+        path: save_shared_weights 生成的文件
+
+    Returns:
+        Whisper: 位于CPU上的模型
+    """
+    checkpoint = torch.load(path, mmap=True, map_location='cpu', weights_only=True)
+    dims = ModelDimensions(**checkpoint['dims'])
+
+    # 在meta设备上构建模型结构，避免先随机初始化一份完整权重
+    with torch.device('meta'):
+        model = Whisper(dims)
+    model.load_state_dict(checkpoint['model_state_dict'], assign=True)
+
+    # 非持久化缓冲区不在state_dict中，按Whisper的构造逻辑重新创建
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-float('inf')).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+    all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    all_heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+
+    if any(tensor.is_meta for tensor in itertools.chain(model.parameters(), model.buffers())):
+        raise RuntimeError(f"共享权重文件与当前Whisper版本不兼容: {path}")
+
+    return model.eval()
+
+def read_process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """
+    读取进程的内存占用（仅Linux，来自 /proc/<pid>/smaps_rollup）
+
+    Args:
+        pid: 进程ID
+
+    Returns:
+        Optional[Dict]: rss、pss、shared、private（即USS）字节数；无法读取时为 None
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return None
+
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+def _worker_main(weights_path: str, threads: int, task_queue, result_queue) -> None:
+    """
+    工作进程入口：mmap加载权重，循环处理识别任务
+
+    每个工作进程有自己的任务队列，父进程在它空闲时才放入下一个任务，
+    因此父进程始终知道每个工作进程手上是哪个任务。
+    """
+    torch.set_num_threads(threads)
+    try:
+        model = load_shared_model(weights_path)
+    except Exception as e:
+        result_queue.put((None, 'error', f"加载共享权重失败: {e}"))
+        return
+    result_queue.put((None, 'ready', os.getpid()))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        task_id, audio, options = task
+        try:
+            result = model.transcribe(audio, fp16=False, **options)
+            result_queue.put((task_id, 'ok', result))
+        except Exception as e:
+            result_queue.put((task_id, 'error', f"{type(e).__name__}: {e}"))
+
+class WhisperWorkerPool:
+    """
+    共享Whisper权重的多进程语音识别池
+
+    父进程只加载一次模型并序列化到缓存文件，各工作进程以mmap方式映射同一个文件，
+    权重页由所有进程共享，每个工作进程额外的内存只有推理时的激活和Python运行时本身。
+    只支持CPU推理。任务先排在父进程中，由父进程逐个分配给空闲的工作进程；
+    工作进程意外退出（例如被OOM终止）时只有分配给它的那个任务失败，
+    并启动一个新的工作进程替代它。
+    """
+
+    def __init__(self, model_name: str = "base", num_workers: int = 2, weights_path: Optional[str] = None,
+                 threads_per_worker: Optional[int] = None, max_restarts: int = 10,
+                 events: Optional[EventBus] = None):
+        """
+        初始化并启动工作进程
+
+        Args:
+            model_name: Whisper模型名称
+            num_workers: 工作进程数
+            weights_path: 共享权重文件路径，默认 ~/.cache/you-video/weights/<model_name>.pt
+            threads_per_worker: 每个工作进程的PyTorch线程数，默认平分CPU核数
+            max_restarts: 工作进程意外退出后最多重启几次，超过后关闭整个池，避免无限重启
+            events: 可选的事件总线，默认只输出到控制台
+        """
+        self.model_name = model_name
+        self.num_workers = max(1, num_workers)
+        self.events = events or EventBus.with_console()
+        self.weights_path = weights_path or os.path.join(
+            os.path.expanduser('~'), '.cache', 'you-video', 'weights', f"{model_name}.pt")
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.max_restarts = max_restarts
+        self.restarts = 0
+
+        # 父进程只在权重文件不存在时完整加载一次模型，之后父进程自己也使用mmap共享的那份
+        if not os.path.exists(self.weights_path):
+            self.events.info('load_model', f"正在加载Whisper模型并生成共享权重文件: {model_name}")
+            save_shared_weights(whisper.load_model(model_name, device='cpu'), self.weights_path)
+        self.model = load_shared_model(self.weights_path)
+
+        self._context = multiprocessing.get_context('spawn')
+        self._result_queue = self._context.Queue()
+        self._futures: Dict[int, Future] = {}
+        # 还没有分配给工作进程的任务
+        self._pending = collections.deque()
+        # 已加载完成的工作进程序号 -> 分配给它的任务ID（空闲时为 None）
+        self._assigned: Dict[int, Optional[int]] = {}
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+
+        self.events.info('load_model', f"正在启动 {self.num_workers} 个语音识别工作进程...")
+        self._task_queues = [self._context.Queue() for _ in range(self.num_workers)]
+        self._workers = [self._start_worker(index) for index in range(self.num_workers)]
+
+        # 等待所有工作进程加载完成
+        for _ in range(self.num_workers):
+            _, status, payload = self._result_queue.get()
+            if status != 'ready':
+                self.close()
+                raise TranscriptionError(payload)
+            self._assigned[self._worker_index(payload)] = None
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name="whisper-pool-results", daemon=True)
+        self._dispatcher.start()
+        self.events.info('load_model', f"语音识别工作进程已就绪，共享权重: {self.weights_path}")
+
+    def _start_worker(self, index: int) -> multiprocessing.process.BaseProcess:
+        """启动第 index 个工作进程，它从自己的任务队列中读取任务"""
+        worker = self._context.Process(target=_worker_main,
+                                       args=(self.weights_path, self.threads, self._task_queues[index],
+                                             self._result_queue),
+                                       daemon=True)
+        worker.start()
+        return worker
+
+    def _worker_index(self, pid: int) -> Optional[int]:
+        """根据PID找到工作进程的序号，找不到（例如已被替换）时返回 None"""
+        for index, worker in enumerate(self._workers):
+            if worker.pid == pid:
+                return index
+        return None
+
+    def _assign_pending(self) -> None:
+        """把排队的任务分配给空闲的工作进程，调用方需持有 self._lock"""
+        for index, task_id in self._assigned.items():
+            if not self._pending:
+                return
+            if task_id is None:
+                task = self._pending.popleft()
+                self._assigned[index] = task[0]
+                self._task_queues[index].put(task)
+
+    def submit(self, audio: Union[str, np.ndarray], **options) -> Future:
+        """
+        提交一个识别任务
+
+        Args:
+            audio: 音频文件路径，或 16kHz 单声道 float32 采样数组（与 whisper transcribe 接受的输入相同）；
+                   数组会被序列化后发送给工作进程
+            **options: 传给 whisper transcribe 的参数，例如 language
+
+        Returns:
+            Future: 结果与 whisper transcribe 的返回值相同
+        """
+        if self._closed:
+            raise RuntimeError("WhisperWorkerPool 已关闭")
+        future = Future()
+        task_id = next(self._task_ids)
+        with self._lock:
+            self._futures[task_id] = future
+            self._pending.append((task_id, audio, options))
+            self._assign_pending()
+        return future
+
+    def transcribe(self, audio: Union[str, np.ndarray], **options) -> Dict[str, Any]:
+        """
+        同步识别一段音频（文件路径或采样数组），参数同 submit()
+
+        Returns:
+            Dict: 识别结果
+        """
+        return self.submit(audio, **options).result()
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        统计父进程和各工作进程的内存占用，衡量每个工作进程的额外开销
+
+        Returns:
+            Dict: 包含权重文件大小、各进程内存（rss/pss/shared/private）
+                  以及工作进程平均私有内存（每增加一个工作进程的实际开销）
+        """
+        workers = []
+        for worker in self._workers:
+            memory = read_process_memory(worker.pid)
+            if memory:
+                workers.append({'pid': worker.pid, **memory})
+
+        private = [worker['private'] for worker in workers]
+        report = {
+            'weights_bytes': os.path.getsize(self.weights_path),
+            'parent': read_process_memory(os.getpid()),
+            'workers': workers,
+            'per_worker_overhead_bytes': sum(private) // len(private) if private else None,
+        }
+
+        mb = 1024 * 1024
+        self.events.info('memory', f"共享权重文件: {report['weights_bytes'] / mb:.1f} MB")
+        for worker in workers:
+            self.events.info('memory', f"工作进程 {worker['pid']}: RSS {worker['rss'] / mb:.1f} MB，"
+                                       f"共享 {worker['shared'] / mb:.1f} MB，私有 {worker['private'] / mb:.1f} MB")
+        if report['per_worker_overhead_bytes'] is not None:
+            self.events.info('memory', f"每个工作进程的平均额外内存: {report['per_worker_overhead_bytes'] / mb:.1f} MB")
+        return report
+
+    def close(self) -> None:
+        """停止所有工作进程"""
+        if self._closed:
+            return
+        self._closed = True
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._result_queue.put((None, 'closed', None))
+        # 等结果线程处理完 closed 再返回，避免进程退出时它还在读已经关闭的队列
+        if self._dispatcher is not None and self._dispatcher is not threading.current_thread():
+            self._dispatcher.join(timeout=5)
+
+        with self._lock:
+            pending = list(self._futures.values())
+            self._futures.clear()
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(TranscriptionError("WhisperWorkerPool 已关闭"))
+
+    def _dispatch_results(self) -> None:
+        """把工作进程返回的结果交给对应的 Future"""
+        while True:
+            try:
+                task_id, status, payload = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if status == 'closed':
+                return
+            if task_id is None:
+                # 重启的工作进程加载完成或加载失败
+                if status == 'error':
+                    self.events.warning('transcribe', f"重启的语音识别工作进程启动失败: {payload}")
+                    continue
+                with self._lock:
+                    index = self._worker_index(payload)
+                    if index is not None:
+                        self._assigned[index] = None
+                        self._assign_pending()
+                continue
+            with self._lock:
+                for index, assigned in self._assigned.items():
+                    if assigned == task_id:
+                        self._assigned[index] = None
+                self._assign_pending()
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                continue
+            if status == 'ok':
+                future.set_result(payload)
+            else:
+                future.set_exception(TranscriptionError(payload))
+
+    def _check_workers(self) -> None:
+        """
+        工作进程意外退出时，让分配给它的任务失败并启动新的工作进程替代它；
+        重启次数超过 max_restarts 时关闭整个池
+        """
+        if self._closed:
+            return
+        for index, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            with self._lock:
+                # 任务放入队列后就记在这个工作进程名下，即使它取出任务后还没开始处理就退出也不会遗漏
+                lost = self._assigned.pop(index, None)
+                future = self._futures.pop(lost, None) if lost is not None else None
+            message = f"语音识别工作进程 {worker.pid} 意外退出，退出码: {worker.exitcode}"
+            if future is not None:
+                future.set_exception(TranscriptionError(message))
+
+            if self.restarts >= self.max_restarts:
+                self.events.warning('transcribe', f"{message}，已重启 {self.restarts} 次，关闭语音识别工作进程池")
+                self.close()
+                return
+            self.restarts += 1
+            failed = "，分配给它的任务失败" if future is not None else ""
+            self.events.warning('transcribe', f"{message}{failed}，正在重启工作进程")
+            # 退出的进程可能持有旧队列的锁，新进程使用新的任务队列
+            self._task_queues[index] = self._context.Queue()
+            self._workers[index] = self._start_worker(index)
+
+    def __enter__(self) -> 'WhisperWorkerPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# 简单的测试函数
+if __name__ == "__main__":
+    with WhisperWorkerPool(model_name="base", num_workers=2) as pool:
+        pool.memory_report()
@@ -0,0 +1,103 @@
+import os
+import time
+import unittest
+
+from testutil import TempDirTestCase
+from events import EventBus
+from artifacts import ArtifactStore
+
+
+class ArtifactStoreTest(TempDirTestCase):
+    def test_evicts_least_recently_used_over_quota(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=250, events=EventBus())
+        a = store.track(self.write_file('a', 'x' * 100))
+        b = store.track(self.write_file('b', 'x' * 100))
+        time.sleep(0.01)
+        store.touch(a)
+        store.track(self.write_file('c', 'x' * 100))
+
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertEqual(store.total_bytes(), 200)
+
+    def test_files_of_running_job_are_pinned(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        with store.job('job-1'):
+            a = store.track(self.write_file('a', 'x' * 100), job_id='job-1')
+            b = store.track(self.write_file('b', 'x' * 100), job_id='other')
+            self.assertTrue(os.path.exists(a))
+            self.assertFalse(os.path.exists(b))
+
+            # 正在使用的文件超出配额时只告警，不删除
+            c = store.track(self.write_file('c', 'x' * 200), job_id='job-1')
+            self.assertTrue(os.path.exists(a) and os.path.exists(c))
+
+        # 任务结束后重新检查配额
+        self.assertLessEqual(store.total_bytes(), 150)
+
+    def test_jobs_of_dead_processes_do_not_pin(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        store.begin_job('job-1')
+        with store._locked_index() as index:
+            index['jobs']['job-1']['pid'] = 2 ** 22 + 1
+        a = store.track(self.write_file('a', 'x' * 100), job_id='job-1')
+        time.sleep(0.01)
+        b = store.track(self.write_file('b', 'x' * 100))
+        self.assertFalse(os.path.exists(a))
+        self.assertTrue(os.path.exists(b))
+
+    def test_jobs_of_other_hosts_pin_until_they_expire(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        store.begin_job('remote', ttl_seconds=0.1)
+        with store._locked_index() as index:
+            # 共享存储上另一台机器的任务：PID 在本机不存在，不能据此判断任务已结束
+            index['jobs']['remote'].update(host='other-host', pid=2 ** 22 + 1)
+        a = store.track(self.write_file('a', 'x' * 100), job_id='remote')
+        b = store.track(self.write_file('b', 'x' * 100))
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+
+        time.sleep(0.15)
+        store.track(self.write_file('c', 'x' * 100))
+        self.assertFalse(os.path.exists(a))
+
+    def test_intermediates_cleaned_according_to_policy(self):
+        for policy, success, kept in (('on_success', True, False), ('on_success', False, True),
+                                      ('always', False, False), ('keep', True, True)):
+            with self.subTest(policy=policy, success=success):
+                store = ArtifactStore(self.tmp_dir, cleanup_policy=policy, events=EventBus())
+                job_id = f"{policy}-{success}"
+                store.begin_job(job_id)
+                audio = store.track(self.write_file(f'{job_id}.wav', 'x' * 100), job_id=job_id,
+                                    kind='intermediate')
+                video = store.track(self.write_file(f'{job_id}.mp4', 'x' * 100), job_id=job_id, kind='cache')
+                store.end_job(job_id, success=success)
+                self.assertEqual(os.path.exists(audio), kept)
+                self.assertTrue(os.path.exists(video))
+
+    def test_hold_pins_across_processes_until_released(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        store.hold('queue-1')
+        video = store.track(self.write_file('video.mp4', 'x' * 100), job_id='queue-1')
+        audio = store.track(self.write_file('audio.wav', 'x' * 10), job_id='queue-1', kind='intermediate')
+
+        # 另一个阶段（另一个进程）再次持有时保留已登记的文件
+        other = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        other.hold('queue-1')
+        other.track(self.write_file('other.mp4', 'x' * 100), job_id='other')
+        self.assertTrue(os.path.exists(video) and os.path.exists(audio))
+
+        other.end_job('queue-1', success=True)
+        self.assertFalse(os.path.exists(audio))
+
+    def test_expired_hold_no_longer_pins(self):
+        store = ArtifactStore(self.tmp_dir, quota_bytes=150, events=EventBus())
+        store.hold('queue-1', ttl_seconds=0.05)
+        video = store.track(self.write_file('video.mp4', 'x' * 100), job_id='queue-1')
+        time.sleep(0.1)
+        store.track(self.write_file('other.mp4', 'x' * 100))
+        self.assertFalse(os.path.exists(video))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from testutil import TempDirTestCase
+from events import EventBus, DownloadError
+
+# downloader 依赖 yt-dlp；缺少依赖时跳过测试
+try:
+    import downloader
+    from downloader import YouTubeDownloader
+    IMPORT_ERROR = None
+except ImportError as e:
+    IMPORT_ERROR = e
+
+
+class FakeYoutubeDL:
+    """模拟 yt-dlp：音频流立即下载完成，视频每 10ms 汇报一次进度，进度回调抛出异常时中止下载"""
+
+    video_started = threading.Event()
+    video_steps = 3
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=True):
+        audio_only = self.opts['format'].startswith('bestaudio')
+        info = {'title': 'demo', 'duration': 10, 'ext': 'm4a' if audio_only else 'mp4'}
+        if not audio_only:
+            FakeYoutubeDL.video_started.set()
+            for step in range(self.video_steps):
+                for hook in self.opts.get('progress_hooks', []):
+                    hook({'status': 'downloading', 'downloaded_bytes': step, 'total_bytes': self.video_steps})
+                time.sleep(0.01)
+        return info
+
+    def prepare_filename(self, info):
+        return self.opts['outtmpl'].replace('%(title)s', info['title']).replace('%(ext)s', info['ext'])
+
+
+@unittest.skipIf(IMPORT_ERROR, f"无法导入 downloader: {IMPORT_ERROR}")
+class InvalidURLTest(TempDirTestCase):
+    def test_invalid_url_raises_value_error(self):
+        youtube_downloader = YouTubeDownloader(output_dir=self.tmp_dir, events=EventBus())
+        for download in (youtube_downloader.download_short, youtube_downloader.download_short_pipelined):
+            with self.subTest(download=download.__name__), self.assertRaises(ValueError) as ctx:
+                download("https://example.com/video")
+            self.assertIsInstance(ctx.exception, DownloadError)
+
+
+@unittest.skipIf(IMPORT_ERROR, f"无法导入 downloader: {IMPORT_ERROR}")
+class PipelinedDownloadTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        FakeYoutubeDL.video_started.clear()
+        patcher = mock.patch.object(downloader.yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_audio_returns_first_and_video_follows(self):
+        video_info = YouTubeDownloader(output_dir=self.tmp_dir, events=EventBus()).download_short_pipelined(
+            "https://youtube.com/shorts/demo")
+        self.assertEqual(video_info['audio_path'], self.tmp_path('demo.audio.m4a'))
+        self.assertEqual(video_info['video_path'], self.tmp_path('demo.mp4'))
+        self.assertEqual(video_info['video_future'].result(timeout=2)['video_path'], self.tmp_path('demo.mp4'))
+
+    def test_cancel_aborts_background_video_download(self):
+        FakeYoutubeDL.video_steps = 500
+        self.addCleanup(setattr, FakeYoutubeDL, 'video_steps', 3)
+        video_info = YouTubeDownloader(output_dir=self.tmp_dir, events=EventBus()).download_short_pipelined(
+            "https://youtube.com/shorts/demo")
+        self.assertTrue(FakeYoutubeDL.video_started.wait(2))
+
+        video_info['video_cancel'].set()
+        # 不等 5 秒的完整下载结束，下一次进度回调就中止下载
+        with self.assertRaisesRegex(DownloadError, "已取消"):
+            video_info['video_future'].result(timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
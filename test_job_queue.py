@@ -0,0 +1,123 @@
+import time
+import unittest
+
+from testutil import TempDirTestCase
+from events import EventBus
+from job_queue import JobQueue, LeaseLostError, run_worker
+
+
+class JobQueueTest(TempDirTestCase):
+    def test_stages_advance_and_outputs_accumulate(self):
+        queue = JobQueue(self.tmp_path('queue.db'), events=EventBus())
+        job_id = queue.enqueue({'url': 'u'})
+
+        for stage, outputs in (('download', {'video_path': 'v.mp4'}), ('transcribe', {'srt': 'a.srt'})):
+            lease = queue.claim('w1')
+            self.assertEqual((lease.job_id, lease.stage, lease.attempt), (job_id, stage, 1))
+            self.assertIsNotNone(queue.complete(lease, outputs))
+
+        lease = queue.claim('w1')
+        self.assertEqual(lease.stage, 'compose')
+        self.assertEqual((lease.state['video_path'], lease.state['srt']), ('v.mp4', 'a.srt'))
+        self.assertIsNone(queue.complete(lease, {'output_video': 'out.mp4'}))
+
+        job = queue.get(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(set(job['state']['timings']), set(JobQueue.STAGES))
+        self.assertFalse(queue.has_unfinished())
+
+    def test_claim_filters_by_stage_and_leases_exclusively(self):
+        queue = JobQueue(self.tmp_path('queue.db'), events=EventBus())
+        queue.enqueue({'url': 'u'})
+        self.assertIsNone(queue.claim('w1', stages=['compose']))
+        self.assertIsNotNone(queue.claim('w1', stages=['download']))
+        self.assertIsNone(queue.claim('w2'))
+
+    def test_expired_lease_is_reclaimed_and_old_holder_loses_it(self):
+        queue = JobQueue(self.tmp_path('queue.db'), lease_seconds=0.05, events=EventBus())
+        queue.enqueue({'url': 'u'})
+        stale = queue.claim('w1')
+        time.sleep(0.1)
+
+        fresh = queue.claim('w2')
+        self.assertEqual((fresh.job_id, fresh.attempt), (stale.job_id, 2))
+        with self.assertRaises(LeaseLostError):
+            queue.heartbeat(stale)
+        with self.assertRaises(LeaseLostError):
+            queue.complete(stale, {})
+        queue.complete(fresh, {})
+
+    def test_expired_lease_without_attempts_left_fails(self):
+        queue = JobQueue(self.tmp_path('queue.db'), lease_seconds=0.05, max_attempts=1, events=EventBus())
+        job_id = queue.enqueue({'url': 'u'})
+        queue.claim('w1')
+        time.sleep(0.1)
+        self.assertIsNone(queue.claim('w2'))
+        self.assertEqual(queue.get(job_id)['status'], 'failed')
+
+    def test_run_worker_reports_expired_lease_without_attempts_left(self):
+        queue = JobQueue(self.tmp_path('queue.db'), lease_seconds=0.05, max_attempts=1, events=EventBus())
+        job_id = queue.enqueue({'url': 'u'})
+        queue.claim('crashed')
+        time.sleep(0.1)
+
+        finished = []
+        completed = run_worker(queue, {stage: lambda lease: {} for stage in JobQueue.STAGES}, poll_interval=0.01,
+                               drain=True, on_finished=lambda lease, success: finished.append(
+                                   (lease.job_id, lease.worker_id, success)))
+        self.assertEqual(completed, 0)
+        self.assertEqual(finished, [(job_id, 'crashed', False)])
+
+    def test_heartbeat_extends_lease(self):
+        queue = JobQueue(self.tmp_path('queue.db'), lease_seconds=0.2, events=EventBus())
+        queue.enqueue({'url': 'u'})
+        lease = queue.claim('w1')
+        for _ in range(3):
+            time.sleep(0.1)
+            queue.heartbeat(lease)
+        self.assertIsNone(queue.claim('w2'))
+
+    def test_failures_back_off_exponentially_then_fail(self):
+        queue = JobQueue(self.tmp_path('queue.db'), max_attempts=3, backoff_base=0.05, backoff_max=0.08,
+                         events=EventBus())
+        job_id = queue.enqueue({'url': 'u'})
+
+        delays = []
+        for attempt in (1, 2):
+            lease = queue.claim('w1')
+            self.assertEqual(lease.attempt, attempt)
+            delay = queue.fail(lease, 'boom')
+            delays.append(delay)
+            # 退避期间不会被领取
+            self.assertIsNone(queue.claim('w1'))
+            time.sleep(delay + 0.01)
+
+        # 带抖动的退避：第 n 次失败等待 base * 2^(n-1) 的 50%-100%，不超过上限
+        self.assertTrue(0.025 <= delays[0] <= 0.05)
+        self.assertTrue(0.04 <= delays[1] <= 0.08)
+
+        lease = queue.claim('w1')
+        self.assertIsNone(queue.fail(lease, 'boom again'))
+        job = queue.get(job_id)
+        self.assertEqual((job['status'], job['last_error']), ('failed', 'boom again'))
+        self.assertIsNone(queue.claim('w1'))
+
+    def test_run_worker_reports_finished_jobs(self):
+        queue = JobQueue(self.tmp_path('queue.db'), max_attempts=1, events=EventBus())
+        done_id = queue.enqueue({'fail': False})
+        failed_id = queue.enqueue({'fail': True})
+
+        def handler(lease):
+            if lease.payload['fail']:
+                raise RuntimeError('boom')
+            return {lease.stage: True}
+
+        finished = []
+        completed = run_worker(queue, {stage: handler for stage in JobQueue.STAGES}, poll_interval=0.01,
+                               drain=True, on_finished=lambda lease, success: finished.append((lease.job_id, success)))
+        self.assertEqual(completed, len(JobQueue.STAGES))
+        self.assertEqual(sorted(finished), [(done_id, True), (failed_id, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import argparse
+import unittest
+
+import testutil  # noqa: F401  把 src 目录加入导入路径
+
+# compositor 依赖 moviepy，main 依赖全部处理模块；缺少依赖时跳过对应的测试
+try:
+    from compositor import Rendition, DEFAULT_RENDITIONS
+    COMPOSITOR_IMPORT_ERROR = None
+except ImportError as e:
+    COMPOSITOR_IMPORT_ERROR = e
+
+try:
+    from main import parse_timestamp
+    MAIN_IMPORT_ERROR = None
+except ImportError as e:
+    MAIN_IMPORT_ERROR = e
+
+
+@unittest.skipIf(COMPOSITOR_IMPORT_ERROR, f"无法导入 compositor: {COMPOSITOR_IMPORT_ERROR}")
+class RenditionParseTest(unittest.TestCase):
+    def test_full_and_partial_specs(self):
+        renditions = Rendition.parse("1080x1920:4M:slow, 720X1280:2500k,480x854")
+        self.assertEqual([(r.width, r.height, r.video_bitrate, r.preset) for r in renditions],
+                         [(1080, 1920, '4M', 'slow'), (720, 1280, '2500k', 'medium'), (480, 854, None, 'medium')])
+        self.assertEqual(renditions[0].name, '1080x1920')
+
+    def test_empty_fields_keep_defaults(self):
+        rendition, = Rendition.parse("720x1280::fast")
+        self.assertEqual((rendition.video_bitrate, rendition.preset), (None, 'fast'))
+
+    def test_default(self):
+        self.assertEqual(Rendition.parse(" default "), list(DEFAULT_RENDITIONS))
+
+    def test_invalid_specs(self):
+        for spec in ("720", "720x", "axb", "1080x1920x3", ""):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                Rendition.parse(spec)
+
+
+@unittest.skipIf(MAIN_IMPORT_ERROR, f"无法导入 main: {MAIN_IMPORT_ERROR}")
+class ParseTimestampTest(unittest.TestCase):
+    def test_formats(self):
+        for value, expected in (("90.5", 90.5), ("0", 0.0), ("1:30", 90.0), ("0:01:30", 90.0),
+                                ("1:00:00.25", 3600.25)):
+            with self.subTest(value=value):
+                self.assertAlmostEqual(parse_timestamp(value), expected)
+
+    def test_invalid(self):
+        for value in ("", "abc", "1::2", "-5"):
+            with self.subTest(value=value), self.assertRaises(argparse.ArgumentTypeError):
+                parse_timestamp(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import json
+import unittest
+
+from testutil import TempDirTestCase
+from events import EventBus
+from subtitle_stream import SubtitleStream
+
+
+def format_time(seconds):
+    return f"00:00:{int(seconds):02d},000"
+
+
+class SubtitleStreamTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paths = [self.tmp_path(name) for name in ('en.srt', 'zh.srt', 'checkpoint.json')]
+
+    def read(self, index):
+        with open(self.paths[index], 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write_and_crash(self):
+        """写两条并建立检查点，再写一条后不落盘就退出"""
+        stream = SubtitleStream(*self.paths, format_time=format_time, events=EventBus())
+        self.assertEqual(stream.open({'audio': 'demo'}), {})
+        stream.append({'start': 0, 'end': 2, 'text': 'Hello', 'translated_text': '你好'})
+        stream.append({'start': 2, 'end': 4, 'text': 'World', 'translated_text': '世界'})
+        stream.checkpoint(position=4.0, model='base')
+        stream.append({'start': 4, 'end': 6, 'text': 'Lost', 'translated_text': '丢失'})
+        stream.close()
+
+    def test_resume_truncates_after_checkpoint_and_continues_numbering(self):
+        self.write_and_crash()
+
+        stream = SubtitleStream(*self.paths, format_time=format_time, events=EventBus())
+        self.assertEqual(stream.open({'audio': 'demo'}), {'position': 4.0, 'model': 'base'})
+        self.assertEqual(stream.cues, 2)
+        stream.append({'start': 4, 'end': 6, 'text': 'Again', 'translated_text': '再次'})
+        stream.finish()
+
+        self.assertEqual(self.read(1), "1\n00:00:00,000 --> 00:00:02,000\n你好\n\n"
+                                       "2\n00:00:02,000 --> 00:00:04,000\n世界\n\n"
+                                       "3\n00:00:04,000 --> 00:00:06,000\n再次\n\n")
+        self.assertNotIn('Lost', self.read(0))
+        self.assertFalse(os.path.exists(self.paths[2]))
+
+    def test_checkpoint_for_other_input_starts_over(self):
+        self.write_and_crash()
+
+        stream = SubtitleStream(*self.paths, format_time=format_time, events=EventBus())
+        self.assertEqual(stream.open({'audio': 'other'}), {})
+        self.assertEqual(stream.cues, 0)
+        stream.close()
+        self.assertEqual(self.read(0), "")
+
+    def test_srt_shorter_than_checkpoint_starts_over(self):
+        self.write_and_crash()
+        self.write_file('zh.srt', "1\n")
+
+        stream = SubtitleStream(*self.paths, format_time=format_time, events=EventBus())
+        self.assertEqual(stream.open({'audio': 'demo'}), {})
+        stream.close()
+
+    def test_corrupt_or_outdated_checkpoint_is_ignored(self):
+        stream = SubtitleStream(*self.paths, format_time=format_time, events=EventBus())
+        for content in ("{not json", json.dumps({'version': SubtitleStream.VERSION + 1})):
+            self.write_file('checkpoint.json', content)
+            self.assertIsNone(stream.load_checkpoint())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import time
+import threading
+import unittest
+
+import testutil  # noqa: F401  把 src 目录加入导入路径
+from events import EventBus, TranslationError
+from translation_pool import CircuitBreaker, TranslationBackend, TranslationPool
+
+
+def wait_until(condition, timeout=2.0):
+    """轮询直到条件成立或超时"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_and_probes_after_cooldown(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        # 探测请求还没有结果时不放行第二个请求
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+    def test_probe_without_result_reopens_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        time.sleep(0.06)
+        # 探测请求一直没有结果：重新熔断，再冷却一次后放行新的探测请求
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+
+
+class TranslationPoolTest(unittest.TestCase):
+    def test_fails_over_to_next_backend(self):
+        def broken(text):
+            raise RuntimeError("down")
+
+        pool = TranslationPool([TranslationBackend('primary', broken, timeout=1.0),
+                                TranslationBackend('backup', lambda text: f"[backup] {text}", timeout=1.0)],
+                               hedge=False, events=EventBus())
+        self.addCleanup(pool.close)
+        self.assertEqual(pool.translate("hi"), ("[backup] hi", 'backup'))
+        self.assertEqual(pool.retries, 1)
+
+    def test_all_backends_failing_raises(self):
+        def broken(text):
+            raise RuntimeError("down")
+
+        pool = TranslationPool([TranslationBackend('primary', broken, timeout=1.0)], events=EventBus())
+        self.addCleanup(pool.close)
+        with self.assertRaises(TranslationError):
+            pool.translate("hi")
+
+    def test_hedge_wins_over_slow_primary(self):
+        def slow(text):
+            time.sleep(0.3)
+            return f"[primary] {text}"
+
+        pool = TranslationPool([TranslationBackend('primary', slow, timeout=1.0),
+                                TranslationBackend('backup', lambda text: f"[backup] {text}", timeout=1.0)],
+                               hedge_delay=0.02, min_hedge_delay=0.01, events=EventBus())
+        self.addCleanup(pool.close)
+        self.assertEqual(pool.translate("hi")[1], 'backup')
+        self.assertEqual((pool.hedges, pool.hedge_wins), (1, 1))
+
+    def test_late_probe_that_lost_to_hedge_does_not_leave_breaker_half_open(self):
+        # primary 熔断后，第一个探测请求很慢：被对冲到 backup 的请求抢先，之后在自己的超时之后才返回
+        slow = threading.Event()
+        slow.set()
+
+        def primary(text):
+            if slow.is_set():
+                time.sleep(0.25)
+            return f"[primary] {text}"
+
+        primary_backend = TranslationBackend('primary', primary, timeout=0.1, failure_threshold=1,
+                                             reset_timeout=0.05)
+        pool = TranslationPool([primary_backend,
+                                TranslationBackend('backup', lambda text: f"[backup] {text}", timeout=1.0)],
+                               hedge_delay=0.02, min_hedge_delay=0.01, events=EventBus())
+        self.addCleanup(pool.close)
+        breaker = primary_backend.breaker
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertEqual(pool.translate("probe")[1], 'backup')
+        self.assertEqual(breaker.state, 'half_open')
+        # 迟到的探测结果按失败处理，熔断器回到 open，而不是停在 half_open
+        self.assertTrue(wait_until(lambda: breaker.state == 'open'))
+
+        # 后端恢复后，冷却结束的下一个探测请求成功，primary 重新被使用
+        slow.clear()
+        time.sleep(0.06)
+        self.assertEqual(pool.translate("again"), ("[primary] again", 'primary'))
+        self.assertEqual(breaker.state, 'closed')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import signal
+import unittest
+
+from testutil import TempDirTestCase
+
+# 工作进程池依赖 torch 和 whisper；缺少依赖时跳过测试
+try:
+    import numpy as np
+    from whisper.model import Whisper, ModelDimensions
+    from events import EventBus, TranscriptionError
+    from worker_pool import WhisperWorkerPool, save_shared_weights
+    IMPORT_ERROR = None
+except ImportError as e:
+    IMPORT_ERROR = e
+
+
+@unittest.skipIf(IMPORT_ERROR, f"无法导入 worker_pool: {IMPORT_ERROR}")
+class WhisperWorkerPoolTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        # 随机初始化的最小模型：结构与 Whisper 相同，不需要下载权重
+        dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=1, n_audio_layer=1,
+                               n_vocab=51865, n_text_ctx=64, n_text_state=64, n_text_head=1, n_text_layer=1)
+        weights_path = save_shared_weights(Whisper(dims), self.tmp_path('tiny.pt'))
+        self.pool = WhisperWorkerPool(num_workers=1, weights_path=weights_path, threads_per_worker=1,
+                                      events=EventBus())
+        self.addCleanup(self.pool.close)
+        self.audio = np.zeros(16000, dtype=np.float32)
+
+    def test_transcribe(self):
+        result = self.pool.transcribe(self.audio, language='en', temperature=0.0)
+        self.assertIn('text', result)
+
+    def test_task_of_killed_worker_fails_and_worker_is_replaced(self):
+        worker = self.pool._workers[0]
+        # 先暂停工作进程，保证任务分配给它之后、产生结果之前它就被杀掉
+        os.kill(worker.pid, signal.SIGSTOP)
+        future = self.pool.submit(self.audio, language='en', temperature=0.0)
+        os.kill(worker.pid, signal.SIGKILL)
+        with self.assertRaises(TranscriptionError):
+            future.result(timeout=30)
+
+        self.assertEqual(self.pool.restarts, 1)
+        self.assertIn('text', self.pool.transcribe(self.audio, language='en', temperature=0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+测试的公共设置
+
+与 main.py 一样把 src 目录加入导入路径，测试模块先导入本模块，再导入 src 下的模块。
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+
+class TempDirTestCase(unittest.TestCase):
+    """每个测试使用独立的临时目录 self.tmp_dir，测试结束后删除"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+    def tmp_path(self, name: str) -> str:
+        """返回临时目录下的文件路径"""
+        return os.path.join(self.tmp_dir, name)
+
+    def write_file(self, name: str, content: str = '') -> str:
+        """在临时目录下写入文件，返回文件路径"""
+        path = self.tmp_path(name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path